@@ -0,0 +1,332 @@
+"""Persistência dos dados do simulador em arquivos JSON"""
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+
+from metricas import medir, volume_gravacao, volume_leitura, volume_percurso
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Configuração do diretório de dados
+DATA_DIR = Path.home() / "dados_transporte_rural"
+PROPRIEDADES_FILE = DATA_DIR / "propriedades.json"
+VEICULOS_FILE = DATA_DIR / "veiculos.json"
+PRODUTOS_FILE = DATA_DIR / "produtos.json"
+CALCULOS_FILE = DATA_DIR / "calculos.json"
+CENTROS_FILE = DATA_DIR / "centros.json"
+# Totais pré-agregados do histórico para os relatórios (ver relatorios.py)
+RESUMOS_FILE = DATA_DIR / "resumos.json"
+# Distâncias por estrada propriedade -> centro de distribuição (ver malha_viaria.py)
+DISTANCIAS_FILE = DATA_DIR / "distancias.json"
+
+# Armazenamento em uso: 'json' (arquivos no DATA_DIR) ou 'sqlite' (banco embutido no DATA_DIR)
+BACKENDS = ('json', 'sqlite')
+BACKEND = os.environ.get('TRANSPORTE_BACKEND', 'json')
+
+
+# Máscara de permissões do processo, para criar arquivos com as mesmas permissões de open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class DadosCorrompidos(Exception):
+    """O arquivo de dados existe mas não pôde ser lido; ele não deve ser sobrescrito"""
+
+
+class ConflitoVersao(Exception):
+    """Outro processo alterou os dados de forma incompatível com a alteração pendente"""
+
+
+# Garantir que o diretório de dados existe
+def setup_data_directory():
+    """Cria o diretório de dados e arquivos JSON caso não existam"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    
+    # Inicializar os arquivos JSON se não existirem
+    for file_path, initial_data in [
+        (PROPRIEDADES_FILE, []),
+        (VEICULOS_FILE, []),
+        (PRODUTOS_FILE, []),
+        (CENTROS_FILE, []),
+        (CALCULOS_FILE, [])
+    ]:
+        if not file_path.exists():
+            with bloquear(file_path):
+                if not file_path.exists():
+                    salvar_dados(initial_data, file_path)
+    
+    print(f"Arquivos de dados serão armazenados em: {DATA_DIR}")
+
+@medir(volume=volume_leitura)
+def carregar_dados(arquivo):
+    """Carrega dados de um arquivo JSON com verificação de tipo
+
+    Um arquivo ilegível gera DadosCorrompidos em vez de uma lista vazia: devolver [] faria a
+    próxima gravação apagar todos os dados.
+    """
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+    except FileNotFoundError:
+        return []
+    except json.JSONDecodeError as e:
+        raise DadosCorrompidos(f"Dados em {arquivo} estão corrompidos ({e}). O arquivo não será alterado.")
+    if not isinstance(dados, list):  # Verifica se é uma lista
+        raise DadosCorrompidos(f"Dados em {arquivo} não estão no formato esperado (lista). O arquivo não será alterado.")
+    return dados
+
+@medir(volume=volume_gravacao)
+def salvar_dados(dados, arquivo):
+    """Salva dados em um arquivo JSON de forma atômica (arquivo temporário + fsync + rename)
+
+    Leitores nunca veem um arquivo pela metade e uma queda no meio da gravação mantém a versão
+    anterior intacta. A gravação acontece sob o bloqueio do arquivo (ver bloquear).
+    """
+    arquivo = Path(arquivo)
+    with bloquear(arquivo):
+        temporario, _ = gravar_temporario(dados, arquivo)
+        confirmar_temporario(temporario, arquivo)
+
+def gravar_temporario(itens, arquivo):
+    """Grava os itens como lista JSON (formato de salvar_dados) em um temporário ao lado de `arquivo`
+
+    Os itens são escritos um a um, então `itens` pode ser um gerador maior que a memória.
+    Devolve o caminho do temporário e a quantidade de itens; confirmar_temporario() o coloca no
+    lugar de `arquivo` (ou descartar_temporario() o apaga).
+    """
+    arquivo = Path(arquivo)
+    descritor, temporario = tempfile.mkstemp(prefix=arquivo.name + '.', suffix='.tmp', dir=arquivo.parent)
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            # Mesmo texto de json.dump(lista, indent=2), sem montar a lista inteira
+            total = 0
+            for item in itens:
+                texto = json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+                f.write((',\n  ' if total else '[\n  ') + texto)
+                total += 1
+            f.write('\n]' if total else '[]')
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        descartar_temporario(temporario)
+        raise
+    return temporario, total
+
+def confirmar_temporario(temporario, arquivo):
+    """Troca `arquivo` pelo temporário de gravar_temporario (rename atômico)"""
+    arquivo = Path(arquivo)
+    try:
+        os.chmod(temporario, _modo_arquivo(arquivo))
+        _substituir(temporario, arquivo)
+    except BaseException:
+        descartar_temporario(temporario)
+        raise
+    _sincronizar_diretorio(arquivo.parent)
+
+def descartar_temporario(temporario):
+    try:
+        os.unlink(temporario)
+    except OSError:
+        pass
+
+def _modo_arquivo(arquivo):
+    """Permissões do arquivo substituído (mkstemp cria o temporário acessível só pelo dono)"""
+    try:
+        return os.stat(arquivo).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+def _substituir(origem, destino):
+    # No Windows a troca falha enquanto outro processo está com o destino aberto para leitura
+    for tentativa in range(50):
+        try:
+            os.replace(origem, destino)
+            return
+        except PermissionError:
+            if os.name != 'nt' or tentativa == 49:
+                raise
+            time.sleep(0.02)
+
+def _sincronizar_diretorio(diretorio):
+    """Garante que a troca de nomes no diretório chegou ao disco (não disponível no Windows)"""
+    if os.name == 'nt':
+        return
+    descritor = os.open(diretorio, os.O_RDONLY)
+    try:
+        os.fsync(descritor)
+    finally:
+        os.close(descritor)
+
+def versao_arquivo(arquivo):
+    """Identifica a versão gravada de um arquivo; muda a cada salvar_dados (novo arquivo via rename)"""
+    try:
+        info = os.stat(arquivo)
+    except FileNotFoundError:
+        return None
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+_bloqueios_ativos = set()
+
+@contextmanager
+def bloquear(arquivo):
+    """Bloqueio exclusivo (advisory) entre processos sobre `arquivo`, por meio de um arquivo .lock
+
+    Reentrante dentro do mesmo processo: blocos aninhados sobre o mesmo arquivo não travam.
+    """
+    caminho = Path(str(Path(arquivo).resolve()) + '.lock')
+    if caminho in _bloqueios_ativos:
+        yield
+        return
+
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'a+b') as f:
+        _travar(f)
+        _bloqueios_ativos.add(caminho)
+        try:
+            yield
+        finally:
+            _bloqueios_ativos.discard(caminho)
+            _destravar(f)
+
+def _travar(f):
+    if os.name == 'nt':
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                pass  # LK_LOCK desiste após ~10s; continua esperando
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def _destravar(f):
+    if os.name == 'nt':
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def gerar_id(lista):
+    """Gera um novo ID para um item baseado no maior ID existente + 1"""
+    if not lista:
+        return 1
+    return max(item.get('id', 0) for item in lista) + 1
+
+class _LeitorIncremental:
+    """Lê valores JSON de um arquivo em blocos, completando o buffer quando um valor não cabe nele"""
+
+    def __init__(self, f, arquivo, tamanho_bloco):
+        self.f = f
+        self.arquivo = arquivo
+        self.tamanho_bloco = tamanho_bloco
+        self.decodificador = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.descartados = 0  # caracteres já removidos do início do buffer
+        self.fim_arquivo = False
+
+    def _ler_bloco(self):
+        bloco = self.f.read(self.tamanho_bloco)
+        self.fim_arquivo = not bloco
+        self.descartados += self.pos
+        self.buffer = self.buffer[self.pos:] + bloco
+        self.pos = 0
+        return bool(bloco)
+
+    def proximo(self, ignorar=' \t\r\n'):
+        """Pula os caracteres em `ignorar` e devolve o próximo caractere ('' no fim do arquivo)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ignorar:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._ler_bloco():
+                return ''
+
+    def consumir(self, caractere):
+        if self.proximo() != caractere:
+            raise ValueError(f"Dados em {self.arquivo} não estão no formato esperado ('{caractere}').")
+        self.pos += 1
+
+    def valor(self):
+        while True:
+            try:
+                item, fim = self.decodificador.raw_decode(self.buffer, self.pos)
+                if fim == len(self.buffer) and not self.fim_arquivo:
+                    raise ValueError  # o item pode continuar no próximo bloco
+            except ValueError:
+                if self.fim_arquivo or not self._ler_bloco():
+                    raise ValueError(f"Arquivo {self.arquivo} incompleto ou corrompido.")
+                continue
+            self.pos = fim
+            return item
+
+    def itens_lista(self):
+        """Itens da lista que começa na posição atual (o '[' ainda não foi consumido)"""
+        self.consumir('[')
+        while True:
+            # Pular espaços e vírgulas entre os itens
+            if self.proximo(' \t\r\n,') == ']':
+                self.pos += 1
+                return
+            yield self.valor()
+
+@medir(volume=volume_percurso)
+def iterar_dados(arquivo, tamanho_bloco=1 << 16):
+    """Percorre os itens de um arquivo JSON (lista) sem carregar o arquivo inteiro na memória"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        leitor = _LeitorIncremental(f, arquivo, tamanho_bloco)
+        if leitor.proximo() == '':
+            return
+        if leitor.proximo() != '[':
+            raise ValueError(f"Dados em {arquivo} não estão no formato esperado (lista).")
+        yield from leitor.itens_lista()
+
+def iterar_posicoes(arquivo, tamanho_bloco=1 << 16):
+    """Como iterar_dados, com a posição em bytes de cada item no arquivo: (item, inicio, tamanho)
+
+    Entre os itens só há '[', ']', vírgulas e espaços, que ocupam um byte cada; a diferença
+    entre caracteres e bytes vem apenas do texto dos itens.
+    """
+    with open(arquivo, 'r', encoding='utf-8', newline='') as f:
+        leitor = _LeitorIncremental(f, arquivo, tamanho_bloco)
+        if leitor.proximo() == '':
+            return
+        leitor.consumir('[')
+        bytes_extras = 0  # bytes a mais que caracteres nos itens já lidos (UTF-8 multibyte)
+        while True:
+            if leitor.proximo(' \t\r\n,') == ']':
+                return
+            inicio = leitor.descartados + leitor.pos
+            item = leitor.valor()
+            texto = leitor.buffer[inicio - leitor.descartados:leitor.pos]
+            tamanho = len(texto.encode('utf-8'))
+            yield item, inicio + bytes_extras, tamanho
+            bytes_extras += tamanho - len(texto)
+
+def iterar_secoes(arquivo, tamanho_bloco=1 << 16):
+    """Percorre um objeto JSON de listas (ex.: dados.json) como pares (chave, item), em streaming
+
+    Valores que não são listas são ignorados.
+    """
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        leitor = _LeitorIncremental(f, arquivo, tamanho_bloco)
+        leitor.consumir('{')
+        while True:
+            caractere = leitor.proximo(' \t\r\n,')
+            if caractere == '}':
+                return
+            chave = leitor.valor()
+            leitor.consumir(':')
+            if leitor.proximo() == '[':
+                for item in leitor.itens_lista():
+                    yield chave, item
+            else:
+                leitor.valor()
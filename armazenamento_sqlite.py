@@ -0,0 +1,278 @@
+"""Armazenamento opcional em SQLite (embutido, sem servidor), com a mesma API de carga/gravação"""
+import json
+import sqlite3
+from pathlib import Path
+
+import armazenamento
+from armazenamento import (CALCULOS_FILE, CENTROS_FILE, ConflitoVersao, DATA_DIR, PRODUTOS_FILE, PROPRIEDADES_FILE,
+                           VEICULOS_FILE)
+from diario import RepositorioDiario
+from metricas import medir, volume_registros
+from repositorio import Repositorio
+
+NOME_BANCO = "transporte_rural.db"
+
+# Coluna usada como nome de exibição de cada entidade nas junções da listagem
+COLUNA_NOME = {
+    'propriedades': 'nome',
+    'veiculos': 'tipo',
+    'produtos': 'nome',
+    'centros': 'nome',
+}
+CHAVES_CALCULO = ('propriedade_id', 'veiculo_id', 'produto_id')
+
+# AUTOINCREMENT: o maior id já usado fica em sqlite_sequence, então o id de uma linha removida
+# não é reaproveitado
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS propriedades (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, dados TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS veiculos (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, dados TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS produtos (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, dados TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS centros (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT, dados TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS calculos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    propriedade_id INTEGER NOT NULL,
+    veiculo_id INTEGER NOT NULL,
+    produto_id INTEGER NOT NULL,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calculos_propriedade ON calculos (propriedade_id);
+CREATE INDEX IF NOT EXISTS idx_calculos_veiculo ON calculos (veiculo_id);
+CREATE INDEX IF NOT EXISTS idx_calculos_produto ON calculos (produto_id);
+"""
+
+_conexoes = {}
+
+
+def conectar(caminho_banco=None):
+    """Abre (uma única vez por arquivo) a conexão com o banco e garante o esquema"""
+    caminho_banco = Path(caminho_banco or DATA_DIR / NOME_BANCO)
+    chave = caminho_banco.resolve()
+    if chave not in _conexoes:
+        caminho_banco.parent.mkdir(parents=True, exist_ok=True)
+        # Espera o bloqueio de escrita de outro processo em vez de falhar com "database is locked"
+        conexao = sqlite3.connect(caminho_banco, timeout=30)
+        # WAL: leitores não bloqueiam o escritor (e vice-versa) entre processos
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.executescript(ESQUEMA)
+        _conexoes[chave] = conexao
+    return _conexoes[chave]
+
+
+def fechar(caminho_banco=None):
+    """Fecha a conexão aberta por conectar(), se houver (ex.: antes de apagar o arquivo do banco)"""
+    chave = Path(caminho_banco or DATA_DIR / NOME_BANCO).resolve()
+    conexao = _conexoes.pop(chave, None)
+    if conexao is not None:
+        conexao.close()
+
+
+def _tabela_e_banco(arquivo):
+    """Converte o caminho de um arquivo JSON (ex.: calculos.json) na tabela e no banco equivalentes"""
+    arquivo = Path(arquivo)
+    tabela = arquivo.stem
+    if tabela not in COLUNA_NOME and tabela != 'calculos':
+        raise ValueError(f"Não há tabela SQLite para {arquivo.name}.")
+    return tabela, conectar(arquivo.parent / NOME_BANCO)
+
+
+def _linha(tabela, item):
+    """Valores da linha SQL de um item: colunas indexadas + o item completo em JSON"""
+    dados = json.dumps(item, ensure_ascii=False)
+    if tabela == 'calculos':
+        return (item['id'],) + tuple(item[chave] for chave in CHAVES_CALCULO) + (dados,)
+    return (item['id'], item.get(COLUNA_NOME[tabela]), dados)
+
+
+def _sql_gravar(tabela):
+    if tabela == 'calculos':
+        return ("INSERT OR REPLACE INTO calculos (id, propriedade_id, veiculo_id, produto_id, dados) "
+                "VALUES (?, ?, ?, ?, ?)")
+    return f"INSERT OR REPLACE INTO {tabela} (id, nome, dados) VALUES (?, ?, ?)"
+
+
+@medir()
+def carregar_dados(arquivo):
+    """Carrega a tabela correspondente ao arquivo, como lista de dicionários"""
+    return list(iterar_dados(arquivo))
+
+
+def iterar_dados(arquivo):
+    """Percorre a tabela correspondente ao arquivo em ordem de id, lendo do cursor sob demanda"""
+    tabela, conexao = _tabela_e_banco(arquivo)
+    for (dados,) in conexao.execute(f"SELECT dados FROM {tabela} ORDER BY id"):
+        yield json.loads(dados)
+
+
+@medir(volume=volume_registros)
+def salvar_dados(dados, arquivo):
+    """Substitui o conteúdo da tabela correspondente ao arquivo, em uma única transação"""
+    tabela, conexao = _tabela_e_banco(arquivo)
+    with conexao:
+        conexao.execute(f"DELETE FROM {tabela}")
+        conexao.executemany(_sql_gravar(tabela), (_linha(tabela, item) for item in dados))
+
+
+def substituir_tabelas(secoes, caminho_banco=None):
+    """Substitui o conteúdo de várias tabelas em uma única transação
+
+    `secoes` produz pares (arquivo, itens), que podem ser geradores: cada seção é gravada antes
+    de a próxima ser pedida. Uma exceção em qualquer ponto, inclusive ao pedir a próxima seção,
+    desfaz todas as alterações.
+    """
+    conexao = conectar(caminho_banco)
+    with conexao:
+        for arquivo, itens in secoes:
+            tabela, _ = _tabela_e_banco(arquivo)
+            conexao.execute(f"DELETE FROM {tabela}")
+            conexao.executemany(_sql_gravar(tabela), (_linha(tabela, item) for item in itens))
+
+
+class RepositorioSQLite(Repositorio):
+    """Repositório que grava cada inclusão, alteração e remoção como uma única operação no banco
+
+    A concorrência entre processos fica a cargo das transações do SQLite: o id novo é gerado
+    dentro da transação de escrita e a alteração é aplicada sobre a linha atual do banco.
+    """
+
+    def __init__(self, arquivo):
+        super().__init__(arquivo)
+        self.tabela, self.conexao = _tabela_e_banco(self.arquivo)
+
+    def _versao_disco(self):
+        # Muda sempre que outra conexão confirma uma transação no banco
+        return self.conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    def recarregar(self):
+        self._versao = self._versao_disco()
+        self._itens = {item['id']: item for item in carregar_dados(self.arquivo)}
+        self._max_id = max(max(self._itens, default=0), self._ultimo_id())
+        self._alterado = False
+        self._pendentes = []
+
+    def _ultimo_id(self):
+        """Maior id já usado na tabela, inclusive de linhas removidas, sem ler a tabela
+
+        Bancos criados antes de as tabelas usarem AUTOINCREMENT não têm sqlite_sequence; neles
+        vale o maior id presente.
+        """
+        maior_id = self.conexao.execute(f"SELECT MAX(id) FROM {self.tabela}").fetchone()[0] or 0
+        try:
+            linha = self.conexao.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (self.tabela,)).fetchone()
+        except sqlite3.OperationalError:  # sem nenhuma tabela AUTOINCREMENT no banco
+            linha = None
+        return max(maior_id, linha[0] if linha else 0)
+
+    def ler(self, id_item):
+        linha = self.conexao.execute(f"SELECT dados FROM {self.tabela} WHERE id = ?", (id_item,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def ler_pagina(self, inicio, quantidade, recentes=False):
+        ordem = 'DESC' if recentes else 'ASC'
+        linhas = self.conexao.execute(f"SELECT dados FROM {self.tabela} ORDER BY id {ordem} LIMIT ? OFFSET ?",
+                                      (quantidade, inicio))
+        itens = [json.loads(dados) for (dados,) in linhas]
+        return itens, self.conexao.execute(f"SELECT COUNT(*) FROM {self.tabela}").fetchone()[0]
+
+    def _registrar(self, operacao, *argumentos):
+        """As alterações já são gravadas no banco; não há nada pendente para salvar()"""
+
+    def adicionar(self, campos):
+        return self.adicionar_varios([campos])[0]
+
+    def adicionar_varios(self, lista_campos):
+        """Inclui os itens em uma única transação, sem carregar a tabela
+
+        Se a tabela já estiver na memória, os itens também são incluídos nela.
+        """
+        with self.conexao:
+            # BEGIN IMMEDIATE reserva a escrita: nenhum outro processo gera os mesmos ids
+            self.conexao.execute("BEGIN IMMEDIATE")
+            inicio = self._ultimo_id()
+            itens = [{'id': inicio + posicao, **campos} for posicao, campos in enumerate(lista_campos, start=1)]
+            self.conexao.executemany(_sql_gravar(self.tabela), (_linha(self.tabela, item) for item in itens))
+        if self._itens is not None:
+            for item in itens:
+                self._itens[item['id']] = item
+            if itens:
+                self._max_id = max(self._max_id, itens[-1]['id'])
+        return itens
+
+    def atualizar(self, id_item, campos):
+        if self.obter(id_item) is None:
+            return False
+        with self.conexao:
+            self.conexao.execute("BEGIN IMMEDIATE")
+            linha = self.conexao.execute(f"SELECT dados FROM {self.tabela} WHERE id = ?", (id_item,)).fetchone()
+            if linha is None:
+                del self._itens[id_item]
+                raise ConflitoVersao(f"O item {id_item} de {self.tabela} foi removido por outro usuário; "
+                                     "a alteração foi descartada.")
+            item = {**json.loads(linha[0]), **campos}
+            self.conexao.execute(_sql_gravar(self.tabela), _linha(self.tabela, item))
+        self._itens[id_item] = item
+        return True
+
+    def remover(self, id_item):
+        if not super().remover(id_item):
+            return False
+        with self.conexao:
+            self.conexao.execute(f"DELETE FROM {self.tabela} WHERE id = ?", (id_item,))
+        return True
+
+    def existe(self, campo, valor):
+        if self.tabela == 'calculos' and campo in CHAVES_CALCULO:
+            # Consulta pelo índice da chave estrangeira, sem percorrer o histórico
+            sql = f"SELECT 1 FROM calculos WHERE {campo} = ? LIMIT 1"
+            return self.conexao.execute(sql, (valor,)).fetchone() is not None
+        return super().existe(campo, valor)
+
+
+def listar_calculos_com_nomes(caminho_banco=None, propriedade_id=None, veiculo_id=None, produto_id=None):
+    """Percorre os cálculos já com os nomes de propriedade, veículo e produto (junção indexada)
+
+    Os filtros por entidade usam os índices das chaves; as linhas são lidas do cursor sob demanda.
+    """
+    filtros = {'propriedade_id': propriedade_id, 'veiculo_id': veiculo_id, 'produto_id': produto_id}
+    condicoes = [f"c.{campo} = ?" for campo, valor in filtros.items() if valor is not None]
+    parametros = [valor for valor in filtros.values() if valor is not None]
+    where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+
+    conexao = conectar(caminho_banco)
+    cursor = conexao.execute(
+        "SELECT c.dados, p.nome, v.nome, pr.nome FROM calculos c "
+        "LEFT JOIN propriedades p ON p.id = c.propriedade_id "
+        "LEFT JOIN veiculos v ON v.id = c.veiculo_id "
+        "LEFT JOIN produtos pr ON pr.id = c.produto_id "
+        f"{where}ORDER BY c.id",
+        parametros
+    )
+    for dados, prop_nome, veic_tipo, prod_nome in cursor:
+        yield json.loads(dados), prop_nome, veic_tipo, prod_nome
+
+
+def migrar_de_json(data_dir=None, forcar=False):
+    """Importa os arquivos JSON do diretório de dados para o banco SQLite (uma única vez)
+
+    Retorna um dicionário com a quantidade de registros migrados por tabela. Se o banco já
+    tiver dados, nada é feito, a não ser que `forcar` seja verdadeiro.
+    """
+    data_dir = Path(data_dir or DATA_DIR)
+    conexao = conectar(data_dir / NOME_BANCO)
+    if not forcar:
+        for tabela in ('propriedades', 'veiculos', 'produtos', 'centros', 'calculos'):
+            if conexao.execute(f"SELECT 1 FROM {tabela} LIMIT 1").fetchone():
+                return {}
+
+    origens = {
+        'propriedades': armazenamento.carregar_dados(data_dir / PROPRIEDADES_FILE.name),
+        'veiculos': armazenamento.carregar_dados(data_dir / VEICULOS_FILE.name),
+        'produtos': armazenamento.carregar_dados(data_dir / PRODUTOS_FILE.name),
+        'centros': armazenamento.carregar_dados(data_dir / CENTROS_FILE.name),
+        # O histórico inclui os registros ainda no diário (calculos.jsonl)
+        'calculos': RepositorioDiario(data_dir / CALCULOS_FILE.name).listar(),
+    }
+    with conexao:
+        for tabela, itens in origens.items():
+            conexao.execute(f"DELETE FROM {tabela}")
+            conexao.executemany(_sql_gravar(tabela), (_linha(tabela, item) for item in itens))
+    return {tabela: len(itens) for tabela, itens in origens.items()}
@@ -0,0 +1,166 @@
+"""Atribuição de propriedades aos centros de distribuição, pelo menor custo e sob a capacidade de cada centro
+
+Os centros candidatos de cada propriedade são os mais próximos em linha reta, obtidos de uma
+árvore KD; assim a atribuição de dezenas de milhares de propriedades não compara cada uma com
+todos os centros.
+"""
+import csv
+import heapq
+import math
+
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+from roteirizacao import FATOR_RODOVIARIO, RAIO_TERRA_KM, distancia_haversine, tem_coordenadas
+
+CANDIDATOS_PADRAO = 5
+CAMPOS_ATRIBUICAO = ('propriedade_id', 'centro_id', 'peso_total', 'distancia', 'custo_total')
+KM_POR_GRAU = math.pi * RAIO_TERRA_KM / 180
+
+
+class ArvoreKD:
+    """Árvore KD de 2 dimensões sobre pontos (x, y) em km, para busca dos k vizinhos mais próximos
+
+    Os nós ficam em listas paralelas (ponto, rótulo, filhos), sem um objeto por nó.
+    """
+
+    def __init__(self, pontos, rotulos):
+        self._pontos = []
+        self._rotulos = []
+        self._esquerda = []
+        self._direita = []
+        self._raiz = self._construir(list(zip(pontos, rotulos)), 0)
+
+    def __len__(self):
+        return len(self._pontos)
+
+    def _construir(self, itens, eixo):
+        if not itens:
+            return -1
+        itens.sort(key=lambda item: item[0][eixo])
+        meio = len(itens) // 2
+        no = len(self._pontos)
+        self._pontos.append(itens[meio][0])
+        self._rotulos.append(itens[meio][1])
+        self._esquerda.append(-1)
+        self._direita.append(-1)
+        self._esquerda[no] = self._construir(itens[:meio], 1 - eixo)
+        self._direita[no] = self._construir(itens[meio + 1:], 1 - eixo)
+        return no
+
+    def mais_proximos(self, ponto, k):
+        """Os k rótulos mais próximos de `ponto`, do mais próximo ao mais distante, com a distância"""
+        melhores = []  # heap máximo (distâncias negativas) com os k melhores até agora
+        pilha = [(self._raiz, 0)]
+        while pilha:
+            no, eixo = pilha.pop()
+            if no == -1:
+                continue
+            x, y = self._pontos[no]
+            distancia = math.hypot(x - ponto[0], y - ponto[1])
+            if len(melhores) < k:
+                heapq.heappush(melhores, (-distancia, no))
+            elif distancia < -melhores[0][0]:
+                heapq.heapreplace(melhores, (-distancia, no))
+
+            diferenca = ponto[eixo] - self._pontos[no][eixo]
+            perto, longe = (self._esquerda[no], self._direita[no]) if diferenca < 0 else (self._direita[no], self._esquerda[no])
+            # O lado oposto do plano de corte só pode ter vizinhos melhores se estiver mais perto que o pior atual
+            if len(melhores) < k or abs(diferenca) < -melhores[0][0]:
+                pilha.append((longe, 1 - eixo))
+            pilha.append((perto, 1 - eixo))
+        return [(self._rotulos[no], -distancia) for distancia, no in sorted(melhores, reverse=True)]
+
+
+def _projetar(latitude, longitude, latitude_referencia):
+    """Projeção equiretangular em km, suficiente para comparar distâncias numa mesma região"""
+    return (longitude * KM_POR_GRAU * math.cos(math.radians(latitude_referencia)), latitude * KM_POR_GRAU)
+
+
+def atribuir_centros(propriedades, centros, veiculo, peso_total, distancia_estrada=None,
+                     candidatos=CANDIDATOS_PADRAO, fator_rodoviario=FATOR_RODOVIARIO, parametros=PARAMETROS_PADRAO):
+    """Atribui cada propriedade ao centro de menor custo de transporte com capacidade disponível
+
+    Cada propriedade envia `peso_total` kg (ou o valor de um dicionário propriedade_id -> kg) com
+    o `veiculo`. O custo de um centro usa a distância por estrada de `distancia_estrada(prop_id,
+    centro_id)`, quando houver, ou a linha reta multiplicada pelo fator rodoviário. Os centros
+    com 'capacidade' (kg) recebem até esse total; as propriedades com maior prejuízo ao perder o
+    centro preferido (diferença de custo para o segundo) escolhem primeiro. Quando os
+    `candidatos` mais próximos estão lotados, a busca é ampliada.
+    """
+    if veiculo['capacidade'] <= 0:
+        raise ValueError("O veículo deve ter capacidade maior que zero.")
+    centros = [centro for centro in centros if tem_coordenadas(centro)]
+    if not centros:
+        raise ValueError("Nenhum centro de distribuição com latitude/longitude cadastrado.")
+
+    referencia = sum(centro['latitude'] for centro in centros) / len(centros)
+    arvore = ArvoreKD([_projetar(c['latitude'], c['longitude'], referencia) for c in centros], centros)
+    def opcoes(prop, k, livre=None):
+        """Custo da propriedade em cada um dos k centros mais próximos, do mais barato ao mais caro
+
+        Com `livre`, os centros sem capacidade para o peso da propriedade são descartados.
+        """
+        peso = peso_de(prop)
+        resultado = []
+        for centro, _ in arvore.mais_proximos(_projetar(prop['latitude'], prop['longitude'], referencia), k):
+            if livre is not None and livre[centro['id']] < peso:
+                continue
+            distancia = distancia_estrada(prop['id'], centro['id']) if distancia_estrada else None
+            if distancia is None:
+                distancia = fator_rodoviario * distancia_haversine(
+                    prop['latitude'], prop['longitude'], centro['latitude'], centro['longitude'])
+            custos = calcular_custos(distancia, veiculo['capacidade'], veiculo['custo_km'], peso, parametros)
+            resultado.append((custos['custo_total'], centro['id'], distancia, peso))
+        resultado.sort()
+        return resultado
+
+    def peso_de(prop):
+        return peso_total.get(prop['id'], 0.0) if isinstance(peso_total, dict) else peso_total
+
+    k = min(candidatos, len(centros))
+    pendentes = []
+    sem_localizacao = []
+    for prop in propriedades:
+        if not tem_coordenadas(prop):
+            sem_localizacao.append(prop['id'])
+            continue
+        custos = opcoes(prop, k)
+        arrependimento = custos[1][0] - custos[0][0] if len(custos) > 1 else math.inf
+        pendentes.append((-arrependimento, prop['id'], prop, custos))
+    pendentes.sort(key=lambda item: item[:2])
+
+    livre = {c['id']: (c['capacidade'] if c.get('capacidade') is not None else math.inf) for c in centros}
+    carga = dict.fromkeys(livre, 0.0)
+    atribuicoes = []
+    sem_capacidade = []
+    for _, propriedade_id, prop, custos in pendentes:
+        escolha = next((opcao for opcao in custos if opcao[3] <= livre[opcao[1]]), None)
+        tamanho = k
+        # Candidatos lotados: amplia a busca, desde que algum centro ainda comporte o peso
+        while escolha is None and tamanho < len(centros) and max(livre.values()) >= peso_de(prop):
+            tamanho = min(tamanho * 2, len(centros))
+            escolha = next(iter(opcoes(prop, tamanho, livre)), None)
+        if escolha is None:
+            sem_capacidade.append(propriedade_id)
+            continue
+        custo_total, centro_id, distancia, peso = escolha
+        livre[centro_id] -= peso
+        carga[centro_id] += peso
+        atribuicoes.append({'propriedade_id': propriedade_id, 'centro_id': centro_id, 'peso_total': peso,
+                            'distancia': distancia, 'custo_total': custo_total})
+
+    atribuicoes.sort(key=lambda item: item['propriedade_id'])
+    return {
+        'veiculo_id': veiculo['id'],
+        'atribuicoes': atribuicoes,
+        'carga_centros': carga,
+        'custo_total': sum(item['custo_total'] for item in atribuicoes),
+        'sem_localizacao': sem_localizacao,
+        'sem_capacidade': sorted(sem_capacidade)
+    }
+
+
+def escrever_atribuicao(caminho, atribuicoes):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_ATRIBUICAO)
+        escritor.writeheader()
+        escritor.writerows(atribuicoes)
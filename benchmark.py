@@ -0,0 +1,329 @@
+"""Benchmarks do armazenamento e do modelo de custo, sobre dados sintéticos
+
+Gera propriedades, veículos, produtos e cálculos em um diretório de dados temporário, mede cada
+operação (com aquecimento e repetições) e grava um relatório JSON que pode ser comparado com
+um relatório anterior para encontrar regressões:
+
+    python benchmark.py --tamanhos 1000 10000 100000 --saida relatorio.json
+    python benchmark.py --comparar relatorio.json
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import armazenamento
+import armazenamento_sqlite
+from armazenamento import BACKENDS, gerar_id
+from calculo_lote import calcular_custos_lote, np
+from diario import iterar_calculos
+from listagem import filtrar_calculos, juntar_nomes, mapa_nomes
+from modelo_custos import calcular_custos
+
+TAMANHOS_PADRAO = (1_000, 10_000, 100_000)
+REPETICOES = 5
+AQUECIMENTO = 1
+SEMENTE = 42
+# Uma operação é considerada regressão quando a mediana piora mais que isso em relação ao anterior
+TOLERANCIA_REGRESSAO = 0.2
+
+ARQUIVOS = ('propriedades', 'veiculos', 'produtos', 'calculos')
+TIPOS_VEICULO = ('Caminhão', 'Caminhonete', 'Carreta', 'Trator com reboque')
+PRODUTOS = ('Maçã', 'Milho', 'Soja', 'Café', 'Laranja', 'Feijão', 'Batata', 'Tomate')
+DATA_INICIAL = datetime(2024, 1, 1)
+
+
+def gerar_propriedade(id_item, rng):
+    return {
+        'id': id_item,
+        'nome': f"Propriedade {id_item}",
+        'localizacao': f"Estrada Rural {rng.randint(1, 500)}, km {rng.randint(1, 80)}",
+        'area_producao': round(rng.uniform(1, 500), 1),
+        'distancia': round(rng.uniform(5, 800), 1),
+        'latitude': round(rng.uniform(-30, -15), 5),
+        'longitude': round(rng.uniform(-55, -40), 5),
+        'data_cadastro': _data_aleatoria(rng)
+    }
+
+
+def gerar_veiculo(id_item, rng):
+    return {
+        'id': id_item,
+        'tipo': f"{rng.choice(TIPOS_VEICULO)} {id_item}",
+        'capacidade': float(rng.choice((800, 1500, 3000, 8000, 14000, 27000))),
+        'custo_km': round(rng.uniform(0.8, 6.5), 2),
+        'data_cadastro': _data_aleatoria(rng)
+    }
+
+
+def gerar_produto(id_item, rng):
+    return {
+        'id': id_item,
+        'nome': f"{rng.choice(PRODUTOS)} {id_item}",
+        'peso_cesto': float(rng.choice((20, 25, 30, 60))),
+        'data_cadastro': _data_aleatoria(rng)
+    }
+
+
+def gerar_calculo(id_item, rng, tamanho):
+    """Cálculo com os mesmos campos gravados por calcular_transporte, entre entidades aleatórias"""
+    distancia = round(rng.uniform(5, 800), 1)
+    capacidade = float(rng.choice((800, 1500, 3000, 8000, 14000, 27000)))
+    peso_total = float(rng.randint(100, 60000))
+    custos = calcular_custos(distancia, capacidade, round(rng.uniform(0.8, 6.5), 2), peso_total)
+    return {
+        'id': id_item,
+        'propriedade_id': rng.randint(1, tamanho),
+        'veiculo_id': rng.randint(1, tamanho),
+        'produto_id': rng.randint(1, tamanho),
+        'peso_total': peso_total,
+        'viagens': int(custos['viagens']),
+        'distancia_total': custos['distancia_total'],
+        'custo_total': custos['custo_total'],
+        'tempo_total': custos['tempo_total'],
+        'data_calculo': _data_aleatoria(rng)
+    }
+
+
+def _data_aleatoria(rng):
+    data = DATA_INICIAL + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+    return data.strftime("%d/%m/%Y %H:%M")
+
+
+GERADORES = {
+    'propriedades': gerar_propriedade,
+    'veiculos': gerar_veiculo,
+    'produtos': gerar_produto,
+    'calculos': gerar_calculo,
+}
+
+
+def _itens_sinteticos(nome, tamanho, semente):
+    """Gera os itens sob demanda: mesmo com 10^7 registros a lista nunca fica inteira na memória"""
+    rng = random.Random(f"{semente}-{nome}")
+    gerador = GERADORES[nome]
+    for id_item in range(1, tamanho + 1):
+        if nome == 'calculos':
+            yield gerador(id_item, rng, tamanho)
+        else:
+            yield gerador(id_item, rng)
+
+
+def _gravar_json(arquivo, itens):
+    """Grava a lista no mesmo formato de salvar_dados (indent=2), item a item"""
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write('[')
+        separador = '\n'
+        for item in itens:
+            texto = json.dumps(item, ensure_ascii=False, indent=2)
+            f.write(separador + '  ' + texto.replace('\n', '\n  '))
+            separador = ',\n'
+        f.write('\n]' if separador != '\n' else ']')
+
+
+def gerar_dados(data_dir, tamanho, backend='json', semente=SEMENTE):
+    """Cria `tamanho` registros de cada entidade e de cálculos no diretório de dados informado"""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for nome in ARQUIVOS:
+        itens = _itens_sinteticos(nome, tamanho, semente)
+        if backend == 'sqlite':
+            armazenamento_sqlite.salvar_dados(itens, data_dir / f"{nome}.json")
+        else:
+            _gravar_json(data_dir / f"{nome}.json", itens)
+
+
+def medir(funcao, repeticoes=REPETICOES, aquecimento=AQUECIMENTO):
+    """Executa `funcao` (aquecimento + repetições) e resume os tempos em segundos"""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        'repeticoes': repeticoes,
+        'minimo_s': min(tempos),
+        'mediana_s': statistics.median(tempos),
+        'media_s': statistics.fmean(tempos),
+        'maximo_s': max(tempos),
+        'desvio_s': statistics.stdev(tempos) if len(tempos) > 1 else 0.0
+    }
+
+
+def _operacoes_armazenamento(data_dir, backend, tamanho):
+    """Operações de armazenamento medidas: (nome, função, quantidade de registros processados)"""
+    modulo = armazenamento_sqlite if backend == 'sqlite' else armazenamento
+    arquivos = {nome: data_dir / f"{nome}.json" for nome in ARQUIVOS}
+    calculos = modulo.carregar_dados(arquivos['calculos'])
+
+    def listar_calculos(propriedade_id=None):
+        if backend == 'sqlite':
+            linhas = armazenamento_sqlite.listar_calculos_com_nomes(
+                data_dir / armazenamento_sqlite.NOME_BANCO, propriedade_id)
+        else:
+            linhas = juntar_nomes(
+                filtrar_calculos(iterar_calculos(arquivos['calculos']), propriedade_id),
+                mapa_nomes(modulo.carregar_dados(arquivos['propriedades']), 'nome'),
+                mapa_nomes(modulo.carregar_dados(arquivos['veiculos']), 'tipo'),
+                mapa_nomes(modulo.carregar_dados(arquivos['produtos']), 'nome')
+            )
+        for _ in linhas:
+            pass
+
+    return [
+        *((f"carregar_dados[{nome}]", lambda arquivo=arquivo: modulo.carregar_dados(arquivo), tamanho)
+          for nome, arquivo in arquivos.items()),
+        ("salvar_dados[calculos]", lambda: modulo.salvar_dados(calculos, arquivos['calculos']), tamanho),
+        ("gerar_id[calculos]", lambda: gerar_id(calculos), tamanho),
+        ("listar_calculos", listar_calculos, tamanho),
+        ("listar_calculos[propriedade]", lambda: listar_calculos(1), tamanho),
+    ]
+
+
+def _operacoes_custo(tamanho, semente=SEMENTE):
+    """Fórmula de custo de calcular_transporte, item a item e vetorizada; não depende do backend"""
+    # Entradas montadas antes, para medir só a fórmula
+    rng = random.Random(semente)
+    entradas = [(rng.uniform(5, 800), rng.choice((800.0, 8000.0, 27000.0)), rng.uniform(0.8, 6.5),
+                 float(rng.randint(100, 60000))) for _ in range(tamanho)]
+    colunas = [list(coluna) for coluna in zip(*entradas)]
+
+    def custo_escalar():
+        for distancia, capacidade, custo_km, peso_total in entradas:
+            calcular_custos(distancia, capacidade, custo_km, peso_total)
+
+    return [
+        ("calcular_custos", custo_escalar, tamanho),
+        ("calcular_custos_lote", lambda: calcular_custos_lote(*colunas), tamanho),
+    ]
+
+
+def _medir_operacoes(operacoes, backend, tamanho, repeticoes, aquecimento, progresso):
+    resultados = []
+    for nome, funcao, registros in operacoes:
+        medicao = medir(funcao, repeticoes, aquecimento)
+        medicao.update({
+            'backend': backend,
+            'operacao': nome,
+            'tamanho': tamanho,
+            'registros_por_s': registros / medicao['mediana_s'] if medicao['mediana_s'] else None
+        })
+        resultados.append(medicao)
+        progresso(f"  {nome:<32} mediana {medicao['mediana_s'] * 1000:10.2f} ms")
+    return resultados
+
+
+def executar(tamanhos=TAMANHOS_PADRAO, backends=BACKENDS, repeticoes=REPETICOES, aquecimento=AQUECIMENTO,
+             semente=SEMENTE, manter=False, progresso=print):
+    """Roda os benchmarks para cada backend e tamanho e devolve o relatório (dicionário)
+
+    Os resultados do modelo de custo, que não dependem do armazenamento, têm backend None.
+    """
+    resultados = []
+    for backend in backends:
+        for tamanho in tamanhos:
+            data_dir = Path(tempfile.mkdtemp(prefix=f"benchmark_{backend}_{tamanho}_"))
+            try:
+                progresso(f"Gerando {tamanho} registros ({backend}) em {data_dir}...")
+                inicio = time.perf_counter()
+                gerar_dados(data_dir, tamanho, backend, semente)
+                progresso(f"  dados gerados em {time.perf_counter() - inicio:.1f} s")
+
+                resultados += _medir_operacoes(_operacoes_armazenamento(data_dir, backend, tamanho), backend,
+                                               tamanho, repeticoes, aquecimento, progresso)
+            finally:
+                armazenamento_sqlite.fechar(data_dir / armazenamento_sqlite.NOME_BANCO)
+                if manter:
+                    progresso(f"  dados mantidos em {data_dir}")
+                else:
+                    shutil.rmtree(data_dir, ignore_errors=True)
+
+    for tamanho in tamanhos:
+        progresso(f"Modelo de custo com {tamanho} cotações...")
+        resultados += _medir_operacoes(_operacoes_custo(tamanho, semente), None, tamanho, repeticoes, aquecimento,
+                                       progresso)
+
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'numpy': np.__version__ if np is not None else None,
+        'semente': semente,
+        'aquecimento': aquecimento,
+        'resultados': resultados
+    }
+
+
+def comparar(relatorio, anterior, tolerancia=TOLERANCIA_REGRESSAO):
+    """Operações cuja mediana piorou mais que `tolerancia` (fração) em relação ao relatório anterior"""
+    referencia = {(r['backend'], r['operacao'], r['tamanho']): r['mediana_s'] for r in anterior['resultados']}
+    regressoes = []
+    for resultado in relatorio['resultados']:
+        antes = referencia.get((resultado['backend'], resultado['operacao'], resultado['tamanho']))
+        if antes and resultado['mediana_s'] > antes * (1 + tolerancia):
+            regressoes.append({
+                'backend': resultado['backend'],
+                'operacao': resultado['operacao'],
+                'tamanho': resultado['tamanho'],
+                'mediana_anterior_s': antes,
+                'mediana_s': resultado['mediana_s'],
+                'variacao': resultado['mediana_s'] / antes - 1
+            })
+    return regressoes
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks do armazenamento e do modelo de custo")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_PADRAO),
+                        help="Quantidades de registros a gerar (ex.: 1000 10000 10000000)")
+    parser.add_argument('--backend', choices=BACKENDS, action='append',
+                        help="Armazenamento a medir (pode repetir; padrão: todos)")
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES, help="Medições por operação")
+    parser.add_argument('--aquecimento', type=int, default=AQUECIMENTO, help="Execuções descartadas antes de medir")
+    parser.add_argument('--semente', type=int, default=SEMENTE, help="Semente dos dados sintéticos")
+    parser.add_argument('--saida', help="Arquivo JSON do relatório (padrão: imprime na tela)")
+    parser.add_argument('--comparar', help="Relatório anterior; termina com código 1 se houver regressão")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_REGRESSAO,
+                        help="Piora tolerada na mediana antes de acusar regressão (0.2 = 20%%)")
+    parser.add_argument('--manter', action='store_true', help="Não apaga os diretórios de dados gerados")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    if args.repeticoes < 1:
+        print("Erro: --repeticoes deve ser pelo menos 1.")
+        return 2
+    # Mensagens de progresso vão para stderr quando o relatório sai na tela
+    progresso = print if args.saida else (lambda texto: print(texto, file=sys.stderr))
+    relatorio = executar(args.tamanhos, args.backend or BACKENDS, args.repeticoes, args.aquecimento,
+                         args.semente, args.manter, progresso)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            relatorio['regressoes'] = comparar(relatorio, json.load(f), args.tolerancia)
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        Path(args.saida).write_text(texto + '\n', encoding='utf-8')
+        print(f"Relatório gravado em {args.saida}")
+    else:
+        print(texto)
+
+    for regressao in relatorio.get('regressoes', []):
+        progresso(f"Regressão: {regressao['backend']} {regressao['operacao']} ({regressao['tamanho']}) "
+                  f"{regressao['variacao']:+.0%}")
+    return 1 if relatorio.get('regressoes') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Memoização das cotações de transporte, com descarte LRU e invalidação por entidade"""
+import os
+from collections import OrderedDict
+
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+
+TAMANHO_PADRAO = int(os.environ.get('TRANSPORTE_CACHE_TAMANHO', 1024))
+
+
+class CacheCotacoes:
+    """Cache LRU de resultados de calcular_custos
+
+    A chave contém todas as entradas de calcular_custos (distância, capacidade e custo por km
+    do veículo, peso e parâmetros), então uma entidade alterada por outro processo nunca devolve
+    a cotação antiga: os valores novos formam outra chave. Os ids das entidades também entram na
+    chave, para que invalidar() descarte logo as cotações que dependem de uma entidade alterada,
+    pelo índice reverso entidade -> chaves.
+    """
+
+    def __init__(self, tamanho_maximo=TAMANHO_PADRAO):
+        self.tamanho_maximo = tamanho_maximo
+        self._entradas = OrderedDict()
+        self._chaves_por_entidade = {}
+        self.acertos = 0
+        self.falhas = 0
+
+    @staticmethod
+    def _chave(prop, veic, prod, peso_total, parametros):
+        return (
+            prop['id'], veic['id'], prod['id'],
+            prop['distancia'], veic['capacidade'], veic['custo_km'], peso_total, parametros
+        )
+
+    @staticmethod
+    def _entidades(chave):
+        return (('propriedade', chave[0]), ('veiculo', chave[1]), ('produto', chave[2]))
+
+    def calcular(self, prop, veic, prod, peso_total, parametros=PARAMETROS_PADRAO):
+        """Devolve a cotação do cache ou a calcula (e guarda) se não houver"""
+        chave = self._chave(prop, veic, prod, peso_total, parametros)
+        resultado = self._entradas.get(chave)
+        if resultado is not None:
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return dict(resultado)
+
+        self.falhas += 1
+        resultado = calcular_custos(*chave[3:])
+        self._entradas[chave] = resultado
+        for entidade in self._entidades(chave):
+            self._chaves_por_entidade.setdefault(entidade, set()).add(chave)
+        if len(self._entradas) > self.tamanho_maximo:
+            antiga, _ = self._entradas.popitem(last=False)
+            self._desindexar(antiga)
+        return dict(resultado)
+
+    def _desindexar(self, chave):
+        for entidade in self._entidades(chave):
+            chaves = self._chaves_por_entidade.get(entidade)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._chaves_por_entidade[entidade]
+
+    def invalidar(self, tipo, id_item):
+        """Descarta só as cotações que dependem da entidade alterada"""
+        for chave in self._chaves_por_entidade.pop((tipo, id_item), set()):
+            self._entradas.pop(chave, None)
+            self._desindexar(chave)
+
+    def limpar(self):
+        self._entradas.clear()
+        self._chaves_por_entidade.clear()
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': self.acertos / total if total else 0.0,
+            'entradas': len(self._entradas),
+            'tamanho_maximo': self.tamanho_maximo
+        }
+
+
+cache_cotacoes = CacheCotacoes()
@@ -0,0 +1,156 @@
+"""Cálculo de transporte em lote (não interativo), vetorizado com NumPy quando disponível"""
+import csv
+import json
+from pathlib import Path
+
+from malha_viaria import com_distancias
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele o lote é calculado linha a linha
+    np = None
+
+CAMPOS_ENTRADA = ('propriedade_id', 'veiculo_id', 'produto_id', 'peso_total')
+CAMPOS_RESULTADO = ('viagens', 'distancia_total', 'tempo_total', 'custo_total')
+
+
+def calcular_custos_lote(distancias, capacidades, custos_km, pesos, parametros=PARAMETROS_PADRAO):
+    """Versão vetorizada de calcular_custos: recebe colunas e devolve colunas de resultado
+
+    As operações seguem exatamente a mesma ordem da fórmula escalar, de modo que os
+    resultados em ponto flutuante são idênticos aos de calcular_custos.
+    """
+    if np is None:
+        linhas = [calcular_custos(d, c, k, p, parametros) for d, c, k, p in zip(distancias, capacidades, custos_km, pesos)]
+        return {campo: [linha[campo] for linha in linhas] for campo in CAMPOS_RESULTADO}
+
+    distancias = np.asarray(distancias, dtype=np.float64)
+    capacidades = np.asarray(capacidades, dtype=np.float64)
+    custos_km = np.asarray(custos_km, dtype=np.float64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+
+    viagens = -np.floor_divide(-pesos, capacidades)  # Arredondamento para cima
+    distancia_total = viagens * 2 * distancias  # ida e volta
+
+    km_por_dia = parametros.velocidade_media * parametros.horas_dia_viagem
+    dias_viagem = distancia_total / km_por_dia
+    tempo_total = dias_viagem * (parametros.horas_dia_viagem + parametros.horas_paradas_dia)
+
+    custo_combustivel = custos_km * parametros.fator_combustivel * distancia_total
+    custo_manutencao = custo_combustivel * parametros.fator_manutencao
+    custo_motorista = parametros.motoristas * parametros.diaria_motorista * dias_viagem
+
+    return {
+        'viagens': viagens,
+        'distancia_total': distancia_total,
+        'tempo_total': tempo_total,
+        'custo_total': custo_combustivel + custo_manutencao + custo_motorista
+    }
+
+
+def _resolver_ids(ids, entidades, campos, rotulo):
+    """Converte ids de entidade em colunas com os campos pedidos, validando ids inexistentes"""
+    indice = {item['id']: item for item in entidades}
+    faltantes = [(linha, id_item) for linha, id_item in enumerate(ids) if id_item not in indice]
+    if faltantes:
+        exemplos = ", ".join(f"linha {linha + 1} (ID {id_item})" for linha, id_item in faltantes[:5])
+        raise ValueError(f"{rotulo} inexistente em {len(faltantes)} linha(s): {exemplos}")
+
+    if np is None:
+        return [[indice[id_item][campo] for id_item in ids] for campo in campos]
+
+    # Busca vetorizada: ids ordenados + searchsorted em vez de um dicionário por linha
+    ids_ordenados = np.array(sorted(indice), dtype=np.int64)
+    posicoes = np.searchsorted(ids_ordenados, np.asarray(ids, dtype=np.int64))
+    colunas = []
+    for campo in campos:
+        valores = np.array([indice[id_item][campo] for id_item in ids_ordenados.tolist()], dtype=np.float64)
+        colunas.append(valores[posicoes])
+    return colunas
+
+
+def calcular_lote(propriedade_ids, veiculo_ids, produto_ids, pesos, propriedades, veiculos, produtos,
+                  parametros=PARAMETROS_PADRAO):
+    """Calcula viagens, distância, tempo e custo para todas as linhas de uma só vez"""
+    tamanhos = {len(propriedade_ids), len(veiculo_ids), len(produto_ids), len(pesos)}
+    if len(tamanhos) != 1:
+        raise ValueError("As colunas do lote devem ter o mesmo tamanho.")
+
+    distancias, capacidades, custos_km = resolver_lote(propriedade_ids, veiculo_ids, produto_ids, propriedades,
+                                                       veiculos, produtos)
+    return calcular_custos_lote(distancias, capacidades, custos_km, pesos, parametros)
+
+
+def resolver_lote(propriedade_ids, veiculo_ids, produto_ids, propriedades, veiculos, produtos):
+    """Colunas de distância, capacidade e custo por km das linhas, validando ids e capacidades
+
+    A distância de cada propriedade é a mesma das demais cotações: pela malha viária, quando
+    calculada (ver malha_viaria.distancia_propriedade).
+    """
+    (distancias,) = _resolver_ids(propriedade_ids, com_distancias(propriedades), ('distancia',), "Propriedade")
+    capacidades, custos_km = _resolver_ids(veiculo_ids, veiculos, ('capacidade', 'custo_km'), "Veículo")
+    _resolver_ids(produto_ids, produtos, (), "Produto")
+
+    capacidade_por_id = {v['id']: v['capacidade'] for v in veiculos}
+    if any(capacidade_por_id[id_veic] <= 0 for id_veic in set(veiculo_ids)):
+        raise ValueError("Todos os veículos do lote devem ter capacidade maior que zero.")
+    return distancias, capacidades, custos_km
+
+
+def ler_lote(caminho, campos=CAMPOS_ENTRADA):
+    """Lê as colunas `campos` de um arquivo CSV ou JSON (ids inteiros, peso decimal)"""
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == '.json':
+        with open(caminho, 'r', encoding='utf-8') as f:
+            linhas = json.load(f)
+        if not isinstance(linhas, list):
+            raise ValueError(f"{caminho} deve conter uma lista de objetos.")
+    else:
+        with open(caminho, 'r', encoding='utf-8', newline='') as f:
+            linhas = list(csv.DictReader(f))
+
+    colunas = {campo: [] for campo in campos}
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            for campo in campos:
+                if campo.endswith('_id'):
+                    colunas[campo].append(int(linha[campo]))
+                else:
+                    colunas[campo].append(float(str(linha[campo]).replace(',', '.')))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Linha {numero} inválida em {caminho}: {e}")
+    return colunas
+
+
+def escrever_lote(caminho, entrada, resultado):
+    """Grava entrada e resultado do lote em CSV ou JSON, conforme a extensão"""
+    caminho = Path(caminho)
+    campos = CAMPOS_ENTRADA + CAMPOS_RESULTADO
+    colunas = [entrada[c] for c in CAMPOS_ENTRADA] + [_como_lista(resultado[c]) for c in CAMPOS_RESULTADO]
+    # viagens é inteiro no histórico de cálculos
+    colunas[len(CAMPOS_ENTRADA)] = [int(v) for v in colunas[len(CAMPOS_ENTRADA)]]
+
+    if caminho.suffix.lower() == '.json':
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump([dict(zip(campos, valores)) for valores in zip(*colunas)], f, ensure_ascii=False)
+    else:
+        with open(caminho, 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(campos)
+            escritor.writerows(zip(*colunas))
+
+
+def _como_lista(coluna):
+    return coluna.tolist() if hasattr(coluna, 'tolist') else list(coluna)
+
+
+def processar_arquivo_lote(entrada, saida, propriedades, veiculos, produtos):
+    """Lê um arquivo de lote, calcula todas as linhas e grava o resultado. Retorna o número de linhas"""
+    colunas = ler_lote(entrada)
+    resultado = calcular_lote(
+        colunas['propriedade_id'], colunas['veiculo_id'], colunas['produto_id'], colunas['peso_total'],
+        propriedades, veiculos, produtos
+    )
+    escrever_lote(saida, colunas, resultado)
+    return len(colunas['peso_total'])
@@ -0,0 +1,173 @@
+"""Varredura de cenários (análise de sensibilidade) sobre os parâmetros do modelo de custo"""
+from array import array
+import csv
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from calculo_lote import calcular_custos_lote, np
+from malha_viaria import com_distancias
+from modelo_custos import PARAMETROS_PADRAO
+
+PERCENTIS = (10, 50, 90)
+# Parâmetros que dividem no modelo de custo e precisam ser maiores que zero (os demais, apenas não negativos)
+POSITIVOS = ('velocidade_media', 'horas_dia_viagem')
+
+# Catálogo enviado uma única vez a cada processo (pelo initializer), não a cada bloco
+_catalogo = None
+
+
+def montar_grade(especificacao, base=PARAMETROS_PADRAO):
+    """Produto cartesiano dos valores de cada parâmetro, ex.: {"fator_combustivel": [0.9, 1.0, 1.1]}"""
+    nomes = list(especificacao)
+    desconhecidos = set(nomes) - set(base.como_dict())
+    if desconhecidos:
+        raise ValueError(f"Parâmetro(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+    valores = [_validar_eixo(nome, v if isinstance(v, list) else [v]) for nome, v in especificacao.items()]
+    return [base.com(**dict(zip(nomes, combinacao))) for combinacao in itertools.product(*valores)]
+
+
+def _validar_eixo(nome, valores):
+    """Confere os valores de um parâmetro da grade: números finitos, positivos onde o modelo divide"""
+    if not valores:
+        raise ValueError(f"{nome}: informe ao menos um valor.")
+    for valor in valores:
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+            raise ValueError(f"{nome}: {valor!r} não é um número válido.")
+        if nome in POSITIVOS and valor <= 0:
+            raise ValueError(f"{nome} deve ser maior que zero (recebido: {valor}).")
+        if valor < 0:
+            raise ValueError(f"{nome} não pode ser negativo (recebido: {valor}).")
+    return valores
+
+
+def carregar_grade(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        especificacao = json.load(f)
+    if not isinstance(especificacao, dict):
+        raise ValueError(f"{caminho} deve conter um objeto com listas de valores por parâmetro.")
+    return montar_grade(especificacao)
+
+
+def _iniciar_processo(catalogo):
+    global _catalogo
+    _catalogo = catalogo
+
+
+def _montar_catalogo(propriedades, veiculos, peso_total):
+    """Colunas (propriedade x veículo) usadas em todos os cenários"""
+    propriedades = com_distancias(propriedades)
+    veiculos = [v for v in veiculos if v['capacidade'] > 0]
+    pares = [(p, v) for p in propriedades for v in veiculos]
+    return {
+        'propriedades': len(propriedades),
+        'veiculos': len(veiculos),
+        'distancias': [p['distancia'] for p, _ in pares],
+        'capacidades': [v['capacidade'] for _, v in pares],
+        'custos_km': [v['custo_km'] for _, v in pares],
+        'pesos': [peso_total] * len(pares),
+    }
+
+
+def _avaliar_bloco(bloco):
+    """Para cada cenário do bloco, o custo de cada propriedade com o seu veículo mais barato
+
+    Com NumPy devolve uma matriz cenários x propriedades; sem ele, uma lista por cenário.
+    """
+    cat = _catalogo
+    if np is not None:
+        resultados = np.empty((len(bloco), cat['propriedades']))
+    else:
+        resultados = []
+    for linha, parametros in enumerate(bloco):
+        custos = calcular_custos_lote(cat['distancias'], cat['capacidades'], cat['custos_km'], cat['pesos'], parametros)
+        custos = custos['custo_total']
+        if np is not None:
+            resultados[linha] = custos.reshape(cat['propriedades'], cat['veiculos']).min(axis=1)
+        else:
+            n = cat['veiculos']
+            resultados.append([min(custos[i * n:(i + 1) * n]) for i in range(cat['propriedades'])])
+    return resultados
+
+
+def _resumir(propriedades, blocos, cenarios):
+    """Mínimo, média, máximo e percentis do custo de cada propriedade, a partir dos blocos recebidos
+
+    Os blocos são copiados um a um para uma única matriz float64 (cenários x propriedades) ou,
+    sem NumPy, para um array('d') por propriedade: o processo principal nunca guarda uma lista
+    de floats Python por cenário.
+    """
+    if np is not None:
+        custos = np.empty((cenarios, len(propriedades)))
+        inicio = 0
+        for bloco in blocos:
+            custos[inicio:inicio + len(bloco)] = bloco
+            inicio += len(bloco)
+        colunas = {'minimo': custos.min(axis=0), 'media': custos.mean(axis=0), 'maximo': custos.max(axis=0)}
+        # A matriz não é mais usada: os percentis podem reordená-la no lugar, sem cópia
+        for q, valores in zip(PERCENTIS, np.percentile(custos, PERCENTIS, axis=0, overwrite_input=True)):
+            colunas[f'p{q}'] = valores
+        colunas = {nome: valores.tolist() for nome, valores in colunas.items()}
+    else:
+        por_propriedade = [array('d') for _ in propriedades]
+        for bloco in blocos:
+            for cenario in bloco:
+                for coluna, custo in zip(por_propriedade, cenario):
+                    coluna.append(custo)
+        colunas = {nome: [] for nome in ('minimo', 'media', 'maximo', *(f'p{q}' for q in PERCENTIS))}
+        for coluna in por_propriedade:
+            ordenados = sorted(coluna)
+            colunas['minimo'].append(ordenados[0])
+            colunas['media'].append(sum(ordenados) / len(ordenados))
+            colunas['maximo'].append(ordenados[-1])
+            for q in PERCENTIS:
+                colunas[f'p{q}'].append(percentil(ordenados, q))
+
+    return [
+        {'propriedade_id': prop['id'], 'nome': prop['nome'], 'cenarios': cenarios,
+         **{nome: valores[indice] for nome, valores in colunas.items()}}
+        for indice, prop in enumerate(propriedades)
+    ]
+
+
+def percentil(ordenados, q):
+    """Percentil q (0-100) com interpolação linear sobre uma lista já ordenada"""
+    posicao = (len(ordenados) - 1) * q / 100
+    inferior = math.floor(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def varrer_cenarios(grade, propriedades, veiculos, peso_total, processos=None, tamanho_bloco=None):
+    """Avalia todos os cenários da grade para o catálogo inteiro e resume os custos por propriedade
+
+    Os cenários são divididos em blocos distribuídos por um pool de processos; dentro de cada
+    bloco o cálculo é vetorizado sobre todos os pares propriedade x veículo. Retorna, para cada
+    propriedade, mínimo, máximo, média e os percentis P10/P50/P90 do custo entre os cenários.
+    """
+    if not grade:
+        raise ValueError("A grade de cenários está vazia.")
+    catalogo = _montar_catalogo(propriedades, veiculos, peso_total)
+    if not catalogo['propriedades'] or not catalogo['veiculos']:
+        raise ValueError("É preciso ter propriedades e veículos (com capacidade) cadastrados.")
+
+    processos = processos or os.cpu_count() or 1
+    tamanho_bloco = tamanho_bloco or max(1, math.ceil(len(grade) / (processos * 4)))
+    blocos = [grade[i:i + tamanho_bloco] for i in range(0, len(grade), tamanho_bloco)]
+
+    if processos == 1 or len(blocos) == 1:
+        _iniciar_processo(catalogo)
+        return _resumir(propriedades, map(_avaliar_bloco, blocos), len(grade))
+    with ProcessPoolExecutor(processos, initializer=_iniciar_processo, initargs=(catalogo,)) as executor:
+        return _resumir(propriedades, executor.map(_avaliar_bloco, blocos), len(grade))
+
+
+def escrever_resumo(caminho, resumo):
+    """Grava o resumo por propriedade em CSV"""
+    with open(Path(caminho), 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(resumo[0]))
+        escritor.writeheader()
+        escritor.writerows(resumo)
@@ -0,0 +1,218 @@
+"""Cópia de segurança compacta de todos os dados, em JSON Lines comprimido com gzip
+
+O arquivo (.jsonl.gz) tem uma linha JSON por registro, com linhas de controle identificadas
+por chaves com '$':
+
+    {"$formato": "transporte_rural", "versao_esquema": 1, "criado_em": "17/10/2026 10:00"}
+    {"$tabela": "propriedades"}
+    {"id": 1, "nome": ...}
+    ...
+    {"$fim": {"contagens": {"propriedades": 1, ...}, "crc32": 1234567890}}
+
+O CRC32 cobre os bytes de todas as linhas anteriores à última. Gravação e restauração tratam um
+registro por vez, então a memória usada não depende do tamanho do histórico. A restauração
+grava tudo em arquivos temporários (ou em uma transação, no SQLite) e só substitui os dados
+depois de conferir as contagens e o CRC.
+"""
+import gzip
+import json
+import os
+import tempfile
+import zlib
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+
+import armazenamento
+import armazenamento_sqlite
+from armazenamento import (CALCULOS_FILE, CENTROS_FILE, DISTANCIAS_FILE, PRODUTOS_FILE, PROPRIEDADES_FILE,
+                           RESUMOS_FILE, VEICULOS_FILE, bloquear, confirmar_temporario, descartar_temporario,
+                           gravar_temporario, iterar_dados)
+from diario import iterar_calculos
+
+FORMATO = 'transporte_rural'
+VERSAO_ESQUEMA = 1
+NIVEL_COMPRESSAO = 6
+# Tabela -> arquivo de dados; distancias fica sempre em JSON (ver malha_viaria.MatrizDistancias)
+TABELAS = {
+    'propriedades': PROPRIEDADES_FILE,
+    'veiculos': VEICULOS_FILE,
+    'produtos': PRODUTOS_FILE,
+    'centros': CENTROS_FILE,
+    'calculos': CALCULOS_FILE,
+    'distancias': DISTANCIAS_FILE,
+}
+TABELAS_SEMPRE_JSON = ('distancias',)
+
+
+def _linha(objeto):
+    return json.dumps(objeto, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def _registros_tabela(tabela):
+    """Registros de uma tabela no armazenamento em uso, lidos sob demanda"""
+    arquivo = TABELAS[tabela]
+    if armazenamento.BACKEND == 'sqlite' and tabela not in TABELAS_SEMPRE_JSON:
+        return armazenamento_sqlite.iterar_dados(arquivo)
+    if tabela == 'calculos':
+        return iterar_calculos(arquivo)
+    return iterar_dados(arquivo) if arquivo.exists() else iter(())
+
+
+def gravar_copia(destino, nivel=NIVEL_COMPRESSAO):
+    """Grava a cópia de todas as tabelas em `destino`; devolve a quantidade de registros por tabela
+
+    O histórico é lido sob o seu bloqueio, para que snapshot e diário formem um estado só
+    (inclusões de outros processos esperam o fim da cópia do histórico).
+    """
+    destino = Path(destino)
+    descritor, temporario = tempfile.mkstemp(prefix=destino.name + '.', suffix='.tmp', dir=destino.parent)
+    contagens = {}
+    crc = 0
+    try:
+        with os.fdopen(descritor, 'wb') as bruto, gzip.GzipFile(fileobj=bruto, mode='wb', compresslevel=nivel) as f:
+            cabecalho = _linha({'$formato': FORMATO, 'versao_esquema': VERSAO_ESQUEMA,
+                                'criado_em': datetime.now().strftime("%d/%m/%Y %H:%M")})
+            f.write(cabecalho)
+            crc = zlib.crc32(cabecalho, crc)
+            for tabela, arquivo in TABELAS.items():
+                with bloquear(arquivo) if tabela == 'calculos' else nullcontext():
+                    linha = _linha({'$tabela': tabela})
+                    f.write(linha)
+                    crc = zlib.crc32(linha, crc)
+                    total = 0
+                    for registro in _registros_tabela(tabela):
+                        linha = _linha(registro)
+                        f.write(linha)
+                        crc = zlib.crc32(linha, crc)
+                        total += 1
+                    contagens[tabela] = total
+            f.write(_linha({'$fim': {'contagens': contagens, 'crc32': crc}}))
+        os.replace(temporario, destino)
+    except BaseException:
+        descartar_temporario(temporario)
+        raise
+    return contagens
+
+
+def registros_copia(origem):
+    """Percorre a cópia como pares (tabela, registro), conferindo formato, versão, contagens e CRC
+
+    A conferência final acontece depois do último registro: quem consome os pares só deve
+    considerar os dados válidos se a iteração terminar sem ValueError.
+    """
+    try:
+        with gzip.open(origem, 'rb') as f:
+            linhas = iter(f)
+            primeira = next(linhas, b'')
+            cabecalho = _ler_linha(primeira, 1)
+            if not isinstance(cabecalho, dict) or cabecalho.get('$formato') != FORMATO:
+                raise ValueError(f"{origem} não é uma cópia de segurança do simulador.")
+            if not isinstance(cabecalho.get('versao_esquema'), int) or cabecalho['versao_esquema'] > VERSAO_ESQUEMA:
+                raise ValueError(f"Versão de esquema {cabecalho.get('versao_esquema')} não suportada "
+                                 f"(esta versão lê até a {VERSAO_ESQUEMA}).")
+            crc = zlib.crc32(primeira)
+            contagens = {}
+            tabela = None
+            fim = None
+            for numero, linha in enumerate(linhas, start=2):
+                if fim is not None:
+                    raise ValueError(f"Linha {numero} de {origem} depois do fim da cópia.")
+                objeto = _ler_linha(linha, numero)
+                if isinstance(objeto, dict) and '$fim' in objeto:
+                    fim = objeto['$fim']
+                    continue
+                crc = zlib.crc32(linha, crc)
+                if isinstance(objeto, dict) and '$tabela' in objeto:
+                    tabela = objeto['$tabela']
+                    if tabela not in TABELAS or tabela in contagens:
+                        raise ValueError(f"Tabela inválida ou repetida na linha {numero}: {tabela}")
+                    contagens[tabela] = 0
+                    continue
+                if tabela is None:
+                    raise ValueError(f"Registro fora de uma tabela na linha {numero}.")
+                contagens[tabela] += 1
+                yield tabela, objeto
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        raise ValueError(f"{origem} está incompleto ou corrompido ({e}).")
+
+    if not isinstance(fim, dict):
+        raise ValueError(f"{origem} está incompleto (sem a linha final de conferência).")
+    if fim.get('crc32') != crc:
+        raise ValueError(f"CRC32 de {origem} não confere: o arquivo foi alterado ou corrompido.")
+    if fim.get('contagens') != contagens:
+        raise ValueError(f"As contagens de {origem} não conferem: {contagens} (esperado {fim.get('contagens')}).")
+
+
+def _ler_linha(linha, numero):
+    try:
+        return json.loads(linha)
+    except ValueError:
+        raise ValueError(f"Linha {numero} inválida na cópia de segurança.")
+
+
+def verificar_copia(origem):
+    """Confere a cópia inteira sem alterar os dados; devolve a quantidade de registros por tabela"""
+    contagens = dict.fromkeys(TABELAS, 0)
+    for tabela, _ in registros_copia(origem):
+        contagens[tabela] += 1
+    return contagens
+
+
+def restaurar_copia(origem):
+    """Substitui todos os dados pelos da cópia; devolve a quantidade de registros por tabela
+
+    Nada é alterado se a cópia estiver corrompida. Os totais dos relatórios (resumos.json e
+    resumos.jsonl) são apagados e recalculados no próximo uso.
+    """
+    contagens = dict.fromkeys(TABELAS, 0)
+    temporarios = {}
+
+    def contar(tabela, grupo):
+        for _, registro in grupo:
+            contagens[tabela] += 1
+            yield registro
+
+    with ExitStack() as bloqueios:
+        for arquivo in TABELAS.values():
+            bloqueios.enter_context(bloquear(arquivo))
+        try:
+            if armazenamento.BACKEND == 'sqlite':
+                def secoes_sqlite():
+                    for tabela, grupo in groupby(registros_copia(origem), key=lambda par: par[0]):
+                        if tabela in TABELAS_SEMPRE_JSON:
+                            temporarios[tabela] = gravar_temporario(contar(tabela, grupo), TABELAS[tabela])[0]
+                        else:
+                            yield TABELAS[tabela], contar(tabela, grupo)
+                    # Tabelas sem registros na cópia ficam vazias
+                    for tabela, arquivo in TABELAS.items():
+                        if tabela not in TABELAS_SEMPRE_JSON and not contagens[tabela]:
+                            yield arquivo, ()
+                armazenamento_sqlite.substituir_tabelas(secoes_sqlite())
+            else:
+                for tabela, grupo in groupby(registros_copia(origem), key=lambda par: par[0]):
+                    temporarios[tabela] = gravar_temporario(contar(tabela, grupo), TABELAS[tabela])[0]
+            for tabela, arquivo in TABELAS.items():
+                if tabela not in temporarios and (armazenamento.BACKEND != 'sqlite' or tabela in TABELAS_SEMPRE_JSON):
+                    temporarios[tabela] = gravar_temporario((), arquivo)[0]
+        except BaseException:
+            for temporario in temporarios.values():
+                descartar_temporario(temporario)
+            raise
+
+        # Cópia conferida: troca os arquivos. O diário do histórico antigo é esvaziado antes,
+        # para que seus cálculos não sejam somados aos restaurados.
+        diario = CALCULOS_FILE.with_suffix('.jsonl')
+        if 'calculos' in temporarios and diario.exists():
+            with open(diario, 'wb'):
+                pass
+        for tabela, temporario in temporarios.items():
+            confirmar_temporario(temporario, TABELAS[tabela])
+        with bloquear(RESUMOS_FILE):
+            for arquivo in (RESUMOS_FILE, RESUMOS_FILE.with_suffix('.jsonl')):
+                try:
+                    os.unlink(arquivo)
+                except FileNotFoundError:
+                    pass
+    return contagens
@@ -0,0 +1,272 @@
+"""Diário (journal) append-only em JSON Lines para o histórico de cálculos"""
+import json
+import os
+from pathlib import Path
+
+from armazenamento import (bloquear, confirmar_temporario, gravar_temporario, iterar_dados, salvar_dados,
+                           versao_arquivo)
+from repositorio import Repositorio, gravar_contador, ler_contador
+
+# Quantidade de registros no diário que dispara a compactação no arquivo principal
+LIMITE_COMPACTACAO = 1000
+
+
+class RepositorioDiario(Repositorio):
+    """Repositório cujas inclusões são anexadas a um diário .jsonl em vez de regravar o arquivo
+
+    O estado é o arquivo JSON principal (snapshot) mais os registros do diário. Cada nova
+    inclusão custa uma única escrita no fim do diário, independente do tamanho do histórico: o
+    maior id e as contagens ficam no arquivo lateral .seq (ver _estado), então incluir não exige
+    ler o histórico. Quando o diário passa de `limite_compactacao` registros (e do tamanho do
+    snapshot, para que cargas em massa não regravem o histórico inteiro a cada lote), ele é
+    incorporado ao snapshot.
+    """
+
+    def __init__(self, arquivo, limite_compactacao=LIMITE_COMPACTACAO):
+        super().__init__(arquivo)
+        self.arquivo_diario = self.arquivo.with_suffix('.jsonl')
+        self.limite_compactacao = limite_compactacao
+        self._registros_diario = 0
+        self._posicao_diario = 0
+
+    def _versao_disco(self):
+        try:
+            tamanho_diario = os.path.getsize(self.arquivo_diario)
+        except FileNotFoundError:
+            tamanho_diario = 0
+        return (versao_arquivo(self.arquivo), tamanho_diario)
+
+    def recarregar(self):
+        super().recarregar()
+        self._registros_diario = 0
+        self._posicao_diario = 0
+        self._incorporar_diario()
+
+    def _incorporar_diario(self, truncar=False):
+        """Lê os registros do diário a partir da última posição lida"""
+        itens, self._posicao_diario = self._ler_diario(self._posicao_diario, truncar)
+        for item in itens:
+            # Após uma compactação interrompida o diário pode repetir itens já no snapshot
+            if item.get('id', 0) in self._itens:
+                continue
+            self._itens[item['id']] = item
+            self._max_id = max(self._max_id, item['id'])
+            self._registros_diario += 1
+        self._versao = (self._versao[0], self._posicao_diario)
+
+    def _linhas_diario(self, inicio=0):
+        """Percorre as linhas completas do diário a partir do byte `inicio`, uma por vez
+
+        Produz (item, posição do fim da linha). Para numa última linha incompleta ou corrompida
+        (gravação interrompida); linhas inválidas no meio do diário são ignoradas com um aviso.
+        """
+        try:
+            f = open(self.arquivo_diario, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(inicio)
+            pos = inicio
+            invalida = None
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    break  # cauda sem '\n': a gravação não terminou
+                if invalida is not None:
+                    print(f"Aviso: linha inválida ignorada em {self.arquivo_diario} (byte {invalida}).")
+                    invalida = None
+                try:
+                    item = json.loads(linha)
+                except json.JSONDecodeError:
+                    invalida = pos  # se for a última linha, é tratada como cauda incompleta
+                else:
+                    yield item, pos + len(linha)
+                pos += len(linha)
+
+    def _ler_diario(self, inicio=0, truncar=False):
+        """Lê o diário a partir do byte `inicio`, parando numa última linha incompleta
+
+        Retorna os itens e a posição do fim da última linha completa. Com `truncar` (apenas sob
+        o bloqueio, quando nenhum outro processo pode estar escrevendo), a cauda incompleta de
+        uma gravação interrompida é removida.
+        """
+        itens = []
+        posicao = inicio
+        for item, posicao in self._linhas_diario(inicio):
+            itens.append(item)
+        if truncar:
+            self._truncar_cauda(posicao)
+        return itens, posicao
+
+    def _truncar_cauda(self, posicao):
+        """Remove o que houver no diário depois de `posicao`, para que as próximas linhas não fiquem grudadas nisso"""
+        try:
+            if os.path.getsize(self.arquivo_diario) > posicao:
+                with open(self.arquivo_diario, 'r+b') as f:
+                    f.truncate(posicao)
+        except FileNotFoundError:
+            pass
+
+    def _estado(self):
+        """Maior id, contagens e posição do fim do diário, sem carregar o histórico (sob o bloqueio)
+
+        O estado fica no arquivo .seq e vale enquanto o snapshot for o mesmo em que ele foi
+        gravado; linhas do diário além da posição registrada (de uma gravação interrompida antes
+        de atualizar o .seq) são lidas e somadas. Se o snapshot foi trocado por outro meio (ex.:
+        restauração de uma cópia de segurança), o estado é refeito percorrendo o histórico uma vez,
+        sem guardá-lo na memória. O maior id nunca diminui.
+        """
+        estado = ler_contador(self.arquivo)
+        versao = versao_arquivo(self.arquivo)
+        versao = list(versao) if versao else None
+        try:
+            tamanho_diario = os.path.getsize(self.arquivo_diario)
+        except FileNotFoundError:
+            tamanho_diario = 0
+        ultimo_id = estado.get('ultimo_id', 0)
+
+        if ('registros_snapshot' not in estado or estado.get('snapshot') != versao
+                or estado.get('posicao_diario', 0) > tamanho_diario):
+            maior_id_snapshot = registros = 0
+            if versao is not None:
+                for item in iterar_dados(self.arquivo):
+                    maior_id_snapshot = max(maior_id_snapshot, item.get('id', 0))
+                    registros += 1
+            estado = {'ultimo_id': max(ultimo_id, maior_id_snapshot), 'snapshot': versao,
+                      'maior_id_snapshot': maior_id_snapshot, 'registros_snapshot': registros,
+                      'posicao_diario': 0, 'registros_diario': 0}
+
+        posicao = estado['posicao_diario']
+        for item, posicao in self._linhas_diario(posicao):
+            # Itens repetidos do snapshot (compactação interrompida) não são contados de novo
+            if item.get('id', 0) > estado['maior_id_snapshot']:
+                estado['ultimo_id'] = max(estado['ultimo_id'], item['id'])
+                estado['registros_diario'] += 1
+        estado['posicao_diario'] = posicao
+        self._truncar_cauda(posicao)
+        return estado
+
+    def _garantir_carregado(self):
+        if self._itens is None or not self._alterado:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        """Atualiza o estado com o que outros processos gravaram desde a última leitura"""
+        if self._itens is None:
+            self.recarregar()
+            return
+        snapshot, tamanho_diario = self._versao_disco()
+        if snapshot != self._versao[0] or tamanho_diario < self._posicao_diario:
+            # O snapshot foi regravado (compactação de outro processo): relê tudo
+            if self._alterado:
+                self._reaplicar_pendentes()
+            else:
+                self.recarregar()
+        elif tamanho_diario != self._posicao_diario:
+            # Apenas novas linhas no diário: lê só o trecho acrescentado
+            self._incorporar_diario()
+
+    def adicionar(self, campos):
+        """Inclui o item anexando uma linha ao diário; o snapshot não precisa ser regravado"""
+        return self.adicionar_varios([campos])[0]
+
+    def adicionar_varios(self, lista_campos):
+        """Inclui os itens com uma única escrita (e um único fsync) no fim do diário
+
+        Os ids são gerados sob o bloqueio, a partir do estado do arquivo .seq, para que inclusões
+        simultâneas não recebam o mesmo id. O histórico não é carregado: se já estiver na
+        memória, os itens novos são lidos do diário na próxima consulta.
+        """
+        with bloquear(self.arquivo):
+            estado = self._estado()
+            itens = [{'id': estado['ultimo_id'] + posicao, **campos}
+                     for posicao, campos in enumerate(lista_campos, start=1)]
+            if not itens:
+                return itens
+            linhas = b''.join(json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n' for item in itens)
+            with open(self.arquivo_diario, 'ab') as f:
+                f.write(linhas)
+                f.flush()
+                os.fsync(f.fileno())
+                estado['posicao_diario'] = f.tell()
+            estado['ultimo_id'] = itens[-1]['id']
+            estado['registros_diario'] += len(itens)
+            gravar_contador(self.arquivo, estado)
+            if estado['registros_diario'] >= max(self.limite_compactacao, estado['registros_snapshot']):
+                self.compactar()
+        return itens
+
+    def _gravar(self):
+        """Incorpora o diário ao arquivo principal (gravação atômica) e esvazia o diário"""
+        ultimo_id = max(self._max_id, ler_contador(self.arquivo).get('ultimo_id', 0))
+        salvar_dados(list(self._itens.values()), self.arquivo)
+        # Se o processo cair aqui, os itens repetidos do diário são ignorados na leitura
+        with open(self.arquivo_diario, 'wb'):
+            pass
+        versao = versao_arquivo(self.arquivo)
+        gravar_contador(self.arquivo, {'ultimo_id': ultimo_id, 'snapshot': list(versao),
+                                       'maior_id_snapshot': max(self._itens, default=0),
+                                       'registros_snapshot': len(self._itens),
+                                       'posicao_diario': 0, 'registros_diario': 0})
+        self._contador = self._max_id = ultimo_id
+        self._registros_diario = 0
+        self._posicao_diario = 0
+        self._versao = self._versao_disco()
+        self._alterado = False
+        self._pendentes = []
+
+    def compactar(self):
+        """Grava o snapshot com tudo o que está no diário, sob o bloqueio do arquivo
+
+        Sem alterações pendentes na memória, o histórico é regravado registro a registro (ver
+        iterar_calculos), sem ser carregado: a memória usada não depende do seu tamanho.
+        """
+        with bloquear(self.arquivo):
+            if self._alterado:
+                self._sincronizar()
+                self._gravar()
+                return
+
+            estado = self._estado()
+            maior_id = 0
+
+            def registros():
+                nonlocal maior_id
+                for item in iterar_calculos(self.arquivo):
+                    maior_id = max(maior_id, item.get('id', 0))
+                    yield item
+
+            temporario, total = gravar_temporario(registros(), self.arquivo)
+            confirmar_temporario(temporario, self.arquivo)
+            # Se o processo cair aqui, os itens repetidos do diário são ignorados na leitura
+            with open(self.arquivo_diario, 'wb'):
+                pass
+            gravar_contador(self.arquivo, {'ultimo_id': max(estado['ultimo_id'], maior_id),
+                                           'snapshot': list(versao_arquivo(self.arquivo)),
+                                           'maior_id_snapshot': maior_id, 'registros_snapshot': total,
+                                           'posicao_diario': 0, 'registros_diario': 0})
+
+
+def iterar_calculos(arquivo):
+    """Percorre o histórico (snapshot + diário) em ordem, sem carregá-lo inteiro na memória"""
+    arquivo = Path(arquivo)
+    maior_id = 0
+    if arquivo.exists():
+        for item in iterar_dados(arquivo):
+            maior_id = max(maior_id, item.get('id', 0))
+            yield item
+
+    try:
+        diario = open(arquivo.with_suffix('.jsonl'), 'rb')
+    except FileNotFoundError:
+        return
+    with diario:
+        for linha in diario:
+            if not linha.endswith(b'\n'):
+                break  # cauda incompleta: ainda não foi gravada por inteiro
+            try:
+                item = json.loads(linha)
+            except json.JSONDecodeError:
+                continue
+            # Itens repetidos do snapshot (compactação interrompida) não são listados de novo
+            if item.get('id', 0) > maior_id:
+                yield item
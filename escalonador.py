@@ -0,0 +1,183 @@
+"""Escalonamento de coletas em vários dias pela frota, respeitando as janelas de colheita
+
+Cada serviço (propriedade, peso e janela de dias) é dividido em viagens de ida e volta. A
+simulação é orientada a eventos: uma fila de prioridade guarda o instante em que cada veículo
+fica livre; o primeiro veículo livre recebe uma viagem do serviço liberado com o prazo mais
+próximo (EDD) e, entre veículos livres ao mesmo tempo, fica o de menor custo por kg. O tempo
+das viagens é o do modelo de custo (55 km/h, 8h de estrada + 3h de paradas por dia).
+"""
+import csv
+import heapq
+import json
+import math
+from datetime import timedelta
+from pathlib import Path
+
+from listagem import ler_data
+from modelo_custos import PARAMETROS_PADRAO, custos_percurso
+
+CAMPOS_PLANO = ('dia', 'veiculo_id', 'servico', 'propriedade_id', 'peso', 'inicio_h', 'fim_h', 'distancia_total',
+                'custo_total')
+
+
+def ler_servicos(caminho):
+    """Lê os serviços de um CSV ou JSON com propriedade_id, peso_total, inicio e fim (dd/mm/aaaa)"""
+    caminho = Path(caminho)
+    if caminho.suffix.lower() == '.json':
+        with open(caminho, 'r', encoding='utf-8') as f:
+            linhas = json.load(f)
+        if not isinstance(linhas, list):
+            raise ValueError(f"{caminho} deve conter uma lista de objetos.")
+    else:
+        with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+            linhas = list(csv.DictReader(f))
+
+    servicos = []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            servico = {
+                'propriedade_id': int(linha['propriedade_id']),
+                'peso_total': float(str(linha['peso_total']).replace(',', '.')),
+                'inicio': ler_data(str(linha['inicio'])),
+                'fim': ler_data(str(linha['fim'])),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Linha {numero} inválida em {caminho}: {e}")
+        if servico['inicio'] is None or servico['fim'] is None or servico['fim'] < servico['inicio']:
+            raise ValueError(f"Linha {numero} de {caminho}: informe a janela (inicio <= fim).")
+        if servico['peso_total'] <= 0:
+            raise ValueError(f"Linha {numero} de {caminho}: o peso deve ser maior que zero.")
+        servicos.append(servico)
+    return servicos
+
+
+def escalonar(servicos, veiculos, distancias, data_inicio=None, parametros=PARAMETROS_PADRAO):
+    """Monta o plano dia a dia das viagens de todos os serviços
+
+    `servicos`: dicionários com propriedade_id, peso_total, inicio e fim (datas da janela).
+    `distancias`: propriedade_id -> km até o centro. O dia de trabalho tem horas_dia_viagem +
+    horas_paradas_dia horas; uma viagem que não termina no dia continua no seguinte, como no
+    cálculo de dias_viagem. Serviços que não cabem na janela são feitos assim mesmo e aparecem
+    em 'atrasados'. Retorna as viagens, o makespan, o custo e a utilização de cada veículo.
+    """
+    veiculos = [veic for veic in veiculos if veic['capacidade'] > 0]
+    if not veiculos:
+        raise ValueError("Nenhum veículo com capacidade maior que zero.")
+    if not servicos:
+        raise ValueError("Nenhum serviço para escalonar.")
+    data_inicio = data_inicio or min(servico['inicio'] for servico in servicos)
+    horas_dia = parametros.horas_dia_viagem + parametros.horas_paradas_dia
+
+    # Serviços ainda não liberados, em ordem de liberação; liberados, em ordem de prazo
+    restante = []
+    a_liberar = []
+    for indice, servico in enumerate(servicos):
+        if servico['propriedade_id'] not in distancias:
+            raise ValueError(f"Propriedade {servico['propriedade_id']} não encontrada.")
+        liberacao = max((servico['inicio'] - data_inicio).days, 0) * horas_dia
+        prazo = ((servico['fim'] - data_inicio).days + 1) * horas_dia
+        restante.append(servico['peso_total'])
+        a_liberar.append((liberacao, prazo, indice))
+    heapq.heapify(a_liberar)
+    liberados = []
+
+    livres = [(0.0, posicao) for posicao in range(len(veiculos))]  # (livre a partir de, veículo)
+    viagens = []
+    ocupado = [0.0] * len(veiculos)
+    viagens_veiculo = [0] * len(veiculos)
+    conclusao = [0.0] * len(servicos)
+    pendentes = len(servicos)
+
+    while pendentes:
+        agora, posicao = heapq.heappop(livres)
+        while a_liberar and a_liberar[0][0] <= agora:
+            _, prazo, indice = heapq.heappop(a_liberar)
+            heapq.heappush(liberados, (prazo, indice))
+        if not liberados:
+            # Nada liberado: o veículo espera pela próxima liberação
+            heapq.heappush(livres, (a_liberar[0][0], posicao))
+            continue
+
+        prazo, indice = liberados[0]
+        distancia = distancias[servicos[indice]['propriedade_id']]
+        # Entre os veículos livres neste instante, o de menor custo por kg para esta viagem
+        empatados = [posicao]
+        while livres and livres[0][0] <= agora:
+            empatados.append(heapq.heappop(livres)[1])
+
+        def custo_kg(posicao_veiculo):
+            veic = veiculos[posicao_veiculo]
+            custo = custos_percurso(2 * distancia, veic['custo_km'], parametros)['custo_total']
+            return custo / min(veic['capacidade'], restante[indice]), posicao_veiculo
+
+        escolhido = min(empatados, key=custo_kg)
+        for outro in empatados:
+            if outro != escolhido:
+                heapq.heappush(livres, (agora, outro))
+
+        veic = veiculos[escolhido]
+        peso = min(veic['capacidade'], restante[indice])
+        percurso = custos_percurso(2 * distancia, veic['custo_km'], parametros)
+        fim = agora + percurso['tempo_total']
+        viagens.append({
+            'dia': data_inicio + timedelta(days=int(agora // horas_dia)),
+            'veiculo_id': veic['id'],
+            'servico': indice,
+            'propriedade_id': servicos[indice]['propriedade_id'],
+            'peso': peso,
+            'inicio_h': agora,
+            'fim_h': fim,
+            'distancia_total': percurso['distancia_total'],
+            'custo_total': percurso['custo_total']
+        })
+        ocupado[escolhido] += percurso['tempo_total']
+        viagens_veiculo[escolhido] += 1
+        heapq.heappush(livres, (fim, escolhido))
+
+        restante[indice] -= peso
+        conclusao[indice] = max(conclusao[indice], fim)
+        if restante[indice] <= 1e-9:
+            heapq.heappop(liberados)
+            pendentes -= 1
+
+    makespan = max(viagem['fim_h'] for viagem in viagens)
+    atrasados = []
+    for indice, servico in enumerate(servicos):
+        prazo = ((servico['fim'] - data_inicio).days + 1) * horas_dia
+        if conclusao[indice] > prazo + 1e-9:
+            atrasados.append({'servico': indice, 'propriedade_id': servico['propriedade_id'],
+                              'atraso_dias': math.ceil((conclusao[indice] - prazo) / horas_dia)})
+
+    return {
+        'data_inicio': data_inicio,
+        'viagens': viagens,
+        'makespan_horas': makespan,
+        'makespan_dias': math.ceil(makespan / horas_dia),
+        'custo_total': sum(viagem['custo_total'] for viagem in viagens),
+        'utilizacao': [
+            {'veiculo_id': veic['id'], 'viagens': viagens_veiculo[posicao], 'horas': ocupado[posicao],
+             'utilizacao': ocupado[posicao] / makespan if makespan else 0.0}
+            for posicao, veic in enumerate(veiculos)
+        ],
+        'atrasados': atrasados
+    }
+
+
+def resumo_diario(plano):
+    """Viagens, kg e custo de cada dia do plano, com os veículos usados"""
+    dias = {}
+    for viagem in plano['viagens']:
+        dia = dias.setdefault(viagem['dia'], {'viagens': 0, 'peso': 0.0, 'custo_total': 0.0, 'veiculos': set()})
+        dia['viagens'] += 1
+        dia['peso'] += viagem['peso']
+        dia['custo_total'] += viagem['custo_total']
+        dia['veiculos'].add(viagem['veiculo_id'])
+    return sorted(dias.items())
+
+
+def escrever_plano(caminho, plano):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=CAMPOS_PLANO)
+        escritor.writeheader()
+        for viagem in plano['viagens']:
+            escritor.writerow({**viagem, 'dia': viagem['dia'].strftime("%d/%m/%Y")})
@@ -0,0 +1,207 @@
+"""Histórico de cálculos em colunas (array), com agregações e persistência em arquivo mapeado
+
+Cada cálculo ocupa 80 bytes (dez colunas de 8 bytes) em vez de um dicionário com dez chaves e
+a data em texto. A data é guardada em segundos desde 01/01/1970 (sem fuso, como o texto
+'dd/mm/aaaa HH:MM' gravado pelo simulador). Com NumPy instalado as agregações são vetorizadas;
+sem ele, são feitas em Python puro com os mesmos resultados.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele as agregações percorrem as colunas em Python
+    np = None
+
+# Nome do campo -> código de tipo do array ('q': inteiro de 8 bytes, 'd': float de 8 bytes)
+COLUNAS = (
+    ('id', 'q'),
+    ('propriedade_id', 'q'),
+    ('veiculo_id', 'q'),
+    ('produto_id', 'q'),
+    ('peso_total', 'd'),
+    ('viagens', 'q'),
+    ('distancia_total', 'd'),
+    ('custo_total', 'd'),
+    ('tempo_total', 'd'),
+    ('data_calculo', 'q'),
+)
+TAMANHO_VALOR = 8
+ASSINATURA = b'HISTCOL1'
+CABECALHO = struct.Struct('<8sQ')  # assinatura + quantidade de registros
+# Data ausente ou inválida (nunca gerada por uma data real, que tem segundos múltiplos de 60)
+SEM_DATA = -1
+
+EPOCA = datetime(1970, 1, 1)
+ORDINAL_EPOCA = EPOCA.toordinal()
+
+
+def data_para_epoca(texto):
+    """Converte 'dd/mm/aaaa HH:MM' em segundos desde 01/01/1970; SEM_DATA se não for uma data"""
+    try:
+        momento = datetime(int(texto[6:10]), int(texto[3:5]), int(texto[0:2]), int(texto[11:13] or 0),
+                           int(texto[14:16] or 0))
+    except (TypeError, ValueError):
+        return SEM_DATA
+    return int((momento - EPOCA).total_seconds())
+
+
+def epoca_para_data(segundos):
+    if segundos == SEM_DATA:
+        return None
+    return (EPOCA + timedelta(seconds=segundos)).strftime("%d/%m/%Y %H:%M")
+
+
+class HistoricoColunar:
+    """Cálculos guardados coluna a coluna, um array por campo
+
+    As colunas podem ser arrays próprios ou visões (memoryview) sobre um arquivo mapeado em
+    memória (ver carregar); neste caso a primeira inclusão copia as colunas para arrays.
+    """
+
+    def __init__(self):
+        self.colunas = {campo: array(tipo) for campo, tipo in COLUNAS}
+        self._mmap = None
+
+    def __len__(self):
+        return len(self.colunas['id'])
+
+    @classmethod
+    def de_calculos(cls, calculos):
+        """Monta o histórico a partir de um iterável de cálculos (dicionários), sem guardá-los"""
+        historico = cls()
+        for calc in calculos:
+            historico.adicionar(calc)
+        return historico
+
+    def _garantir_arrays(self):
+        if self._mmap is not None:
+            colunas = {campo: array(tipo, self.colunas[campo]) for campo, tipo in COLUNAS}
+            self.fechar()
+            self.colunas = colunas
+
+    def adicionar(self, calc):
+        self._garantir_arrays()
+        colunas = self.colunas
+        for campo, tipo in COLUNAS[:-1]:
+            valor = calc.get(campo)
+            colunas[campo].append(int(valor or 0) if tipo == 'q' else float(valor or 0.0))
+        colunas['data_calculo'].append(data_para_epoca(calc.get('data_calculo')))
+
+    def registro(self, posicao):
+        """Cálculo na posição `posicao`, no formato de dicionário usado no restante do programa"""
+        calc = {campo: self.colunas[campo][posicao] for campo, _ in COLUNAS}
+        calc['data_calculo'] = epoca_para_data(calc['data_calculo'])
+        return calc
+
+    def __iter__(self):
+        return (self.registro(posicao) for posicao in range(len(self)))
+
+    # --- Agregações ---
+
+    def custo_por_propriedade_mes(self):
+        """Custo total por (propriedade_id, ano, mês); cálculos sem data ficam de fora"""
+        colunas = self.colunas
+        if np is not None:
+            datas = np.frombuffer(colunas['data_calculo'], dtype=np.int64)
+            com_data = datas != SEM_DATA
+            meses = datas[com_data].astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+            propriedades = np.frombuffer(colunas['propriedade_id'], dtype=np.int64)[com_data]
+            custos = np.frombuffer(colunas['custo_total'], dtype=np.float64)[com_data]
+            chaves, posicoes = np.unique(np.stack([propriedades, meses], axis=1), axis=0, return_inverse=True)
+            totais = np.bincount(posicoes.ravel(), weights=custos, minlength=len(chaves))
+            return {(int(prop), 1970 + int(mes) // 12, int(mes) % 12 + 1): float(total)
+                    for (prop, mes), total in zip(chaves, totais)}
+
+        totais = {}
+        meses = {}  # dia desde 1970 -> (ano, mês), calculado uma vez por dia distinto
+        for prop, segundos, custo in zip(colunas['propriedade_id'], colunas['data_calculo'], colunas['custo_total']):
+            if segundos == SEM_DATA:
+                continue
+            dia = segundos // 86400
+            mes = meses.get(dia)
+            if mes is None:
+                data = date.fromordinal(ORDINAL_EPOCA + dia)
+                mes = meses[dia] = (data.year, data.month)
+            chave = (prop, *mes)
+            totais[chave] = totais.get(chave, 0.0) + custo
+        return totais
+
+    def custo_medio_kg_por_veiculo(self):
+        """Custo por kg transportado de cada veículo (custo total / peso total dos seus cálculos)"""
+        colunas = self.colunas
+        if np is not None:
+            veiculos = np.frombuffer(colunas['veiculo_id'], dtype=np.int64)
+            ids, posicoes = np.unique(veiculos, return_inverse=True)
+            custos = np.bincount(posicoes, weights=np.frombuffer(colunas['custo_total'], dtype=np.float64),
+                                 minlength=len(ids))
+            pesos = np.bincount(posicoes, weights=np.frombuffer(colunas['peso_total'], dtype=np.float64),
+                                minlength=len(ids))
+            return {int(veic): float(custo / peso) for veic, custo, peso in zip(ids, custos, pesos) if peso > 0}
+
+        custos = {}
+        pesos = {}
+        for veic, custo, peso in zip(colunas['veiculo_id'], colunas['custo_total'], colunas['peso_total']):
+            custos[veic] = custos.get(veic, 0.0) + custo
+            pesos[veic] = pesos.get(veic, 0.0) + peso
+        return {veic: custos[veic] / pesos[veic] for veic in custos if pesos[veic] > 0}
+
+    # --- Persistência ---
+
+    def salvar(self, arquivo):
+        """Grava as colunas em sequência, após um cabeçalho, em ordem de bytes little-endian"""
+        with open(arquivo, 'wb') as f:
+            f.write(CABECALHO.pack(ASSINATURA, len(self)))
+            for campo, tipo in COLUNAS:
+                coluna = array(tipo, self.colunas[campo])
+                if sys.byteorder == 'big':
+                    coluna.byteswap()
+                coluna.tofile(f)
+
+    @classmethod
+    def carregar(cls, arquivo):
+        """Abre um arquivo gravado por salvar() mapeado em memória, sem copiar as colunas
+
+        As páginas do arquivo só são lidas quando uma coluna é percorrida. Chame fechar() para
+        liberar o arquivo.
+        """
+        with open(arquivo, 'rb') as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        assinatura, quantidade = CABECALHO.unpack_from(mapa) if len(mapa) >= CABECALHO.size else (None, 0)
+        if assinatura != ASSINATURA:
+            mapa.close()
+            raise ValueError(f"{arquivo} não é um histórico colunar.")
+        if len(mapa) < CABECALHO.size + quantidade * TAMANHO_VALOR * len(COLUNAS):
+            mapa.close()
+            raise ValueError(f"{arquivo} está incompleto.")
+
+        historico = cls()
+        inicio = CABECALHO.size
+        for campo, tipo in COLUNAS:
+            fim = inicio + quantidade * TAMANHO_VALOR
+            if sys.byteorder == 'big':
+                coluna = array(tipo, mapa[inicio:fim])
+                coluna.byteswap()
+                historico.colunas[campo] = coluna
+            else:
+                historico.colunas[campo] = memoryview(mapa)[inicio:fim].cast(tipo)
+            inicio = fim
+        if sys.byteorder == 'big':
+            mapa.close()
+        else:
+            historico._mmap = mapa
+        return historico
+
+    def fechar(self):
+        """Libera o arquivo mapeado (as colunas carregadas dele deixam de valer)"""
+        if self._mmap is None:
+            return
+        for coluna in self.colunas.values():
+            if isinstance(coluna, memoryview):
+                coluna.release()
+        self.colunas = {campo: array(tipo) for campo, tipo in COLUNAS}
+        self._mmap.close()
+        self._mmap = None
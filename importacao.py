@@ -0,0 +1,275 @@
+"""Importação e exportação em massa: CSV, JSON Lines e o formato consolidado (como dados.json)
+
+Os arquivos são lidos e gravados item a item, com uso de memória constante. Na importação as
+linhas são validadas em lotes com as mesmas regras da API (servico.py) e cada lote é gravado
+com uma única escrita; linhas inválidas não interrompem a carga e vão para o relatório de erros.
+"""
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+
+from armazenamento import CALCULOS_FILE, iterar_secoes
+from diario import RepositorioDiario
+from repositorio import repositorio
+from servico import ENTIDADES, ErroServico, gravar_calculos, iterar_historico, validar_calculo, validar_campos
+
+FORMATOS = ('consolidado', 'jsonl', 'csv')
+TAMANHO_LOTE = 5000
+# Erros guardados na memória para exibir ao final; o relatório em arquivo recebe todos
+EXEMPLOS_ERROS = 20
+
+# Seção do arquivo -> entidade (None para o histórico de cálculos)
+SECOES = {'propriedades': 'propriedade', 'veiculos': 'veiculo', 'produtos': 'produto', 'centros': 'centro',
+          'calculos': None}
+# Nome de cada seção no formato consolidado (o mesmo de exportar_dados)
+CHAVES_CONSOLIDADO = {
+    'propriedades': 'propriedades',
+    'veiculos': 'veiculos',
+    'produtos': 'produtos',
+    'centros': 'centros',
+    'calculos': 'calculos_realizados',
+}
+COLUNAS = {
+    'propriedades': ('id', 'nome', 'localizacao', 'area_producao', 'distancia', 'latitude', 'longitude',
+                     'data_cadastro'),
+    'veiculos': ('id', 'tipo', 'capacidade', 'custo_km', 'data_cadastro'),
+    'produtos': ('id', 'nome', 'peso_cesto', 'data_cadastro'),
+    'centros': ('id', 'nome', 'localizacao', 'latitude', 'longitude', 'capacidade', 'data_cadastro'),
+    'calculos': ('id', 'propriedade_id', 'veiculo_id', 'produto_id', 'peso_total', 'viagens', 'distancia_total',
+                 'custo_total', 'tempo_total', 'data_calculo'),
+}
+CHAVES_ENTIDADE = {'propriedade_id': 'propriedade', 'veiculo_id': 'veiculo', 'produto_id': 'produto'}
+
+
+def detectar_formato(arquivo):
+    sufixo = Path(arquivo).suffix.lower()
+    if sufixo == '.csv':
+        return 'csv'
+    if sufixo in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if sufixo == '.json':
+        return 'consolidado'
+    raise ValueError(f"Formato de {arquivo} não reconhecido; use --formato ({', '.join(FORMATOS)}).")
+
+
+def _repositorio_secao(secao):
+    if SECOES[secao] is None:
+        return repositorio(CALCULOS_FILE, RepositorioDiario)
+    return repositorio(ENTIDADES[SECOES[secao]]['arquivo'])
+
+
+def iterar_registros(secao):
+    """Registros de uma seção; o histórico de cálculos é lido do disco sob demanda"""
+    if SECOES[secao] is not None:
+        return iter(_repositorio_secao(secao).listar())
+    return iterar_historico()
+
+
+# --- Exportação ---
+
+def exportar(destino, formato='consolidado'):
+    """Exporta todos os dados; devolve a quantidade de registros por seção
+
+    'consolidado' grava um único arquivo JSON; 'jsonl' e 'csv' gravam um arquivo por seção
+    (propriedades, veiculos, produtos, centros e calculos) dentro do diretório `destino`.
+    """
+    destino = Path(destino)
+    if formato == 'consolidado':
+        return exportar_consolidado(destino)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+    destino.mkdir(parents=True, exist_ok=True)
+    gravar = _gravar_csv if formato == 'csv' else _gravar_jsonl
+    return {secao: gravar(destino / f"{secao}.{formato}", secao, iterar_registros(secao)) for secao in SECOES}
+
+
+def exportar_consolidado(arquivo):
+    """Grava o arquivo no formato de dados.json (JSON indentado), um registro por vez"""
+    totais = {}
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        f.write('{')
+        for posicao, secao in enumerate(SECOES):
+            f.write(f'{"," if posicao else ""}\n  {json.dumps(CHAVES_CONSOLIDADO[secao])}: [')
+            total = 0
+            for registro in iterar_registros(secao):
+                texto = json.dumps(registro, ensure_ascii=False, indent=2).replace('\n', '\n    ')
+                f.write(f'{"," if total else ""}\n    {texto}')
+                total += 1
+            f.write('\n  ]' if total else ']')
+            totais[secao] = total
+        f.write('\n}\n')
+    return totais
+
+
+def _gravar_jsonl(arquivo, secao, registros):
+    total = 0
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        for registro in registros:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            total += 1
+    return total
+
+
+def _gravar_csv(arquivo, secao, registros):
+    total = 0
+    with open(arquivo, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUNAS[secao], extrasaction='ignore')
+        escritor.writeheader()
+        for registro in registros:
+            escritor.writerow(registro)
+            total += 1
+    return total
+
+
+# --- Importação ---
+
+def ler_registros(arquivo, formato, secao=None):
+    """Percorre o arquivo como (seção, número da linha, registro)
+
+    Linhas que não puderam ser lidas vêm com um ErroServico no lugar do registro.
+    """
+    if formato == 'consolidado':
+        secoes = {chave: secao for secao, chave in CHAVES_CONSOLIDADO.items()}
+        contagem = {}
+        for chave, registro in iterar_secoes(arquivo):
+            if chave in secoes:
+                contagem[chave] = contagem.get(chave, 0) + 1
+                yield secoes[chave], contagem[chave], registro
+        return
+
+    if secao is None:
+        secao = Path(arquivo).stem
+    if secao not in SECOES:
+        raise ValueError(f"Informe a seção do arquivo ({', '.join(SECOES)}).")
+
+    with open(arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+        if formato == 'csv':
+            leitor = csv.DictReader(f)
+            for registro in leitor:
+                yield secao, leitor.line_num, registro
+            return
+        for numero, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield secao, numero, json.loads(linha)
+            except json.JSONDecodeError as e:
+                yield secao, numero, ErroServico(f"JSON inválido: {e}")
+
+
+class _Importacao:
+    """Estado de uma importação: ids de origem já gravados, totais e erros"""
+
+    def __init__(self, relatorio=None):
+        # Id no arquivo -> id gravado, para os cálculos apontarem para as entidades importadas
+        self.ids = {entidade: {} for entidade in CHAVES_ENTIDADE.values()}
+        self.totais = {secao: 0 for secao in SECOES}
+        self.erros = 0
+        self.exemplos_erros = []
+        self.agora = datetime.now().strftime("%d/%m/%Y %H:%M")
+        self._arquivo_relatorio = open(relatorio, 'w', encoding='utf-8', newline='') if relatorio else None
+        self._relatorio = None
+        if self._arquivo_relatorio:
+            self._relatorio = csv.writer(self._arquivo_relatorio)
+            self._relatorio.writerow(('secao', 'linha', 'erro'))
+
+    def erro(self, secao, linha, mensagem):
+        self.erros += 1
+        if len(self.exemplos_erros) < EXEMPLOS_ERROS:
+            self.exemplos_erros.append({'secao': secao, 'linha': linha, 'erro': mensagem})
+        if self._relatorio:
+            self._relatorio.writerow((secao, linha, mensagem))
+
+    def fechar(self):
+        if self._arquivo_relatorio:
+            self._arquivo_relatorio.close()
+
+    def validar(self, secao, registro, indices=None):
+        """Converte um registro lido do arquivo nos campos a gravar (gera ErroServico se inválido)
+
+        `indices` traz, para os cálculos, o mapa id -> item de cada entidade já gravada.
+        """
+        if isinstance(registro, ErroServico):
+            raise registro
+        if not isinstance(registro, dict):
+            raise ErroServico("O registro deve ser um objeto.")
+        campos = {campo: valor for campo, valor in registro.items() if campo not in ('id', 'data_cadastro')}
+
+        entidade = SECOES[secao]
+        if entidade is not None:
+            campos = validar_campos(entidade, campos)
+            campos['data_cadastro'] = registro.get('data_cadastro') or self.agora
+            return campos
+
+        campos = validar_calculo(campos)
+        for chave, entidade in CHAVES_ENTIDADE.items():
+            importado = self.ids[entidade].get(campos[chave])
+            if importado is not None:
+                campos[chave] = importado
+            elif campos[chave] not in indices[entidade]:
+                raise ErroServico(ENTIDADES[entidade]['nao_encontrado'][:-1] + f" (ID {campos[chave]}).")
+        campos['data_calculo'] = campos.get('data_calculo') or self.agora
+        return campos
+
+    def gravar_lote(self, secao, lote):
+        """Valida as linhas do lote e grava as válidas com uma única escrita"""
+        indices = None
+        if SECOES[secao] is None:
+            indices = {entidade: repositorio(ENTIDADES[entidade]['arquivo']).indice()
+                       for entidade in CHAVES_ENTIDADE.values()}
+        validos = []
+        for linha, registro in lote:
+            try:
+                id_origem = registro.get('id') if isinstance(registro, dict) else None
+                validos.append((id_origem, self.validar(secao, registro, indices)))
+            except ErroServico as e:
+                self.erro(secao, linha, str(e))
+        if not validos:
+            return
+
+        entidade = SECOES[secao]
+        if entidade is None:
+            gravados = gravar_calculos([campos for _, campos in validos])
+        else:
+            itens = _repositorio_secao(secao)
+            gravados = itens.adicionar_varios([campos for _, campos in validos])
+            itens.salvar()
+        self.totais[secao] += len(gravados)
+
+        if entidade is not None:
+            for (id_origem, _), item in zip(validos, gravados):
+                try:
+                    self.ids[entidade][int(id_origem)] = item['id']
+                except (TypeError, ValueError):
+                    pass  # registro sem id no arquivo
+
+
+def importar(arquivo, formato=None, secao=None, relatorio=None, tamanho_lote=TAMANHO_LOTE):
+    """Importa os registros do arquivo em lotes de `tamanho_lote`
+
+    As entidades recebem novos ids; no formato consolidado (e em importações que trazem a coluna
+    id), os cálculos importados junto são ligados às entidades pelos ids do arquivo. Retorna os
+    totais importados por seção, a quantidade de linhas com erro e os primeiros erros.
+    """
+    formato = formato or detectar_formato(arquivo)
+    importacao = _Importacao(relatorio)
+    try:
+        lote = []
+        secao_lote = None
+        for secao_linha, linha, registro in ler_registros(arquivo, formato, secao):
+            if lote and (secao_linha != secao_lote or len(lote) >= tamanho_lote):
+                importacao.gravar_lote(secao_lote, lote)
+                lote = []
+            secao_lote = secao_linha
+            lote.append((linha, registro))
+        if lote:
+            importacao.gravar_lote(secao_lote, lote)
+    finally:
+        importacao.fechar()
+
+    return {
+        'importados': importacao.totais,
+        'erros': importacao.erros,
+        'exemplos_erros': importacao.exemplos_erros
+    }
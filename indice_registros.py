@@ -0,0 +1,223 @@
+"""Índice lateral (arquivo .idx) com a posição em bytes de cada registro de um arquivo de dados
+
+Com o índice, um registro é lido pelo id com um seek e um json.loads, sem interpretar o arquivo
+inteiro. O índice guarda a versão do arquivo principal e até onde o diário (.jsonl, ver
+diario.py) já foi indexado: se o arquivo principal muda o índice é refeito; se apenas o diário
+cresceu, só o trecho novo é lido.
+"""
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+from armazenamento import iterar_posicoes, versao_arquivo
+
+ASSINATURA = b'INDREG01'
+# assinatura, versão do arquivo principal (inode, mtime, tamanho), bytes do diário indexados, registros
+CABECALHO = struct.Struct('<8sqqqqq')
+# Origem de cada registro
+ARQUIVO_PRINCIPAL = 0
+DIARIO = 1
+
+
+class IndiceRegistros:
+    """Mapa id -> (origem, início, tamanho) dos registros de um arquivo JSON (lista) e do seu diário
+
+    Os ids ficam ordenados em um array; a busca por id é binária e a leitura de uma página
+    (posições consecutivas) não depende do tamanho do arquivo.
+    """
+
+    def __init__(self, arquivo):
+        self.arquivo = Path(arquivo)
+        self.arquivo_diario = self.arquivo.with_suffix('.jsonl')
+        self.arquivo_indice = self.arquivo.with_name(self.arquivo.name + '.idx')
+        self._colunas = None
+        self._versao = None
+        self._posicao_diario = 0
+
+    def _versoes_disco(self):
+        try:
+            tamanho_diario = os.path.getsize(self.arquivo_diario)
+        except FileNotFoundError:
+            tamanho_diario = 0
+        return versao_arquivo(self.arquivo) or (-1, -1, -1), tamanho_diario
+
+    def _atualizar(self, refazer=False):
+        """Garante que o índice em memória corresponde aos arquivos no disco (`refazer` ignora o .idx)"""
+        versao, tamanho_diario = self._versoes_disco()
+        if not refazer and (self._colunas is None or versao != self._versao):
+            self._ler_indice()
+        if refazer or self._colunas is None or versao != self._versao or tamanho_diario < self._posicao_diario:
+            # Sem índice gravado ou arquivo principal regravado (ex.: compactação do diário)
+            self._colunas = {'id': array('q'), 'origem': array('q'), 'inicio': array('q'), 'tamanho': array('q')}
+            self._versao = versao
+            self._posicao_diario = 0
+            self._indexar(iterar_posicoes(self.arquivo) if versao[0] != -1 else (), ARQUIVO_PRINCIPAL)
+        elif tamanho_diario == self._posicao_diario:
+            return
+        self._indexar_diario()
+        self._gravar_indice()
+
+    def _indexar(self, posicoes, origem):
+        colunas = self._colunas
+        maior_id = colunas['id'][-1] if colunas['id'] else 0
+        novos = []
+        for item, inicio, tamanho in posicoes:
+            id_item = item.get('id', 0) if isinstance(item, dict) else 0
+            # Itens do diário repetidos no arquivo principal (compactação interrompida) são ignorados
+            if origem == DIARIO and id_item <= maior_id:
+                continue
+            novos.append((id_item, origem, inicio, tamanho))
+        if any(novos[posicao][0] > novos[posicao + 1][0] for posicao in range(len(novos) - 1)):
+            novos.sort()
+        for id_item, origem_item, inicio, tamanho in novos:
+            colunas['id'].append(id_item)
+            colunas['origem'].append(origem_item)
+            colunas['inicio'].append(inicio)
+            colunas['tamanho'].append(tamanho)
+
+    def _indexar_diario(self):
+        """Indexa as linhas completas do diário a partir da última posição indexada"""
+        try:
+            with open(self.arquivo_diario, 'rb') as f:
+                f.seek(self._posicao_diario)
+                conteudo = f.read()
+        except FileNotFoundError:
+            return
+
+        posicoes = []
+        pos = 0
+        while True:
+            fim = conteudo.find(b'\n', pos)
+            if fim == -1:
+                break  # cauda sem '\n': a gravação não terminou
+            try:
+                posicoes.append((json.loads(conteudo[pos:fim]), self._posicao_diario + pos, fim - pos))
+            except json.JSONDecodeError:
+                pass
+            pos = fim + 1
+        self._posicao_diario += pos
+        self._indexar(posicoes, DIARIO)
+
+    def _ler_indice(self):
+        """Carrega o índice gravado em disco, se existir e for válido"""
+        try:
+            with open(self.arquivo_indice, 'rb') as f:
+                cabecalho = f.read(CABECALHO.size)
+                if len(cabecalho) < CABECALHO.size:
+                    return
+                assinatura, inode, mtime, tamanho, posicao_diario, quantidade = CABECALHO.unpack(cabecalho)
+                if assinatura != ASSINATURA:
+                    return
+                colunas = {}
+                for campo in ('id', 'origem', 'inicio', 'tamanho'):
+                    colunas[campo] = array('q')
+                    colunas[campo].fromfile(f, quantidade)
+                    if sys.byteorder == 'big':
+                        colunas[campo].byteswap()
+        except (OSError, EOFError):
+            return  # índice ausente ou incompleto: será refeito
+        self._colunas = colunas
+        self._versao = (inode, mtime, tamanho)
+        self._posicao_diario = posicao_diario
+
+    def _gravar_indice(self):
+        """Grava o índice ao lado do arquivo (troca atômica); sem permissão, ele fica só em memória"""
+        try:
+            descritor, temporario = tempfile.mkstemp(prefix=self.arquivo_indice.name + '.', suffix='.tmp',
+                                                     dir=self.arquivo_indice.parent)
+        except OSError:
+            return
+        try:
+            with os.fdopen(descritor, 'wb') as f:
+                f.write(CABECALHO.pack(ASSINATURA, *self._versao, self._posicao_diario, len(self)))
+                for campo in ('id', 'origem', 'inicio', 'tamanho'):
+                    coluna = array('q', self._colunas[campo])
+                    if sys.byteorder == 'big':
+                        coluna.byteswap()
+                    coluna.tofile(f)
+            if self.arquivo.exists():
+                # Mesmas permissões do arquivo de dados (mkstemp cria o temporário acessível só pelo dono)
+                os.chmod(temporario, os.stat(self.arquivo).st_mode & 0o777)
+            os.replace(temporario, self.arquivo_indice)
+        except OSError:
+            try:
+                os.unlink(temporario)
+            except OSError:
+                pass
+
+    def __len__(self):
+        return len(self._colunas['id']) if self._colunas is not None else 0
+
+    def _ler_posicoes(self, posicoes):
+        """Lê os registros nas posições do índice, abrindo cada arquivo uma única vez"""
+        colunas = self._colunas
+        abertos = {}
+        try:
+            itens = []
+            for posicao in posicoes:
+                origem = colunas['origem'][posicao]
+                if origem not in abertos:
+                    abertos[origem] = open(self.arquivo if origem == ARQUIVO_PRINCIPAL else self.arquivo_diario, 'rb')
+                f = abertos[origem]
+                f.seek(colunas['inicio'][posicao])
+                itens.append(json.loads(f.read(colunas['tamanho'][posicao])))
+            return itens
+        finally:
+            for f in abertos.values():
+                f.close()
+
+    def _consultar(self, posicoes_de):
+        """Lê os registros nas posições devolvidas por `posicoes_de()`
+
+        Se outro processo regravou o arquivo entre a verificação e a leitura, o índice é refeito
+        e a leitura, repetida.
+        """
+        for tentativa in range(2):
+            self._atualizar(refazer=tentativa > 0)
+            posicoes = posicoes_de()
+            try:
+                itens = self._ler_posicoes(posicoes)
+            except (OSError, ValueError):
+                itens = None
+            if itens is not None and all(item.get('id') == self._colunas['id'][posicao]
+                                         for item, posicao in zip(itens, posicoes)):
+                return itens
+        raise ValueError(f"Não foi possível ler {self.arquivo} pelo índice.")
+
+    def ler(self, id_item):
+        """Registro com o id, ou None se não existir"""
+        def posicoes():
+            ids = self._colunas['id']
+            posicao = bisect_left(ids, id_item)
+            return [posicao] if posicao < len(ids) and ids[posicao] == id_item else []
+        itens = self._consultar(posicoes)
+        return itens[0] if itens else None
+
+    def pagina(self, inicio, quantidade, recentes=False):
+        """Registros nas posições [inicio, inicio + quantidade) e o total de registros
+
+        A ordem é a dos ids; com `recentes`, do maior id para o menor.
+        """
+        def posicoes():
+            total = len(self)
+            if recentes:
+                return list(range(total - 1 - inicio, max(total - 1 - inicio - quantidade, -1), -1))
+            return list(range(inicio, min(inicio + quantidade, total)))
+        itens = self._consultar(posicoes)
+        return itens, len(self)
+
+
+_indices = {}
+
+
+def indice_registros(arquivo):
+    """Devolve o índice (único por arquivo) dos registros gravados em `arquivo`"""
+    chave = Path(arquivo).resolve()
+    if chave not in _indices:
+        _indices[chave] = IndiceRegistros(arquivo)
+    return _indices[chave]
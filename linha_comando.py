@@ -0,0 +1,182 @@
+"""Linha de comando não interativa de início rápido: cotar, listar, mostrar e exportar
+
+Ao contrário do programa principal, não prepara o diretório de dados nem carrega as tabelas ao
+iniciar: cada comando lê apenas o que usa. Registros avulsos e páginas da listagem são lidos
+pelo índice de posições (ver indice_registros), sem interpretar o arquivo inteiro; os módulos de
+cálculo e exportação só são importados pelos comandos que precisam deles.
+
+    python linha_comando.py mostrar 42
+    python linha_comando.py listar --recentes
+    python linha_comando.py cotar 2 1 1 800
+"""
+import argparse
+import sys
+
+import armazenamento
+from armazenamento import CALCULOS_FILE, CENTROS_FILE, PRODUTOS_FILE, PROPRIEDADES_FILE, VEICULOS_FILE
+from diario import RepositorioDiario
+from listagem import DESCONHECIDO, TAMANHO_PAGINA
+from repositorio import repositorio
+
+# Tipo de registro -> (arquivo, campo exibido como nome nas listagens)
+REGISTROS = {
+    'calculo': (CALCULOS_FILE, None),
+    'propriedade': (PROPRIEDADES_FILE, 'nome'),
+    'veiculo': (VEICULOS_FILE, 'tipo'),
+    'produto': (PRODUTOS_FILE, 'nome'),
+    'centro': (CENTROS_FILE, 'nome'),
+}
+# Os mesmos de importacao.FORMATOS; aquele módulo só é importado ao exportar
+FORMATOS_EXPORTACAO = ('consolidado', 'jsonl', 'csv')
+
+
+def _repositorio(tipo):
+    arquivo = REGISTROS[tipo][0]
+    return repositorio(arquivo, RepositorioDiario) if tipo == 'calculo' else repositorio(arquivo)
+
+
+def _nome(tipo, id_item, nomes):
+    """Nome de exibição da entidade, lido do arquivo uma única vez por id"""
+    chave = (tipo, id_item)
+    if chave not in nomes:
+        item = _repositorio(tipo).ler(id_item)
+        nomes[chave] = item.get(REGISTROS[tipo][1], DESCONHECIDO) if item else DESCONHECIDO
+    return nomes[chave]
+
+
+def _mostrar_calculo(calc, nomes):
+    print(f"ID {calc['id']}: {_nome('produto', calc['produto_id'], nomes)} de "
+          f"{_nome('propriedade', calc['propriedade_id'], nomes)} com {_nome('veiculo', calc['veiculo_id'], nomes)}")
+    print(f"  Peso: {calc['peso_total']} kg, Viagens: {calc['viagens']}, Distância total: {calc['distancia_total']:.2f} km")
+    print(f"  Custo: R$ {calc['custo_total']:.2f}, Tempo: {calc['tempo_total']:.2f} h")
+    if 'data_calculo' in calc:
+        print(f"  Data do cálculo: {calc['data_calculo']}")
+
+
+def _mostrar_entidade(item):
+    print(f"ID {item['id']}:")
+    for campo, valor in item.items():
+        if campo != 'id':
+            print(f"  {campo}: {'-' if valor is None else valor}")
+
+
+def comando_mostrar(tipo, id_item):
+    item = _repositorio(tipo).ler(id_item)
+    if item is None:
+        print(f"Registro {id_item} não encontrado ({tipo}).")
+        return 1
+    if tipo == 'calculo':
+        _mostrar_calculo(item, {})
+    else:
+        _mostrar_entidade(item)
+    return 0
+
+
+def comando_listar(tipo, pagina=1, recentes=False, tamanho=TAMANHO_PAGINA):
+    """Uma página de registros; apenas os registros da página (e os nomes que eles usam) são lidos"""
+    itens, total = _repositorio(tipo).ler_pagina((pagina - 1) * tamanho, tamanho, recentes)
+    if not itens:
+        print("Nenhum registro encontrado." if not total else f"A página {pagina} está vazia ({total} registro(s)).")
+        return 0 if not total else 1
+
+    nomes = {}
+    for item in itens:
+        if tipo == 'calculo':
+            _mostrar_calculo(item, nomes)
+        else:
+            nome = item.get(REGISTROS[tipo][1], DESCONHECIDO)
+            print(f"ID {item['id']}: {nome}")
+    print(f"Página {pagina} de {-(-total // tamanho)} ({total} registro(s))")
+    return 0
+
+
+def comando_cotar(propriedade_id, veiculo_id, produto_id, peso_total, centro_id=None, gravar=False):
+    """Custo do transporte; com `gravar`, o cálculo entra no histórico como no menu
+
+    A gravação só anexa o cálculo ao diário do histórico e aos pendentes dos relatórios (ver
+    diario.RepositorioDiario e relatorios.Resumos): nenhum dos dois é lido por inteiro.
+    """
+    import servico  # importado aqui: os demais comandos não precisam do modelo de custos
+    try:
+        custos = servico.calcular(propriedade_id, veiculo_id, produto_id, peso_total, salvar=gravar,
+                                  centro_id=centro_id)
+    except servico.ErroServico as e:
+        print(e)
+        return 1
+    print("Número de viagens: {}".format(custos['viagens']))
+    print("Distância total: {:.2f} km".format(custos['distancia_total']))
+    print("Tempo estimado total de transporte: {:.2f} horas (~{:.1f} dias)".format(custos['tempo_total'], custos['dias_viagem']))
+    print("Custo total estimado: R$ {:.2f}".format(custos['custo_total']))
+    if gravar:
+        print(f"Cálculo salvo com o ID {custos['id']}.")
+    return 0
+
+
+def comando_exportar(destino, formato):
+    from importacao import exportar  # importado aqui pelo mesmo motivo de comando_cotar
+    try:
+        totais = exportar(destino, formato)
+    except (OSError, ValueError) as e:
+        print(f"Erro na exportação: {e}")
+        return 1
+    for secao, total in totais.items():
+        print(f"  {secao}: {total} registro(s)")
+    print(f"Dados exportados para: {destino}")
+    return 0
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Consultas rápidas ao Simulador de Logística de Transporte Rural")
+    parser.add_argument('--backend', choices=armazenamento.BACKENDS, default=armazenamento.BACKEND,
+                        help="Armazenamento dos dados (padrão: variável TRANSPORTE_BACKEND ou 'json')")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    parser_cotar = subparsers.add_parser('cotar', aliases=['quote'], help="Custo do transporte de uma carga")
+    parser_cotar.add_argument('propriedade', type=int, help="ID da propriedade")
+    parser_cotar.add_argument('veiculo', type=int, help="ID do veículo")
+    parser_cotar.add_argument('produto', type=int, help="ID do produto")
+    parser_cotar.add_argument('peso', type=float, help="Peso total a ser transportado (kg)")
+    parser_cotar.add_argument('--centro', type=int, help="ID do centro de destino (distância pela malha viária)")
+    parser_cotar.add_argument('--gravar', action='store_true', help="Grava o cálculo no histórico")
+
+    parser_listar = subparsers.add_parser('listar', aliases=['list'], help="Uma página de cálculos ou cadastros")
+    parser_listar.add_argument('tipo', nargs='?', choices=list(REGISTROS), default='calculo',
+                               help="Tipo de registro (padrão: calculo)")
+    parser_listar.add_argument('--pagina', type=int, default=1, help="Número da página")
+    parser_listar.add_argument('--recentes', action='store_true', help="Do maior ID para o menor")
+
+    parser_mostrar = subparsers.add_parser('mostrar', aliases=['show'], help="Um registro pelo ID")
+    parser_mostrar.add_argument('id', type=int, help="ID do registro")
+    parser_mostrar.add_argument('--tipo', choices=list(REGISTROS), default='calculo',
+                                help="Tipo de registro (padrão: calculo)")
+
+    parser_exportar = subparsers.add_parser('exportar', aliases=['export'],
+                                            help="Exporta todos os dados (consolidado, JSON Lines ou CSV)")
+    parser_exportar.add_argument('destino', help="Arquivo .json (consolidado) ou diretório (jsonl/csv, um arquivo por seção)")
+    parser_exportar.add_argument('--formato', choices=FORMATOS_EXPORTACAO, default='consolidado',
+                                 help="Formato (padrão: consolidado)")
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    armazenamento.BACKEND = args.backend
+
+    try:
+        if args.comando in ('cotar', 'quote'):
+            return comando_cotar(args.propriedade, args.veiculo, args.produto, args.peso, args.centro, args.gravar)
+        if args.comando in ('listar', 'list'):
+            if args.pagina < 1:
+                parser.error("a página deve ser maior que zero")
+            return comando_listar(args.tipo, args.pagina, args.recentes)
+        if args.comando in ('mostrar', 'show'):
+            return comando_mostrar(args.tipo, args.id)
+        return comando_exportar(args.destino, args.formato)
+    except (armazenamento.DadosCorrompidos, ValueError) as e:
+        print(f"Erro: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Filtros, junção de nomes e paginação da listagem de cálculos"""
+from datetime import datetime
+from itertools import islice
+
+TAMANHO_PAGINA = 20
+DESCONHECIDO = "Desconhecido"
+
+
+def chave_data(data_texto):
+    """Converte 'dd/mm/aaaa HH:MM' em 'aaaammddHHMM', que pode ser comparado como texto"""
+    return data_texto[6:10] + data_texto[3:5] + data_texto[0:2] + data_texto[11:13] + data_texto[14:16]
+
+
+def chave_periodo(data_inicio=None, data_fim=None):
+    """Limites de data (datetime.date) convertidos para o formato de chave_data"""
+    inicio = data_inicio.strftime("%Y%m%d") + "0000" if data_inicio else None
+    fim = data_fim.strftime("%Y%m%d") + "2359" if data_fim else None
+    return inicio, fim
+
+
+def ler_data(texto):
+    """Lê uma data 'dd/mm/aaaa'. Retorna None para texto vazio"""
+    texto = texto.strip()
+    if not texto:
+        return None
+    return datetime.strptime(texto, "%d/%m/%Y").date()
+
+
+def filtrar_calculos(calculos, propriedade_id=None, veiculo_id=None, produto_id=None,
+                     data_inicio=None, data_fim=None):
+    """Filtra um iterável de cálculos por entidade e período, sem materializar a lista"""
+    inicio, fim = chave_periodo(data_inicio, data_fim)
+    for calc in calculos:
+        if propriedade_id is not None and calc['propriedade_id'] != propriedade_id:
+            continue
+        if veiculo_id is not None and calc['veiculo_id'] != veiculo_id:
+            continue
+        if produto_id is not None and calc['produto_id'] != produto_id:
+            continue
+        if no_periodo(calc, inicio, fim):
+            yield calc
+
+
+def no_periodo(calc, inicio, fim):
+    """Indica se a data do cálculo está entre as chaves `inicio` e `fim` (ambas opcionais)"""
+    if not inicio and not fim:
+        return True
+    chave = chave_data(calc.get('data_calculo', ''))
+    return not ((inicio and chave < inicio) or (fim and chave > fim))
+
+
+def mapa_nomes(itens, campo):
+    """Mapa id -> nome usado na junção da listagem"""
+    return {item['id']: item[campo] for item in itens}
+
+
+def juntar_nomes(calculos, nomes_propriedades, tipos_veiculos, nomes_produtos):
+    """Junção por hash: associa a cada cálculo os nomes de propriedade, veículo e produto"""
+    for calc in calculos:
+        yield (
+            calc,
+            nomes_propriedades.get(calc['propriedade_id'], DESCONHECIDO),
+            tipos_veiculos.get(calc['veiculo_id'], DESCONHECIDO),
+            nomes_produtos.get(calc['produto_id'], DESCONHECIDO)
+        )
+
+
+def paginar(iteravel, tamanho=TAMANHO_PAGINA):
+    """Agrupa um iterável em páginas (listas) de até `tamanho` itens, sob demanda"""
+    iterador = iter(iteravel)
+    while True:
+        pagina = list(islice(iterador, tamanho))
+        if not pagina:
+            return
+        yield pagina
@@ -0,0 +1,255 @@
+"""Malha viária local: distâncias por estrada entre propriedades e centros de distribuição
+
+A malha é lida de uma lista de arestas (por exemplo, extraída do OpenStreetMap) e, opcionalmente,
+das coordenadas dos nós. As distâncias propriedade -> centro são calculadas com Dijkstra (uma
+busca por centro atende todas as propriedades) e gravadas em uma matriz; cada cotação consulta
+a matriz em O(1), sem refazer o caminho mínimo.
+"""
+import csv
+import heapq
+import math
+from bisect import bisect_left
+
+from armazenamento import DISTANCIAS_FILE, bloquear, carregar_dados, salvar_dados, versao_arquivo
+from roteirizacao import FATOR_RODOVIARIO, RAIO_TERRA_KM, distancia_haversine, tem_coordenadas
+
+KM_POR_GRAU_LATITUDE = math.pi * RAIO_TERRA_KM / 180
+
+
+class MalhaViaria:
+    """Grafo de estradas com pesos em km
+
+    Guarda, para cada nó, as arestas que chegam a ele; a busca a partir de um centro percorre
+    a malha no sentido inverso e obtém de uma vez a distância de todos os nós até o centro
+    (o que respeita as vias de mão única).
+    """
+
+    def __init__(self):
+        self._chegadas = {}
+        self.coordenadas = {}
+        self._por_latitude = None
+        self._latitudes = None
+
+    def __len__(self):
+        return len(self._chegadas)
+
+    def adicionar_aresta(self, origem, destino, km, mao_unica=False):
+        if km < 0:
+            raise ValueError(f"Aresta {origem} -> {destino} com distância negativa.")
+        self._chegadas.setdefault(origem, [])
+        self._chegadas.setdefault(destino, []).append((origem, km))
+        if not mao_unica:
+            self._chegadas[origem].append((destino, km))
+
+    def adicionar_no(self, no, latitude, longitude):
+        self.coordenadas[no] = (latitude, longitude)
+        self._por_latitude = None
+
+    @classmethod
+    def carregar(cls, arquivo_arestas, arquivo_nos=None):
+        """Lê a malha de arquivos CSV
+
+        Arestas: colunas origem, destino, distancia (km) e, opcional, mao_unica (1/0).
+        Nós: colunas no, latitude, longitude (necessárias para localizar propriedades e centros).
+        """
+        malha = cls()
+        with open(arquivo_arestas, 'r', encoding='utf-8-sig', newline='') as f:
+            for linha in csv.DictReader(f):
+                try:
+                    malha.adicionar_aresta(linha['origem'].strip(), linha['destino'].strip(),
+                                           float(linha['distancia']), (linha.get('mao_unica') or '0').strip() == '1')
+                except (KeyError, AttributeError, ValueError) as e:
+                    raise ValueError(f"Aresta inválida em {arquivo_arestas}: {linha} ({e})")
+        if arquivo_nos:
+            with open(arquivo_nos, 'r', encoding='utf-8-sig', newline='') as f:
+                for linha in csv.DictReader(f):
+                    try:
+                        malha.adicionar_no(linha['no'].strip(), float(linha['latitude']), float(linha['longitude']))
+                    except (KeyError, AttributeError, ValueError) as e:
+                        raise ValueError(f"Nó inválido em {arquivo_nos}: {linha} ({e})")
+        return malha
+
+    def no_mais_proximo(self, latitude, longitude):
+        """Nó com coordenadas mais próximo do ponto, e a distância em linha reta até ele (km)
+
+        Os nós ficam ordenados por latitude; a busca parte da latitude do ponto e para quando a
+        diferença de latitude sozinha já supera a melhor distância encontrada.
+        """
+        if self._por_latitude is None:
+            self._por_latitude = sorted((lat, lon, no) for no, (lat, lon) in self.coordenadas.items())
+            self._latitudes = [lat for lat, _, _ in self._por_latitude]
+        if not self._por_latitude:
+            return None, math.inf
+
+        melhor, melhor_km = None, math.inf
+        inicio = bisect_left(self._latitudes, latitude)
+        for passo, fim in ((1, len(self._por_latitude)), (-1, -1)):
+            posicao = inicio if passo == 1 else inicio - 1
+            while posicao != fim:
+                lat, lon, no = self._por_latitude[posicao]
+                if abs(lat - latitude) * KM_POR_GRAU_LATITUDE > melhor_km:
+                    break
+                km = distancia_haversine(latitude, longitude, lat, lon)
+                if km < melhor_km:
+                    melhor, melhor_km = no, km
+                posicao += passo
+        return melhor, melhor_km
+
+    def distancias_ate(self, destino):
+        """Dijkstra: menor distância (km) de cada nó alcançável até `destino`"""
+        distancias = {destino: 0.0}
+        fila = [(0.0, destino)]
+        while fila:
+            km, no = heapq.heappop(fila)
+            if km > distancias[no]:
+                continue  # entrada antiga: o nó já foi alcançado por um caminho menor
+            for vizinho, km_aresta in self._chegadas.get(no, ()):
+                novo = km + km_aresta
+                if novo < distancias.get(vizinho, math.inf):
+                    distancias[vizinho] = novo
+                    heapq.heappush(fila, (novo, vizinho))
+        return distancias
+
+
+def _localizar(malha, item, fator_rodoviario):
+    """Nó da malha de uma propriedade ou centro e o acesso até ele (linha reta x fator rodoviário)"""
+    if item.get('no') is not None:
+        return str(item['no']), 0.0
+    if not tem_coordenadas(item):
+        return None, None
+    no, km = malha.no_mais_proximo(item['latitude'], item['longitude'])
+    return no, km * fator_rodoviario
+
+
+def calcular_matriz(malha, propriedades, centros, fator_rodoviario=FATOR_RODOVIARIO):
+    """Distância por estrada de cada propriedade até cada centro: {(propriedade_id, centro_id): km}
+
+    Propriedades e centros são ligados ao nó mais próximo (ou ao nó do campo 'no'); o trecho até
+    o nó entra na distância. Pares sem caminho na malha, ou sem localização, ficam de fora.
+    """
+    locais = {}
+    for prop in propriedades:
+        no, acesso = _localizar(malha, prop, fator_rodoviario)
+        if no is not None:
+            locais[prop['id']] = (no, acesso)
+
+    matriz = {}
+    for centro in centros:
+        no_centro, acesso_centro = _localizar(malha, centro, fator_rodoviario)
+        if no_centro is None:
+            continue
+        distancias = malha.distancias_ate(no_centro)
+        for propriedade_id, (no, acesso) in locais.items():
+            km = distancias.get(no)
+            if km is not None:
+                matriz[(propriedade_id, centro['id'])] = acesso + km + acesso_centro
+    return matriz
+
+
+def ler_centros(arquivo):
+    """Centros de distribuição de um CSV com as colunas id, nome e latitude/longitude ou no"""
+    centros = []
+    with open(arquivo, 'r', encoding='utf-8-sig', newline='') as f:
+        for linha in csv.DictReader(f):
+            try:
+                centro = {'id': int(linha['id']), 'nome': (linha.get('nome') or '').strip(),
+                          'no': (linha.get('no') or '').strip() or None, 'latitude': None, 'longitude': None}
+                if linha.get('latitude') and linha.get('longitude'):
+                    centro['latitude'] = float(linha['latitude'])
+                    centro['longitude'] = float(linha['longitude'])
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Centro inválido em {arquivo}: {linha} ({e})")
+            centros.append(centro)
+    return centros
+
+
+class MatrizDistancias:
+    """Matriz propriedade x centro gravada em disco, relida apenas quando o arquivo muda"""
+
+    def __init__(self, arquivo=DISTANCIAS_FILE):
+        self.arquivo = arquivo
+        self._distancias = None
+        self._mais_proximo = None
+        self._versao = None
+
+    def _carregar(self):
+        versao = versao_arquivo(self.arquivo)
+        if self._distancias is not None and versao == self._versao:
+            return
+        self._versao = versao
+        self._distancias = {}
+        self._mais_proximo = {}
+        for linha in carregar_dados(self.arquivo):
+            self._indexar(linha['propriedade_id'], linha['centro_id'], linha['distancia'])
+
+    def _indexar(self, propriedade_id, centro_id, km):
+        self._distancias[(propriedade_id, centro_id)] = km
+        atual = self._mais_proximo.get(propriedade_id)
+        if atual is None or km < atual[1]:
+            self._mais_proximo[propriedade_id] = (centro_id, km)
+
+    def gravar(self, matriz):
+        salvar_dados([{'propriedade_id': p, 'centro_id': c, 'distancia': km} for (p, c), km in matriz.items()],
+                     self.arquivo)
+        self._distancias = None
+
+    def descartar(self, propriedade_id=None, centro_id=None):
+        """Remove da matriz as distâncias da propriedade e/ou do centro (ex.: após alterá-los ou removê-los)
+
+        Sem as linhas, a propriedade volta a usar a distância cadastrada até o próximo comando
+        malha. Retorna a quantidade de distâncias removidas.
+        """
+        with bloquear(self.arquivo):
+            linhas = carregar_dados(self.arquivo)
+            mantidas = [linha for linha in linhas
+                        if linha['propriedade_id'] != propriedade_id and linha['centro_id'] != centro_id]
+            if len(mantidas) != len(linhas):
+                salvar_dados(mantidas, self.arquivo)
+                self._distancias = None
+        return len(linhas) - len(mantidas)
+
+    def __len__(self):
+        self._carregar()
+        return len(self._distancias)
+
+    def distancia(self, propriedade_id, centro_id):
+        """Distância por estrada (km) ou None se o par não estiver na matriz"""
+        self._carregar()
+        return self._distancias.get((propriedade_id, centro_id))
+
+    def mais_proximo(self, propriedade_id):
+        """(centro_id, km) do centro mais próximo da propriedade, ou None"""
+        self._carregar()
+        return self._mais_proximo.get(propriedade_id)
+
+    def distancia_propriedade(self, prop, centro_id=None):
+        """Distância (km) usada nas cotações da propriedade
+
+        É a distância por estrada até o centro `centro_id` ou, sem ele, até o centro mais
+        próximo; sem a propriedade na matriz, é a distância cadastrada nela. Gera ValueError se
+        `centro_id` for informado e o par não estiver na matriz.
+        """
+        if centro_id is not None:
+            km = self.distancia(prop['id'], centro_id)
+            if km is None:
+                raise ValueError(f"Não há distância pela malha viária da propriedade {prop['id']} ao centro {centro_id}.")
+            return km
+        mais_proximo = self.mais_proximo(prop['id'])
+        return mais_proximo[1] if mais_proximo else prop['distancia']
+
+
+matriz_distancias = MatrizDistancias()
+
+
+def distancia_propriedade(prop, centro_id=None):
+    """Distância usada nas cotações da propriedade, pela matriz gravada (ver MatrizDistancias.distancia_propriedade)
+
+    Todas as formas de cotar (menu, servidor, lote, cenários, Monte Carlo, rotas e escalonador)
+    usam esta função, para que a mesma cotação dê o mesmo resultado em qualquer uma delas.
+    """
+    return matriz_distancias.distancia_propriedade(prop, centro_id)
+
+
+def com_distancias(propriedades):
+    """Cópias das propriedades com 'distancia' trocada pela usada nas cotações (ver distancia_propriedade)"""
+    return [{**prop, 'distancia': distancia_propriedade(prop)} for prop in propriedades]
@@ -0,0 +1,224 @@
+"""Instrumentação opcional das operações de armazenamento e de cálculo
+
+Ativada pela variável de ambiente TRANSPORTE_METRICAS com o caminho do arquivo de saída:
+
+    TRANSPORTE_METRICAS=metricas.prom python resolucao_problema_logistico.py servidor
+
+Para cada operação decorada com medir() são contadas as chamadas, o tempo (wall clock), os
+bytes lidos e gravados, os registros e as falhas. Um arquivo .jsonl recebe uma linha JSON por
+operação com os totais acumulados (log estruturado, anexado); qualquer outro nome recebe um
+snapshot no formato texto do Prometheus, regravado por inteiro. A saída é gravada ao fim do processo e, em processos longos
+como o servidor, a cada INTERVALO_GRAVACAO segundos; '{pid}' no caminho separa os arquivos de
+processos diferentes. Sem a variável, medir() devolve a própria função, sem custo algum.
+"""
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ARQUIVO = os.environ.get('TRANSPORTE_METRICAS') or None
+ATIVO = ARQUIVO is not None
+INTERVALO_GRAVACAO = 10.0
+
+# Campo do contador -> (nome da métrica no Prometheus, tipo, descrição)
+CONTADORES = {
+    'chamadas': ('transporte_chamadas_total', 'counter', "Chamadas da operação"),
+    'falhas': ('transporte_falhas_total', 'counter', "Chamadas que terminaram com exceção"),
+    'segundos': ('transporte_segundos_total', 'counter', "Tempo total gasto na operação (s)"),
+    'segundos_max': ('transporte_segundos_max', 'gauge', "Maior tempo de uma chamada (s)"),
+    'bytes_lidos': ('transporte_bytes_lidos_total', 'counter', "Bytes lidos dos arquivos de dados"),
+    'bytes_gravados': ('transporte_bytes_gravados_total', 'counter', "Bytes gravados nos arquivos de dados"),
+    'registros': ('transporte_registros_total', 'counter', "Registros lidos, gravados ou produzidos"),
+}
+CO_GENERATOR = 0x20  # inspect.CO_GENERATOR, sem importar o inspect
+
+_contadores = {}
+_trava = threading.Lock()
+_ultima_gravacao = time.monotonic()
+
+
+def _tamanho(arquivo):
+    try:
+        return os.path.getsize(arquivo)
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
+def _quantidade(valor):
+    return len(valor) if isinstance(valor, (list, tuple, dict)) else 0
+
+
+def volume_leitura(argumentos, resultado):
+    """Volume de carregar_dados(arquivo): o arquivo inteiro é lido"""
+    return _tamanho(argumentos.get('arquivo')), 0, _quantidade(resultado)
+
+
+def volume_gravacao(argumentos, resultado):
+    """Volume de salvar_dados(dados, arquivo): o tamanho do arquivo gravado"""
+    return 0, _tamanho(argumentos.get('arquivo')), _quantidade(argumentos.get('dados'))
+
+
+def volume_percurso(argumentos, resultado):
+    """Volume de um gerador que percorre `arquivo` (os registros são os itens produzidos)"""
+    return _tamanho(argumentos.get('arquivo')), 0, 0
+
+
+def volume_registros(argumentos, resultado):
+    """Volume de salvar_dados(dados, arquivo) sem arquivo próprio (ex.: tabela do SQLite)"""
+    return 0, 0, _quantidade(argumentos.get('dados'))
+
+
+def volume_unitario(argumentos, resultado):
+    """Volume de uma operação que produz um único registro (ex.: uma cotação)"""
+    return 0, 0, 1
+
+
+def _argumentos(funcao, posicionais, nomeados):
+    """Argumentos da chamada pelo nome dos parâmetros (sem os valores padrão)"""
+    codigo = funcao.__code__
+    return {**dict(zip(codigo.co_varnames[:codigo.co_argcount], posicionais)), **nomeados}
+
+
+def _registrar(operacao, segundos, bytes_lidos=0, bytes_gravados=0, registros=0, falhou=False):
+    global _ultima_gravacao
+    with _trava:
+        contador = _contadores.get(operacao)
+        if contador is None:
+            contador = _contadores[operacao] = dict.fromkeys(CONTADORES, 0)
+        contador['chamadas'] += 1
+        contador['falhas'] += falhou
+        contador['segundos'] += segundos
+        contador['segundos_max'] = max(contador['segundos_max'], segundos)
+        contador['bytes_lidos'] += bytes_lidos
+        contador['bytes_gravados'] += bytes_gravados
+        contador['registros'] += registros
+        gravar_agora = time.monotonic() - _ultima_gravacao >= INTERVALO_GRAVACAO
+        if gravar_agora:
+            _ultima_gravacao = time.monotonic()
+    if gravar_agora:
+        _gravar_sem_falhar()
+
+
+def medir(operacao=None, volume=None):
+    """Decorador que mede a função como `operacao` (padrão: módulo.função)
+
+    `volume(argumentos, resultado)` devolve (bytes lidos, bytes gravados, registros); sem ele,
+    os registros são o tamanho do resultado. Em geradores, o tempo é apenas o gasto dentro do
+    gerador (não o de quem consome os itens) e os registros são os itens produzidos. Com a
+    instrumentação desligada, a função é devolvida sem alteração.
+    """
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+        nome = operacao or f"{funcao.__module__}.{funcao.__name__}"
+
+        def medir_volume(posicionais, nomeados, resultado):
+            if volume is None:
+                return 0, 0, _quantidade(resultado)
+            return volume(_argumentos(funcao, posicionais, nomeados), resultado)
+
+        if funcao.__code__.co_flags & CO_GENERATOR:
+            @functools.wraps(funcao)
+            def gerador_medido(*posicionais, **nomeados):
+                segundos = 0.0
+                itens = 0
+                falhou = False
+                iterador = funcao(*posicionais, **nomeados)
+                try:
+                    while True:
+                        inicio = time.perf_counter()
+                        try:
+                            item = next(iterador)
+                        except StopIteration:
+                            return
+                        except BaseException:
+                            falhou = True
+                            raise
+                        finally:
+                            segundos += time.perf_counter() - inicio
+                        itens += 1
+                        yield item
+                finally:
+                    iterador.close()
+                    lidos, gravados, registros = medir_volume(posicionais, nomeados, None)
+                    _registrar(nome, segundos, lidos, gravados, registros or itens, falhou)
+            return gerador_medido
+
+        @functools.wraps(funcao)
+        def funcao_medida(*posicionais, **nomeados):
+            inicio = time.perf_counter()
+            try:
+                resultado = funcao(*posicionais, **nomeados)
+            except BaseException:
+                _registrar(nome, time.perf_counter() - inicio, falhou=True)
+                raise
+            segundos = time.perf_counter() - inicio
+            _registrar(nome, segundos, *medir_volume(posicionais, nomeados, resultado))
+            return resultado
+        return funcao_medida
+    return decorador
+
+
+def resumo():
+    """Cópia dos contadores: operação -> {chamadas, falhas, segundos, ..., registros}"""
+    with _trava:
+        return {operacao: dict(contador) for operacao, contador in _contadores.items()}
+
+
+def formatar_prometheus(contadores):
+    """Texto no formato de exposição do Prometheus (uma série por operação)"""
+    linhas = []
+    for campo, (metrica, tipo, descricao) in CONTADORES.items():
+        linhas.append(f"# HELP {metrica} {descricao}")
+        linhas.append(f"# TYPE {metrica} {tipo}")
+        for operacao, contador in sorted(contadores.items()):
+            linhas.append(f'{metrica}{{operacao="{operacao}"}} {contador[campo]!r}')
+    return '\n'.join(linhas) + '\n'
+
+
+def gravar(arquivo=None):
+    """Grava os contadores atuais em `arquivo` (padrão: o de TRANSPORTE_METRICAS)"""
+    arquivo = arquivo or ARQUIVO
+    if not arquivo:
+        return
+    arquivo = arquivo.replace('{pid}', str(os.getpid()))
+    contadores = resumo()
+    if arquivo.endswith('.jsonl'):
+        momento = datetime.now().isoformat(timespec='seconds')
+        linhas = ''.join(json.dumps({'momento': momento, 'pid': os.getpid(), 'operacao': operacao, **contador},
+                                    ensure_ascii=False) + '\n'
+                         for operacao, contador in sorted(contadores.items()))
+        with open(arquivo, 'a', encoding='utf-8') as f:
+            f.write(linhas)
+        return
+
+    # Troca atômica: um coletor lendo o arquivo nunca vê um snapshot pela metade
+    diretorio = os.path.dirname(os.path.abspath(arquivo))
+    descritor, temporario = tempfile.mkstemp(prefix=os.path.basename(arquivo) + '.', suffix='.tmp', dir=diretorio)
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            f.write(formatar_prometheus(contadores))
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, arquivo)
+    except BaseException:
+        try:
+            os.unlink(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def _gravar_sem_falhar():
+    """Gravação automática: um erro de disco não deve interromper a operação medida"""
+    try:
+        gravar()
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar as métricas em {ARQUIVO}: {e}")
+
+
+if ATIVO:
+    import atexit
+    atexit.register(_gravar_sem_falhar)
@@ -0,0 +1,58 @@
+"""Modelo de custo do transporte rural usado pelo simulador"""
+from dataclasses import asdict, dataclass, replace
+
+
+@dataclass(frozen=True)
+class ParametrosCusto:
+    """Parâmetros do modelo de custo; os valores padrão são os usados pelo menu
+
+    Tempo estimado considerando velocidade média de 55km/h, 8h/dia de estrada e 3h de paradas;
+    2 motoristas a R$250/dia; manutenção igual a 1x o combustível. `fator_combustivel`
+    multiplica o custo por km do veículo (variação no preço do combustível).
+    """
+    velocidade_media: float = 55
+    horas_dia_viagem: float = 8
+    horas_paradas_dia: float = 3
+    diaria_motorista: float = 250
+    motoristas: int = 2
+    fator_manutencao: float = 1
+    fator_combustivel: float = 1
+
+    def com(self, **valores):
+        """Cópia dos parâmetros com alguns valores trocados"""
+        return replace(self, **valores)
+
+    def como_dict(self):
+        return asdict(self)
+
+
+PARAMETROS_PADRAO = ParametrosCusto()
+
+
+def calcular_custos(distancia, capacidade, custo_km, peso_total, parametros=PARAMETROS_PADRAO):
+    """Calcula viagens, distância, tempo e custos de um transporte (ida e volta)"""
+    viagens = -(-peso_total // capacidade)  # Arredondamento para cima
+    distancia_total = viagens * 2 * distancia  # ida e volta
+
+    return {'viagens': viagens, **custos_percurso(distancia_total, custo_km, parametros)}
+
+
+def custos_percurso(distancia_total, custo_km, parametros=PARAMETROS_PADRAO):
+    """Tempo e custos de percorrer `distancia_total` km com um veículo de custo `custo_km`"""
+    km_por_dia = parametros.velocidade_media * parametros.horas_dia_viagem
+    dias_viagem = distancia_total / km_por_dia
+    tempo_total_horas = dias_viagem * (parametros.horas_dia_viagem + parametros.horas_paradas_dia)
+
+    custo_combustivel = custo_km * parametros.fator_combustivel * distancia_total
+    custo_manutencao = custo_combustivel * parametros.fator_manutencao
+    custo_motorista = parametros.motoristas * parametros.diaria_motorista * dias_viagem
+
+    return {
+        'distancia_total': distancia_total,
+        'dias_viagem': dias_viagem,
+        'tempo_total': tempo_total_horas,
+        'custo_combustivel': custo_combustivel,
+        'custo_manutencao': custo_manutencao,
+        'custo_motorista': custo_motorista,
+        'custo_total': custo_combustivel + custo_manutencao + custo_motorista
+    }
@@ -0,0 +1,233 @@
+"""Estimativa de incerteza por Monte Carlo: percentis de custo e tempo de cotações
+
+Velocidade média, custo por km (fator_combustivel), horas de parada e carga por viagem
+(fator_carga, fração da capacidade do veículo) são sorteados de distribuições configuráveis, em
+JSON, por exemplo:
+
+    {"velocidade_media": {"tipo": "triangular", "minimo": 40, "moda": 55, "maximo": 65},
+     "fator_combustivel": {"tipo": "normal", "media": 1.0, "desvio": 0.1, "minimo": 0.7},
+     "fator_carga": {"tipo": "uniforme", "minimo": 0.85, "maximo": 1.0},
+     "diaria_motorista": 280}
+
+Um número é um valor fixo; parâmetros não informados usam DISTRIBUICOES_PADRAO. Cada cotação
+recebe as suas próprias amostras. O sorteio é vetorizado com NumPy (obrigatório neste módulo)
+e dividido em blocos de cotações com sementes derivadas da semente informada: com a mesma
+semente, o resultado é o mesmo em qualquer quantidade de processos.
+"""
+import csv
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from calculo_lote import calcular_custos_lote, np
+from cenarios import PERCENTIS
+from modelo_custos import PARAMETROS_PADRAO
+
+AMOSTRAS_PADRAO = 10000
+# Elementos (cotações x amostras) sorteados de uma vez em cada bloco; limita a memória usada
+ELEMENTOS_BLOCO = 500000
+DISTRIBUICOES_PADRAO = {
+    'velocidade_media': {'tipo': 'triangular', 'minimo': 40, 'moda': 55, 'maximo': 65},
+    'fator_combustivel': {'tipo': 'normal', 'media': 1.0, 'desvio': 0.1, 'minimo': 0.7, 'maximo': 1.3},
+    'horas_paradas_dia': {'tipo': 'triangular', 'minimo': 2, 'moda': 3, 'maximo': 5},
+    'fator_carga': {'tipo': 'uniforme', 'minimo': 0.85, 'maximo': 1.0},
+}
+# Tipo -> campos obrigatórios ('minimo' e 'maximo' são opcionais na normal e limitam o sorteio)
+TIPOS = {
+    'fixo': ('valor',),
+    'uniforme': ('minimo', 'maximo'),
+    'triangular': ('minimo', 'moda', 'maximo'),
+    'normal': ('media', 'desvio'),
+}
+# Parâmetros que precisam ser maiores que zero (os demais, apenas não negativos)
+POSITIVOS = ('velocidade_media', 'horas_dia_viagem', 'fator_carga')
+CAMPOS_RESUMO = ('media', 'p10', 'p50', 'p90')
+
+# Colunas das cotações enviadas uma única vez a cada processo (pelo initializer)
+_cotacoes = None
+
+
+def _exigir_numpy():
+    if np is None:
+        raise ValueError("A simulação de Monte Carlo precisa do NumPy (pip install numpy).")
+
+
+def _limites(distribuicao):
+    """Menor e maior valor que a distribuição pode sortear"""
+    if distribuicao['tipo'] == 'fixo':
+        return distribuicao['valor'], distribuicao['valor']
+    return distribuicao.get('minimo', -math.inf), distribuicao.get('maximo', math.inf)
+
+
+def _validar_distribuicao(nome, especificacao):
+    """Converte a especificação de um parâmetro (número ou objeto com 'tipo') em distribuição"""
+    if isinstance(especificacao, (int, float)) and not isinstance(especificacao, bool):
+        especificacao = {'tipo': 'fixo', 'valor': especificacao}
+    if not isinstance(especificacao, dict) or especificacao.get('tipo') not in TIPOS:
+        raise ValueError(f"Distribuição inválida para {nome}: use um número ou um objeto com 'tipo' "
+                         f"({', '.join(TIPOS)}).")
+
+    distribuicao = {'tipo': especificacao['tipo']}
+    campos = TIPOS[especificacao['tipo']] + (('minimo', 'maximo') if especificacao['tipo'] == 'normal' else ())
+    for campo in campos:
+        if campo not in especificacao:
+            if campo in TIPOS[especificacao['tipo']]:
+                raise ValueError(f"Distribuição {especificacao['tipo']} de {nome} sem o campo '{campo}'.")
+            continue
+        valor = especificacao[campo]
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+            raise ValueError(f"O campo '{campo}' da distribuição de {nome} deve ser um número.")
+        distribuicao[campo] = float(valor)
+
+    tipo = distribuicao['tipo']
+    inferior, superior = _limites(distribuicao)
+    if inferior > superior or (tipo == 'uniforme' and inferior == superior):
+        raise ValueError(f"Distribuição de {nome}: o mínimo deve ser menor que o máximo.")
+    if tipo == 'triangular' and not inferior <= distribuicao['moda'] <= superior:
+        raise ValueError(f"Distribuição de {nome}: a moda deve ficar entre o mínimo e o máximo.")
+    if tipo == 'normal' and distribuicao['desvio'] < 0:
+        raise ValueError(f"Distribuição de {nome}: o desvio não pode ser negativo.")
+    if nome in POSITIVOS and inferior <= 0:
+        raise ValueError(f"{nome} deve ser maior que zero: informe um mínimo positivo.")
+    if inferior < 0:
+        raise ValueError(f"{nome} não pode ser negativo: informe um mínimo maior ou igual a zero.")
+    if nome == 'fator_carga' and superior > 1:
+        raise ValueError("fator_carga é a fração da capacidade usada por viagem: o máximo é 1.")
+    return distribuicao
+
+
+def montar_distribuicoes(especificacao, base=DISTRIBUICOES_PADRAO):
+    """Distribuições de `base` com as da especificação por cima, já validadas"""
+    conhecidos = set(PARAMETROS_PADRAO.como_dict()) | {'fator_carga'}
+    desconhecidos = set(especificacao) - conhecidos
+    if desconhecidos:
+        raise ValueError(f"Parâmetro(s) desconhecido(s): {', '.join(sorted(desconhecidos))}")
+    return {nome: _validar_distribuicao(nome, valor) for nome, valor in {**base, **especificacao}.items()}
+
+
+def carregar_distribuicoes(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        especificacao = json.load(f)
+    if not isinstance(especificacao, dict):
+        raise ValueError(f"{caminho} deve conter um objeto com a distribuição de cada parâmetro.")
+    return montar_distribuicoes(especificacao)
+
+
+def _sortear(gerador, distribuicao, forma):
+    tipo = distribuicao['tipo']
+    if tipo == 'fixo':
+        return np.full(forma, distribuicao['valor'])
+    if tipo == 'uniforme':
+        return gerador.uniform(distribuicao['minimo'], distribuicao['maximo'], forma)
+    if tipo == 'triangular':
+        if distribuicao['minimo'] == distribuicao['maximo']:
+            return np.full(forma, distribuicao['minimo'])
+        return gerador.triangular(distribuicao['minimo'], distribuicao['moda'], distribuicao['maximo'], forma)
+    amostras = gerador.normal(distribuicao['media'], distribuicao['desvio'], forma)
+    # Normal truncada pelos limites (os valores fora deles ficam no limite)
+    inferior, superior = _limites(distribuicao)
+    return np.clip(amostras, inferior, superior)
+
+
+def _iniciar_processo(cotacoes):
+    global _cotacoes
+    _cotacoes = cotacoes
+
+
+def _simular_bloco(bloco):
+    """Sorteia as amostras das cotações [inicio, fim) e resume custo e tempo de cada uma
+
+    Devolve os resumos por cotação e, por amostra, a soma de custo e tempo das cotações do
+    bloco (usada na distribuição do lote inteiro).
+    """
+    inicio, fim, semente, amostras, distribuicoes = bloco
+    gerador = np.random.default_rng(semente)
+    forma = (fim - inicio, amostras)
+    sorteados = {nome: _sortear(gerador, distribuicao, forma) for nome, distribuicao in distribuicoes.items()}
+    fator_carga = sorteados.pop('fator_carga', 1.0)
+
+    cot = {coluna: valores[inicio:fim, np.newaxis] for coluna, valores in _cotacoes.items()}
+    resultado = calcular_custos_lote(cot['distancias'], cot['capacidades'] * fator_carga, cot['custos_km'],
+                                     cot['pesos'], PARAMETROS_PADRAO.com(**sorteados))
+
+    resumos = {}
+    for campo in ('custo_total', 'tempo_total'):
+        valores = resultado[campo]
+        resumos[campo] = np.vstack([valores.mean(axis=1), np.percentile(valores, PERCENTIS, axis=1)])
+    return resumos, resultado['custo_total'].sum(axis=0), resultado['tempo_total'].sum(axis=0)
+
+
+def _resumir(valores):
+    ordenados = np.percentile(valores, PERCENTIS)
+    return {'media': float(valores.mean()), **{f'p{q}': float(v) for q, v in zip(PERCENTIS, ordenados)}}
+
+
+def simular(distancias, capacidades, custos_km, pesos, distribuicoes=None, amostras=AMOSTRAS_PADRAO, semente=None,
+            processos=None):
+    """Simula as cotações (colunas como em calcular_custos_lote) e resume custo e tempo
+
+    Retorna, para cada cotação, a média e os percentis P10/P50/P90 de custo e tempo, os mesmos
+    resumos para o lote inteiro (soma das cotações em cada amostra) e a semente usada, que
+    repete a simulação.
+    """
+    _exigir_numpy()
+    distribuicoes = distribuicoes if distribuicoes is not None else montar_distribuicoes({})
+    if amostras < 1:
+        raise ValueError("A quantidade de amostras deve ser maior que zero.")
+    cotacoes = {
+        'distancias': np.asarray(distancias, dtype=np.float64),
+        'capacidades': np.asarray(capacidades, dtype=np.float64),
+        'custos_km': np.asarray(custos_km, dtype=np.float64),
+        'pesos': np.asarray(pesos, dtype=np.float64),
+    }
+    total = len(cotacoes['pesos'])
+    if not total:
+        raise ValueError("Nenhuma cotação para simular.")
+    if any(len(coluna) != total for coluna in cotacoes.values()):
+        raise ValueError("As colunas das cotações devem ter o mesmo tamanho.")
+    if (cotacoes['capacidades'] <= 0).any():
+        raise ValueError("Todos os veículos devem ter capacidade maior que zero.")
+
+    # Os blocos não dependem da quantidade de processos, então a mesma semente repete o resultado
+    sementes = np.random.SeedSequence(semente)
+    tamanho_bloco = max(1, ELEMENTOS_BLOCO // amostras)
+    limites = [(i, min(i + tamanho_bloco, total)) for i in range(0, total, tamanho_bloco)]
+    blocos = [(inicio, fim, filha, amostras, distribuicoes)
+              for (inicio, fim), filha in zip(limites, sementes.spawn(len(limites)))]
+
+    processos = processos or os.cpu_count() or 1
+    if processos == 1 or len(blocos) == 1:
+        _iniciar_processo(cotacoes)
+        resultados = list(map(_simular_bloco, blocos))
+    else:
+        with ProcessPoolExecutor(min(processos, len(blocos)), initializer=_iniciar_processo,
+                                 initargs=(cotacoes,)) as executor:
+            resultados = list(executor.map(_simular_bloco, blocos))
+
+    nomes = []
+    colunas = []
+    for campo, prefixo in (('custo_total', 'custo'), ('tempo_total', 'tempo')):
+        valores = np.hstack([resumos[campo] for resumos, _, _ in resultados])
+        for posicao, nome in enumerate(CAMPOS_RESUMO):
+            nomes.append(f'{prefixo}_{nome}')
+            colunas.append(valores[posicao].tolist())
+
+    return {
+        'semente': sementes.entropy,
+        'amostras': amostras,
+        'cotacoes': [dict(zip(nomes, valores)) for valores in zip(*colunas)],
+        'custo_total': _resumir(sum(custos for _, custos, _ in resultados)),
+        'tempo_total': _resumir(sum(tempos for _, _, tempos in resultados)),
+    }
+
+
+def escrever_simulacao(caminho, entrada, simulacao):
+    """Grava as colunas de entrada e os resumos de cada cotação em CSV"""
+    campos = list(entrada) + list(simulacao['cotacoes'][0])
+    with open(Path(caminho), 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.writer(f)
+        escritor.writerow(campos)
+        for valores, resumo in zip(zip(*entrada.values()), simulacao['cotacoes']):
+            escritor.writerow(list(valores) + list(resumo.values()))
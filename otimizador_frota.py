@@ -0,0 +1,165 @@
+"""Otimizador de frota: escolhe a combinação de viagens mais barata entre todos os veículos"""
+import math
+
+from modelo_custos import calcular_custos
+
+# Unidades de peso resolvidas pela programação dinâmica antes de levar o excedente no veículo de
+# menor custo por kg ou de ampliar a resolução (ver otimizar_frota)
+LIMITE_ESTADOS = 100_000
+
+
+def custo_por_viagem(distancia, veiculo):
+    """Custo de uma viagem (ida e volta) do veículo, pelo mesmo modelo de calcular_custos"""
+    return calcular_custos(distancia, veiculo['capacidade'], veiculo['custo_km'], veiculo['capacidade'])['custo_total']
+
+
+def _fronteira(opcoes):
+    """Remove veículos dominados: outro leva pelo menos o mesmo peso por um custo menor ou igual"""
+    fronteira = []
+    # Maior capacidade primeiro; entre capacidades iguais, o mais barato primeiro
+    for opcao in sorted(opcoes, key=lambda o: (-o['unidades'], o['custo_viagem'])):
+        if not fronteira or opcao['custo_viagem'] < fronteira[-1]['custo_viagem']:
+            fronteira.append(opcao)
+    return fronteira
+
+
+def _opcoes(propriedade, veiculos, resolucao):
+    """Veículos não dominados, com a capacidade em unidades de `resolucao` kg e o custo por viagem"""
+    opcoes = []
+    for veic in veiculos:
+        unidades = int(veic['capacidade'] // resolucao)
+        if unidades <= 0:
+            continue
+        opcoes.append({
+            'veiculo': veic,
+            'unidades': unidades,
+            'custo_viagem': custo_por_viagem(propriedade['distancia'], veic)
+        })
+    if not opcoes:
+        raise ValueError("Nenhum veículo com capacidade suficiente para a resolução escolhida.")
+    return _fronteira(opcoes)
+
+
+def _limite(opcoes, melhor):
+    """Unidades que a programação dinâmica precisa cobrir para que o excedente no melhor veículo seja ótimo
+
+    Entre u_melhor viagens de outros veículos sempre há um grupo cujo peso, em unidades, é
+    múltiplo de u_melhor (somas parciais módulo u_melhor), e trocá-lo por viagens do veículo de
+    menor custo por unidade não encarece o plano. Logo há um ótimo com menos de u_melhor viagens
+    dos outros, que levam menos de u_melhor x u_maior unidades.
+    """
+    return max(LIMITE_ESTADOS, opcoes[melhor]['unidades'] * max(opcao['unidades'] for opcao in opcoes))
+
+
+def otimizar_frota(propriedade, veiculos, peso_total, resolucao=1.0):
+    """Encontra o número de viagens de cada veículo que transporta `peso_total` com o menor custo
+
+    O problema é uma mochila ilimitada de cobertura: como o custo do modelo é linear no número de
+    viagens, cada viagem do veículo v custa c_v e leva até capacidade_v kg. A programação dinâmica
+    roda sobre o peso discretizado em unidades de `resolucao` kg, apenas para os veículos que não
+    são dominados por outro, em O(unidades x veículos). A capacidade é arredondada para baixo
+    e o peso para cima, então a combinação encontrada sempre leva a carga toda.
+
+    Acima do limite de estados (ver _limite) o excedente vai em viagens do veículo de menor custo
+    por unidade, sem perder o ótimo. Se o limite exato passar de LIMITE_ESTADOS (ex.: 30 t em
+    unidades de 1 kg), a resolução é ampliada até caber e o plano é o ótimo para o peso nessa
+    resolução: o resultado informa a resolução usada e nunca custa mais que o melhor veículo
+    usado sozinho.
+    """
+    if peso_total <= 0:
+        raise ValueError("O peso total deve ser maior que zero.")
+
+    opcoes = _opcoes(propriedade, veiculos, resolucao)
+    melhor = min(range(len(opcoes)), key=lambda i: opcoes[i]['custo_viagem'] / opcoes[i]['unidades'])
+    if math.ceil(peso_total / resolucao) > LIMITE_ESTADOS and _limite(opcoes, melhor) > LIMITE_ESTADOS:
+        # Menor resolução em que o peso inteiro, ou u_maior x u_maior, cabe no limite
+        maior_capacidade = max(opcao['veiculo']['capacidade'] for opcao in opcoes)
+        resolucao = min(peso_total / LIMITE_ESTADOS, maior_capacidade / math.sqrt(LIMITE_ESTADOS))
+        opcoes = _opcoes(propriedade, veiculos, resolucao)
+        melhor = min(range(len(opcoes)), key=lambda i: opcoes[i]['custo_viagem'] / opcoes[i]['unidades'])
+    unidades_totais = math.ceil(peso_total / resolucao)
+
+    # Excedente acima do limite: viagens do veículo com menor custo por unidade de peso
+    limite = _limite(opcoes, melhor)
+    viagens_fixas = 0
+    if unidades_totais > limite:
+        viagens_fixas = math.ceil((unidades_totais - limite) / opcoes[melhor]['unidades'])
+        unidades_totais -= viagens_fixas * opcoes[melhor]['unidades']
+
+    # custo[w] = menor custo para levar pelo menos w unidades; escolha[w] = veículo da última viagem
+    custo = [0.0] * (unidades_totais + 1)
+    escolha = [-1] * (unidades_totais + 1)
+    for w in range(1, unidades_totais + 1):
+        melhor_custo = math.inf
+        melhor_indice = -1
+        for indice, opcao in enumerate(opcoes):
+            anterior = w - opcao['unidades']
+            valor = opcao['custo_viagem'] + (custo[anterior] if anterior > 0 else 0.0)
+            if valor < melhor_custo:
+                melhor_custo = valor
+                melhor_indice = indice
+        custo[w] = melhor_custo
+        escolha[w] = melhor_indice
+
+    viagens = [0] * len(opcoes)
+    viagens[melhor] = viagens_fixas
+    w = unidades_totais
+    while w > 0:
+        indice = escolha[w]
+        viagens[indice] += 1
+        w -= opcoes[indice]['unidades']
+
+    # Com a capacidade arredondada para baixo, um único veículo pode sair mais barato
+    custo_plano = sum(n * opcao['custo_viagem'] for opcao, n in zip(opcoes, viagens))
+    for veic in veiculos:
+        if veic['capacidade'] > 0:
+            n = math.ceil(peso_total / veic['capacidade'])
+            custo_viagem = custo_por_viagem(propriedade['distancia'], veic)
+            if n * custo_viagem < custo_plano:
+                custo_plano = n * custo_viagem
+                opcoes, viagens = [{'veiculo': veic, 'custo_viagem': custo_viagem}], [n]
+
+    return _montar_plano(propriedade, opcoes, viagens, peso_total, veiculos, resolucao)
+
+
+def _montar_plano(propriedade, opcoes, viagens, peso_total, veiculos, resolucao):
+    plano = []
+    for opcao, n in zip(opcoes, viagens):
+        if n == 0:
+            continue
+        veic = opcao['veiculo']
+        custos = calcular_custos(propriedade['distancia'], veic['capacidade'], veic['custo_km'], n * veic['capacidade'])
+        plano.append({
+            'veiculo_id': veic['id'],
+            'tipo': veic['tipo'],
+            'viagens': n,
+            'capacidade_total': n * veic['capacidade'],
+            'distancia_total': custos['distancia_total'],
+            'tempo_total': custos['tempo_total'],
+            'custo_total': custos['custo_total']
+        })
+
+    # Referência: o melhor veículo usado sozinho, como no cálculo do menu
+    unico = min(
+        (
+            dict(calcular_custos(propriedade['distancia'], v['capacidade'], v['custo_km'], peso_total), veiculo_id=v['id'])
+            for v in veiculos if v['capacidade'] > 0
+        ),
+        key=lambda c: c['custo_total']
+    )
+
+    return {
+        'propriedade_id': propriedade['id'],
+        'peso_total': peso_total,
+        'resolucao': resolucao,
+        'plano': plano,
+        'viagens': sum(item['viagens'] for item in plano),
+        'distancia_total': sum(item['distancia_total'] for item in plano),
+        'tempo_total': sum(item['tempo_total'] for item in plano),
+        'custo_total': sum(item['custo_total'] for item in plano),
+        'melhor_veiculo_unico': {
+            'veiculo_id': unico['veiculo_id'],
+            'viagens': int(unico['viagens']),
+            'custo_total': unico['custo_total']
+        }
+    }
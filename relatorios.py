@@ -0,0 +1,191 @@
+"""Relatórios gerenciais sobre o histórico de cálculos, a partir de totais pré-agregados
+
+Os totais (por veículo, por propriedade e mês e por produto e mês) são atualizados a cada
+cálculo gravado e guardados em resumos.json; um relatório custa O(grupos), sem percorrer o
+histórico. servico.gravar_calculos mantém os totais em dia.
+"""
+import json
+import os
+from pathlib import Path
+
+from armazenamento import RESUMOS_FILE, bloquear, carregar_dados, salvar_dados, versao_arquivo
+
+CAMPOS_SOMADOS = ('viagens', 'peso_total', 'distancia_total', 'custo_total', 'tempo_total')
+# Tabela -> campos que formam a chave de cada grupo
+TABELAS = {
+    'veiculos': ('veiculo_id',),
+    'propriedades_mes': ('propriedade_id', 'mes'),
+    'produtos_mes': ('produto_id', 'mes'),
+}
+# Linha de resumos.json com o maior id de cálculo já somado aos totais
+CONSOLIDADO = '$consolidado'
+# Campos de cada cálculo guardados em resumos.jsonl até a consolidação
+CAMPOS_PENDENTES = ('id', 'veiculo_id', 'propriedade_id', 'produto_id', 'data_calculo') + CAMPOS_SOMADOS
+# Tamanho mínimo (bytes) dos cálculos pendentes que dispara a consolidação em resumos.json
+LIMITE_PENDENTES = 1 << 20
+
+
+def mes_do_calculo(calc):
+    """'aaaa-mm' a partir da data 'dd/mm/aaaa HH:MM' do cálculo (None se não houver data)"""
+    data = calc.get('data_calculo') or ''
+    if len(data) < 10:
+        return None
+    return f"{data[6:10]}-{data[3:5]}"
+
+
+def _totais_vazios():
+    return dict.fromkeys(('calculos',) + CAMPOS_SOMADOS, 0)
+
+
+def _tamanho(arquivo):
+    try:
+        return os.path.getsize(arquivo)
+    except FileNotFoundError:
+        return 0
+
+
+class Resumos:
+    """Totais pré-agregados do histórico, relidos do disco apenas quando os arquivos mudam
+
+    Os cálculos registrados são anexados a resumos.jsonl (pendentes) e somados aos totais na
+    leitura; registrar custa uma escrita no fim desse arquivo, não a regravação de todos os
+    grupos. Quando os pendentes passam do tamanho de resumos.json (e de LIMITE_PENDENTES), eles
+    são consolidados nele. resumos.json guarda o maior id de cálculo já somado, para que os
+    pendentes de uma consolidação interrompida não sejam somados duas vezes.
+    """
+
+    def __init__(self, arquivo=RESUMOS_FILE):
+        self.arquivo = Path(arquivo)
+        self.arquivo_pendentes = self.arquivo.with_suffix('.jsonl')
+        self._tabelas = None
+        self._versao = None
+        self._ultimo_id = 0
+        self._posicao_pendentes = 0
+
+    def existe(self):
+        return self.arquivo.exists()
+
+    def _carregar(self):
+        versao = versao_arquivo(self.arquivo)
+        tamanho_pendentes = _tamanho(self.arquivo_pendentes)
+        if self._tabelas is None or versao != self._versao or tamanho_pendentes < self._posicao_pendentes:
+            self._tabelas = {tabela: {} for tabela in TABELAS}
+            self._versao = versao
+            self._ultimo_id = 0
+            self._posicao_pendentes = 0
+            for linha in carregar_dados(self.arquivo):
+                if linha['tabela'] == CONSOLIDADO:
+                    self._ultimo_id = linha['ultimo_id']
+                    continue
+                chaves = TABELAS[linha['tabela']]
+                self._tabelas[linha['tabela']][tuple(linha[chave] for chave in chaves)] = {
+                    campo: linha[campo] for campo in ('calculos',) + CAMPOS_SOMADOS}
+        if tamanho_pendentes > self._posicao_pendentes:
+            self._somar_pendentes()
+
+    def _somar_pendentes(self):
+        """Soma aos totais as linhas completas de resumos.jsonl ainda não lidas"""
+        with open(self.arquivo_pendentes, 'rb') as f:
+            f.seek(self._posicao_pendentes)
+            for linha in f:
+                if not linha.endswith(b'\n'):
+                    break  # cauda sem '\n': a gravação não terminou
+                self._posicao_pendentes += len(linha)
+                try:
+                    calc = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue  # resto de uma gravação interrompida
+                if calc['id'] > self._ultimo_id:
+                    self._somar([calc])
+                    self._ultimo_id = calc['id']
+
+    def _somar(self, calculos):
+        """Soma os cálculos às tabelas em memória; indica se havia algum cálculo"""
+        somou = False
+        for calc in calculos:
+            somou = True
+            calc_mes = {**calc, 'mes': mes_do_calculo(calc)}
+            for tabela, chaves in TABELAS.items():
+                grupo = tuple(calc_mes[chave] for chave in chaves)
+                totais = self._tabelas[tabela].get(grupo)
+                if totais is None:
+                    totais = self._tabelas[tabela][grupo] = _totais_vazios()
+                totais['calculos'] += 1
+                for campo in CAMPOS_SOMADOS:
+                    totais[campo] += calc[campo]
+        return somou
+
+    def _gravar(self):
+        """Grava uma linha por grupo ({'tabela', campos da chave, totais}) e esvazia os pendentes"""
+        linhas = [{'tabela': tabela, **dict(zip(chaves, grupo)), **totais}
+                  for tabela, chaves in TABELAS.items() for grupo, totais in self._tabelas[tabela].items()]
+        linhas.append({'tabela': CONSOLIDADO, 'ultimo_id': self._ultimo_id})
+        salvar_dados(linhas, self.arquivo)
+        # Se o processo cair aqui, os pendentes já somados são ignorados pelo ultimo_id
+        with open(self.arquivo_pendentes, 'wb'):
+            pass
+        self._versao = versao_arquivo(self.arquivo)
+        self._posicao_pendentes = 0
+
+    def registrar(self, calculos):
+        """Anexa os cálculos recém-gravados aos pendentes, que entram nos totais na próxima leitura
+
+        Deve ser chamado sob o bloqueio do histórico, junto com a gravação dos cálculos (em
+        ordem de id), para que cada cálculo seja somado exatamente uma vez mesmo com vários
+        processos.
+        """
+        linhas = b''.join(json.dumps({campo: calc.get(campo) for campo in CAMPOS_PENDENTES},
+                                     ensure_ascii=False).encode('utf-8') + b'\n' for calc in calculos)
+        if not linhas:
+            return
+        with bloquear(self.arquivo):
+            with open(self.arquivo_pendentes, 'ab') as f:
+                if f.tell():
+                    # Uma gravação interrompida pode ter deixado a última linha sem '\n'
+                    with open(self.arquivo_pendentes, 'rb') as leitura:
+                        leitura.seek(-1, os.SEEK_END)
+                        if leitura.read(1) != b'\n':
+                            linhas = b'\n' + linhas
+                f.write(linhas)
+                f.flush()
+                os.fsync(f.fileno())
+                tamanho_pendentes = f.tell()
+            if tamanho_pendentes >= max(LIMITE_PENDENTES, _tamanho(self.arquivo)):
+                self._carregar()
+                self._gravar()
+
+    def reconstruir(self, calculos):
+        """Recalcula todos os totais percorrendo o histórico (iterável de cálculos) uma vez"""
+        with bloquear(self.arquivo):
+            self._tabelas = {tabela: {} for tabela in TABELAS}
+            self._ultimo_id = 0
+
+            def com_ultimo_id():
+                for calc in calculos:
+                    self._ultimo_id = max(self._ultimo_id, calc.get('id', 0))
+                    yield calc
+
+            self._somar(com_ultimo_id())
+            self._gravar()
+
+    def _linhas(self, tabela):
+        self._carregar()
+        chaves = TABELAS[tabela]
+        linhas = [{**dict(zip(chaves, grupo)), **totais} for grupo, totais in self._tabelas[tabela].items()]
+        for linha in linhas:
+            linha['custo_km'] = linha['custo_total'] / linha['distancia_total'] if linha['distancia_total'] else None
+            linha['custo_kg'] = linha['custo_total'] / linha['peso_total'] if linha['peso_total'] else None
+        return sorted(linhas, key=lambda linha: tuple((linha[chave] is None, linha[chave]) for chave in chaves))
+
+    def por_veiculo(self):
+        """Cálculos, viagens, km, kg e custos de cada veículo, com custo por km e por kg"""
+        return self._linhas('veiculos')
+
+    def por_propriedade_mes(self):
+        return self._linhas('propriedades_mes')
+
+    def por_produto_mes(self):
+        return self._linhas('produtos_mes')
+
+
+resumos = Resumos()
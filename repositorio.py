@@ -0,0 +1,230 @@
+"""Repositório em memória das entidades, indexado por id"""
+import json
+import os
+from pathlib import Path
+import tempfile
+
+import armazenamento
+from armazenamento import ConflitoVersao, bloquear, carregar_dados, salvar_dados, versao_arquivo
+from indice_registros import indice_registros
+
+
+def arquivo_contador(arquivo):
+    """Arquivo lateral (.seq) com o maior id já usado em `arquivo`"""
+    arquivo = Path(arquivo)
+    return arquivo.with_name(arquivo.name + '.seq')
+
+
+def ler_contador(arquivo):
+    """Estado gravado por gravar_contador ({} se o arquivo não existir ou estiver ilegível)"""
+    try:
+        with open(arquivo_contador(arquivo), 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return estado if isinstance(estado, dict) else {}
+
+
+def gravar_contador(arquivo, estado):
+    """Grava o estado do arquivo lateral (troca atômica); deve ser chamado sob o bloqueio de `arquivo`
+
+    O campo 'ultimo_id' guarda o maior id já gerado, mesmo que o item tenha sido removido depois,
+    para que os ids nunca sejam reaproveitados.
+    """
+    caminho = arquivo_contador(arquivo)
+    descritor, temporario = tempfile.mkstemp(prefix=caminho.name + '.', suffix='.tmp', dir=caminho.parent)
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as f:
+            json.dump(estado, f)
+        os.replace(temporario, caminho)
+    except BaseException:
+        armazenamento.descartar_temporario(temporario)
+        raise
+
+
+class Repositorio:
+    """Conjunto de entidades de um arquivo, carregado uma única vez e indexado por id
+
+    Mantém um contador do maior id já usado (evitando o max() sobre a lista a cada
+    inclusão), gravado ao lado do arquivo (ver gravar_contador) para que o id de um item removido
+    não seja reaproveitado, e só grava o arquivo de volta quando algo foi alterado.
+
+    Vários processos podem usar o mesmo arquivo: a versão lida do disco é guardada e, se o
+    arquivo mudar, o repositório é relido (quando não há alterações pendentes). Na gravação,
+    feita sob bloqueio, uma versão diferente faz o repositório reler o arquivo e reaplicar as
+    alterações pendentes antes de gravar (controle otimista de concorrência).
+    """
+
+    def __init__(self, arquivo):
+        self.arquivo = Path(arquivo)
+        self._itens = None
+        self._max_id = 0
+        self._contador = 0
+        self._alterado = False
+        self._pendentes = []
+        self._versao = None
+
+    def _versao_disco(self):
+        return versao_arquivo(self.arquivo)
+
+    def recarregar(self):
+        """Descarta o estado em memória e lê o arquivo novamente"""
+        self._versao = self._versao_disco()
+        self._itens = {}
+        for item in carregar_dados(self.arquivo):
+            self._itens[item.get('id', 0)] = item
+        self._contador = ler_contador(self.arquivo).get('ultimo_id', 0)
+        self._max_id = max(max(self._itens, default=0), self._contador)
+        self._alterado = False
+        self._pendentes = []
+
+    def _garantir_carregado(self):
+        if self._itens is None or (not self._alterado and self._versao_disco() != self._versao):
+            self.recarregar()
+
+    def listar(self):
+        self._garantir_carregado()
+        return list(self._itens.values())
+
+    def indice(self):
+        """Mapa id -> item de todo o repositório, sem cópia (não deve ser alterado)"""
+        self._garantir_carregado()
+        return self._itens
+
+    def obter(self, id_item):
+        self._garantir_carregado()
+        return self._itens.get(id_item)
+
+    def ler(self, id_item):
+        """Item pelo id sem carregar o repositório inteiro
+
+        Se o repositório ainda não foi carregado, apenas o item é lido do arquivo, pelo índice
+        de posições (ver indice_registros); o resultado não deve ser alterado.
+        """
+        if self._itens is not None:
+            return self.obter(id_item)
+        return indice_registros(self.arquivo).ler(id_item)
+
+    def ler_pagina(self, inicio, quantidade, recentes=False):
+        """Itens nas posições [inicio, inicio + quantidade) em ordem de id e o total de itens
+
+        Como em ler(), sem o repositório carregado são lidos apenas os itens da página.
+        """
+        if self._itens is not None:
+            itens = sorted(self.listar(), key=lambda item: item.get('id', 0), reverse=recentes)
+            return itens[inicio:inicio + quantidade], len(itens)
+        return indice_registros(self.arquivo).pagina(inicio, quantidade, recentes)
+
+    def __len__(self):
+        self._garantir_carregado()
+        return len(self._itens)
+
+    def __contains__(self, id_item):
+        self._garantir_carregado()
+        return id_item in self._itens
+
+    def existe(self, campo, valor):
+        """Indica se algum item tem `campo` igual a `valor`"""
+        self._garantir_carregado()
+        return any(item.get(campo) == valor for item in self._itens.values())
+
+    def proximo_id(self):
+        """Gera um novo ID baseado no maior ID já usado + 1"""
+        self._garantir_carregado()
+        return self._max_id + 1
+
+    def adicionar(self, campos):
+        """Inclui um novo item com id gerado e devolve o item criado"""
+        item = {'id': self.proximo_id(), **campos}
+        self._itens[item['id']] = item
+        self._max_id = item['id']
+        self._registrar('adicionar', item)
+        return item
+
+    def adicionar_varios(self, lista_campos):
+        """Inclui vários itens; o salvar() seguinte grava todos de uma vez"""
+        return [self.adicionar(campos) for campos in lista_campos]
+
+    def atualizar(self, id_item, campos):
+        """Atualiza os campos de um item existente. Retorna False se o id não existir"""
+        item = self.obter(id_item)
+        if item is None:
+            return False
+        item.update(campos)
+        self._registrar('atualizar', id_item, campos)
+        return True
+
+    def remover(self, id_item):
+        """Remove um item pelo id. Retorna False se o id não existir"""
+        self._garantir_carregado()
+        if self._itens.pop(id_item, None) is None:
+            return False
+        self._registrar('remover', id_item)
+        return True
+
+    def _registrar(self, operacao, *argumentos):
+        """Guarda a alteração para gravar (e, havendo conflito, reaplicar) em salvar()"""
+        self._pendentes.append((operacao, argumentos))
+        self._alterado = True
+
+    def _reaplicar_pendentes(self):
+        """Relê o disco e reaplica as alterações pendentes sobre a versão mais recente"""
+        pendentes = self._pendentes
+        self.recarregar()
+        for operacao, argumentos in pendentes:
+            if operacao == 'adicionar':
+                item = argumentos[0]
+                if item['id'] <= self._contador or item['id'] in self._itens:  # id já usado por outro processo
+                    item['id'] = self._max_id + 1
+                self._itens[item['id']] = item
+                self._max_id = max(self._max_id, item['id'])
+            elif operacao == 'atualizar':
+                id_item, campos = argumentos
+                if id_item not in self._itens:
+                    # Descarta as alterações pendentes e fica com a versão do disco
+                    self.recarregar()
+                    raise ConflitoVersao(f"O item {id_item} de {self.arquivo.name} foi removido por outro usuário; "
+                                         "a alteração foi descartada.")
+                self._itens[id_item].update(campos)
+            elif operacao == 'remover':
+                self._itens.pop(argumentos[0], None)
+        self._pendentes = pendentes
+        self._alterado = True
+
+    def salvar(self):
+        """Grava o arquivo apenas se houve alteração desde a última leitura/gravação"""
+        if not self._alterado:
+            return False
+        with bloquear(self.arquivo):
+            if self._versao_disco() != self._versao:
+                self._reaplicar_pendentes()
+            self._gravar()
+        return True
+
+    def _gravar(self):
+        # O contador é gravado antes dos dados: uma queda entre as duas gravações só deixa um id sem uso
+        if self._max_id > self._contador:
+            gravar_contador(self.arquivo, {'ultimo_id': self._max_id})
+            self._contador = self._max_id
+        salvar_dados(list(self._itens.values()), self.arquivo)
+        self._versao = self._versao_disco()
+        self._alterado = False
+        self._pendentes = []
+
+
+_repositorios = {}
+
+
+def repositorio(arquivo, classe=Repositorio):
+    """Devolve o repositório (único por arquivo) das entidades gravadas em `arquivo`
+
+    Com o armazenamento SQLite ativo, todas as entidades usam o banco, independente de `classe`.
+    """
+    chave = Path(arquivo).resolve()
+    if chave not in _repositorios:
+        if armazenamento.BACKEND == 'sqlite':
+            # Importado aqui porque o módulo SQLite também depende deste
+            from armazenamento_sqlite import RepositorioSQLite
+            classe = RepositorioSQLite
+        _repositorios[chave] = classe(arquivo)
+    return _repositorios[chave]
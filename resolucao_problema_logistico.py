@@ -1,63 +1,37 @@
-import re
-from datetime import datetime
-import json
+import argparse
+import asyncio
+import sys
 import os
 from pathlib import Path
 import time
 
-# Configuração do diretório de dados
-DATA_DIR = Path.home() / "dados_transporte_rural"
-PROPRIEDADES_FILE = DATA_DIR / "propriedades.json"
-VEICULOS_FILE = DATA_DIR / "veiculos.json"
-PRODUTOS_FILE = DATA_DIR / "produtos.json"
-CALCULOS_FILE = DATA_DIR / "calculos.json"
-
-# Garantir que o diretório de dados existe
-def setup_data_directory():
-    """Cria o diretório de dados e arquivos JSON caso não existam"""
-    os.makedirs(DATA_DIR, exist_ok=True)
-    
-    # Inicializar os arquivos JSON se não existirem
-    for file_path, initial_data in [
-        (PROPRIEDADES_FILE, []),
-        (VEICULOS_FILE, []),
-        (PRODUTOS_FILE, []),
-        (CALCULOS_FILE, [])
-    ]:
-        if not file_path.exists():
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(initial_data, f, ensure_ascii=False, indent=2)
-    
-    print(f"Arquivos de dados serão armazenados em: {DATA_DIR}")
-
-def carregar_dados(arquivo):
-    """Carrega dados de um arquivo JSON com verificação de tipo"""
-    try:
-        with open(arquivo, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-            if not isinstance(dados, list):  # Verifica se é uma lista
-                print(f"Aviso: Dados em {arquivo} não estão no formato esperado. Inicializando como lista vazia.")
-                return []
-            return dados
-    except json.JSONDecodeError:
-        return []
-    except Exception as e:
-        print(f"Erro ao carregar {arquivo}: {e}")
-        return []
-
-def salvar_dados(dados, arquivo):
-    """Salva dados em um arquivo JSON"""
-    with open(arquivo, 'w', encoding='utf-8') as f:
-        json.dump(dados, f, ensure_ascii=False, indent=2)
-
-def gerar_id(lista):
-    """Gera um novo ID para um item baseado no maior ID existente + 1"""
-    if not lista:
-        return 1
-    return max(item.get('id', 0) for item in lista) + 1
-
-def limpar_localizacao(localizacao):
-    return re.sub(r'\(.*?\)', '', localizacao).strip()[:128]
+import armazenamento
+from armazenamento import (
+    DATA_DIR,
+    ConflitoVersao,
+    DadosCorrompidos,
+    PRODUTOS_FILE,
+    PROPRIEDADES_FILE,
+    VEICULOS_FILE,
+    setup_data_directory,
+)
+from armazenamento_sqlite import NOME_BANCO, migrar_de_json
+from atribuicao_centros import CANDIDATOS_PADRAO, escrever_atribuicao
+from calculo_lote import CAMPOS_ENTRADA, ler_lote, processar_arquivo_lote, resolver_lote
+from cenarios import carregar_grade, escrever_resumo, varrer_cenarios
+from copia_seguranca import gravar_copia, restaurar_copia, verificar_copia
+from escalonador import escrever_plano, ler_servicos, resumo_diario
+from historico_colunar import HistoricoColunar
+from importacao import FORMATOS, SECOES, TAMANHO_LOTE, exportar, exportar_consolidado, importar, iterar_registros
+from listagem import DESCONHECIDO, TAMANHO_PAGINA, ler_data, mapa_nomes, paginar
+from malha_viaria import MalhaViaria, calcular_matriz, com_distancias, ler_centros, matriz_distancias
+from modelo_custos import PARAMETROS_PADRAO
+from monte_carlo import AMOSTRAS_PADRAO, carregar_distribuicoes, escrever_simulacao, montar_distribuicoes, simular
+from repositorio import repositorio
+from roteirizacao import planejar_rotas
+import servico
+import servidor_http
+from servico import ErroServico
 
 def input_float(msg):
     while True:
@@ -70,6 +44,16 @@ def input_float(msg):
         except ValueError:
             print("Valor inválido. Insira um número válido com ponto (.) para decimais.")
 
+def input_float_opcional(msg):
+    while True:
+        valor = input(msg).strip().replace(',', '.')
+        if valor == '':
+            return None
+        try:
+            return float(valor)
+        except ValueError:
+            print("Valor inválido. Insira um número válido com ponto (.) para decimais ou deixe em branco.")
+
 def input_nao_vazio(msg):
     while True:
         valor = input(msg).strip()
@@ -89,6 +73,26 @@ def input_id(msg):
         except ValueError:
             print("Por favor, digite um número inteiro válido.")
 
+def input_id_opcional(msg):
+    while True:
+        valor = input(msg).strip()
+        if valor == '':
+            return None
+        try:
+            id_val = int(valor)
+            if id_val > 0:
+                return id_val
+        except ValueError:
+            pass
+        print("Digite um ID inteiro positivo ou deixe em branco.")
+
+def input_data_opcional(msg):
+    while True:
+        try:
+            return ler_data(input(msg))
+        except ValueError:
+            print("Data inválida. Use o formato dd/mm/aaaa ou deixe em branco.")
+
 def menu():
     while True:
         print("\n--- Simulador de Logística de Transporte Rural ---")
@@ -98,25 +102,41 @@ def menu():
         print("4. Realizar Cálculo de Transporte")
         print("5. Listar Cálculos Realizados")
         print("6. Exportar Todos os Dados")
+        print("7. Otimizar Frota para um Transporte")
+        print("8. Relatórios Gerenciais")
+        print("9. Gerenciar Centros de Distribuição")
         print("0. Sair")
         opcao = input("Escolha uma opção: ")
 
-        if opcao == '1':
-            menu_propriedades()
-        elif opcao == '2':
-            menu_veiculos()
-        elif opcao == '3':
-            menu_produtos()
-        elif opcao == '4':
-            calcular_transporte()
-        elif opcao == '5':
-            listar_calculos()
-        elif opcao == '6':
-            exportar_dados()
-        elif opcao == '0':
+        if opcao == '0':
             break
-        else:
-            print("Opção inválida.")
+        try:
+            executar_opcao(opcao)
+        except (ConflitoVersao, DadosCorrompidos, ErroServico) as e:
+            # Ex.: outro processo mexeu nos dados; informa e volta ao menu com a versão do disco
+            print(f"Erro: {e}")
+
+def executar_opcao(opcao):
+    if opcao == '1':
+        menu_propriedades()
+    elif opcao == '2':
+        menu_veiculos()
+    elif opcao == '3':
+        menu_produtos()
+    elif opcao == '4':
+        calcular_transporte()
+    elif opcao == '5':
+        consultar_calculos()
+    elif opcao == '6':
+        exportar_dados()
+    elif opcao == '7':
+        otimizar_transporte()
+    elif opcao == '8':
+        mostrar_relatorios()
+    elif opcao == '9':
+        menu_centros()
+    else:
+        print("Opção inválida.")
 
 def menu_propriedades():
     while True:
@@ -141,22 +161,13 @@ def menu_propriedades():
 
 def adicionar_propriedade():
     nome = input_nao_vazio("Nome da propriedade: ")
-    localizacao = limpar_localizacao(input_nao_vazio("Localização: "))
+    localizacao = input_nao_vazio("Localização: ")
     area_producao = input_float("Área de produção (ha): ")
     distancia = input_float("Distância até o centro de distribuição (km): ")
+    latitude = input_float_opcional("Latitude (opcional, ex.: -22.9): ")
+    longitude = input_float_opcional("Longitude (opcional, ex.: -47.06): ") if latitude is not None else None
     
-    propriedades = carregar_dados(PROPRIEDADES_FILE)
-    nova_propriedade = {
-        'id': gerar_id(propriedades),
-        'nome': nome,
-        'localizacao': localizacao,
-        'area_producao': area_producao,
-        'distancia': distancia,
-        'data_cadastro': datetime.now().strftime("%d/%m/%Y %H:%M")
-    }
-    
-    propriedades.append(nova_propriedade)
-    salvar_dados(propriedades, PROPRIEDADES_FILE)
+    servico.criar_propriedade(nome, localizacao, area_producao, distancia, latitude, longitude)
     print("Propriedade adicionada com sucesso!")
 
 def alterar_propriedade():
@@ -167,25 +178,29 @@ def alterar_propriedade():
     id_prop = input_id("Escolha o ID da propriedade para alterar: ")
     
     # Buscar a propriedade pelo ID
-    for i, prop in enumerate(propriedades):
-        if prop['id'] == id_prop:
-            nome = input_nao_vazio(f"Novo nome [{prop['nome']}]: ") or prop['nome']
-            localizacao = limpar_localizacao(input_nao_vazio(f"Nova localização [{prop['localizacao']}]: ")) or prop['localizacao']
-            area_producao = input_float(f"Nova área de produção (ha) [{prop['area_producao']}]: ") or prop['area_producao']
-            distancia = input_float(f"Nova distância (km) [{prop['distancia']}]: ") or prop['distancia']
-            
-            propriedades[i].update({
-                'nome': nome,
-                'localizacao': localizacao,
-                'area_producao': area_producao,
-                'distancia': distancia
-            })
-            
-            salvar_dados(propriedades, PROPRIEDADES_FILE)
-            print("Propriedade atualizada com sucesso!")
-            return
-    
-    print("Propriedade não encontrada.")
+    try:
+        prop = servico.obter('propriedade', id_prop)
+    except ErroServico as e:
+        print(e)
+        return
+    
+    nome = input_nao_vazio(f"Novo nome [{prop['nome']}]: ") or prop['nome']
+    localizacao = input_nao_vazio(f"Nova localização [{prop['localizacao']}]: ") or prop['localizacao']
+    area_producao = input_float(f"Nova área de produção (ha) [{prop['area_producao']}]: ") or prop['area_producao']
+    distancia = input_float(f"Nova distância (km) [{prop['distancia']}]: ") or prop['distancia']
+    latitude = input_float_opcional(f"Nova latitude [{prop.get('latitude')}] (vazio mantém): ")
+    longitude = input_float_opcional(f"Nova longitude [{prop.get('longitude')}] (vazio mantém): ")
+    
+    servico.alterar(
+        'propriedade', id_prop,
+        nome=nome,
+        localizacao=localizacao,
+        area_producao=area_producao,
+        distancia=distancia,
+        latitude=prop.get('latitude') if latitude is None else latitude,
+        longitude=prop.get('longitude') if longitude is None else longitude
+    )
+    print("Propriedade atualizada com sucesso!")
 
 def remover_propriedade():
     propriedades = listar_propriedades()
@@ -193,24 +208,15 @@ def remover_propriedade():
         return
     
     id_prop = input_id("Escolha o ID da propriedade para remover: ")
-    calculos = carregar_dados(CALCULOS_FILE)
-    
-    # Verificar se existem cálculos associados
-    if any(calc['propriedade_id'] == id_prop for calc in calculos):
-        print("Não é possível remover. Existem cálculos associados a esta propriedade.")
+    try:
+        servico.remover('propriedade', id_prop)
+    except ErroServico as e:
+        print(e)
         return
-    
-    # Filtrar a lista para manter apenas as propriedades com ID diferente
-    nova_lista = [prop for prop in propriedades if prop['id'] != id_prop]
-    
-    if len(nova_lista) < len(propriedades):
-        salvar_dados(nova_lista, PROPRIEDADES_FILE)
-        print("Propriedade removida com sucesso!")
-    else:
-        print("Propriedade não encontrada.")
+    print("Propriedade removida com sucesso!")
 
 def listar_propriedades():
-    propriedades = carregar_dados(PROPRIEDADES_FILE)
+    propriedades = servico.listar('propriedade')
     
     if not propriedades:
         print("Nenhuma propriedade encontrada.")
@@ -222,6 +228,8 @@ def listar_propriedades():
         print(f"  Localização: {prop['localizacao']}")
         print(f"  Área: {prop['area_producao']} ha")
         print(f"  Distância para o próximo centro de distribuição: {prop['distancia']} km")
+        if prop.get('latitude') is not None:
+            print(f"  Coordenadas: {prop['latitude']}, {prop.get('longitude')}")
         print(f"  Data de cadastro: {prop['data_cadastro']}")
     
     return propriedades
@@ -252,17 +260,7 @@ def adicionar_veiculo():
     capacidade = input_float("Capacidade de carga (kg): ")
     custo_km = input_float("Custo por km (R$): ")
     
-    veiculos = carregar_dados(VEICULOS_FILE)
-    novo_veiculo = {
-        'id': gerar_id(veiculos),
-        'tipo': tipo,
-        'capacidade': capacidade,
-        'custo_km': custo_km,
-        'data_cadastro': datetime.now().strftime("%d/%m/%Y %H:%M")
-    }
-    
-    veiculos.append(novo_veiculo)
-    salvar_dados(veiculos, VEICULOS_FILE)
+    servico.criar_veiculo(tipo, capacidade, custo_km)
     print("Veículo adicionado com sucesso!")
 
 def alterar_veiculo():
@@ -272,23 +270,18 @@ def alterar_veiculo():
     
     id_veic = input_id("Escolha o ID do veículo para alterar: ")
     
-    for i, veic in enumerate(veiculos):
-        if veic['id'] == id_veic:
-            tipo = input_nao_vazio(f"Novo tipo [{veic['tipo']}]: ") or veic['tipo']
-            capacidade = input_float(f"Nova capacidade (kg) [{veic['capacidade']}]: ") or veic['capacidade']
-            custo_km = input_float(f"Novo custo por km (R$) [{veic['custo_km']}]: ") or veic['custo_km']
-            
-            veiculos[i].update({
-                'tipo': tipo,
-                'capacidade': capacidade,
-                'custo_km': custo_km
-            })
-            
-            salvar_dados(veiculos, VEICULOS_FILE)
-            print("Veículo atualizado com sucesso!")
-            return
-    
-    print("Veículo não encontrado.")
+    try:
+        veic = servico.obter('veiculo', id_veic)
+    except ErroServico as e:
+        print(e)
+        return
+    
+    tipo = input_nao_vazio(f"Novo tipo [{veic['tipo']}]: ") or veic['tipo']
+    capacidade = input_float(f"Nova capacidade (kg) [{veic['capacidade']}]: ") or veic['capacidade']
+    custo_km = input_float(f"Novo custo por km (R$) [{veic['custo_km']}]: ") or veic['custo_km']
+    
+    servico.alterar('veiculo', id_veic, tipo=tipo, capacidade=capacidade, custo_km=custo_km)
+    print("Veículo atualizado com sucesso!")
 
 def remover_veiculo():
     veiculos = listar_veiculos()
@@ -296,23 +289,15 @@ def remover_veiculo():
         return
     
     id_veic = input_id("Escolha o ID do veículo para remover: ")
-    calculos = carregar_dados(CALCULOS_FILE)
-    
-    # Verificar se existem cálculos associados
-    if any(calc['veiculo_id'] == id_veic for calc in calculos):
-        print("Não é possível remover. Existem cálculos associados a este veículo.")
+    try:
+        servico.remover('veiculo', id_veic)
+    except ErroServico as e:
+        print(e)
         return
-    
-    nova_lista = [veic for veic in veiculos if veic['id'] != id_veic]
-    
-    if len(nova_lista) < len(veiculos):
-        salvar_dados(nova_lista, VEICULOS_FILE)
-        print("Veículo removido com sucesso!")
-    else:
-        print("Veículo não encontrado.")
+    print("Veículo removido com sucesso!")
 
 def listar_veiculos():
-    veiculos = carregar_dados(VEICULOS_FILE)
+    veiculos = servico.listar('veiculo')
     
     if not veiculos:
         print("Nenhum veículo encontrado.")
@@ -352,16 +337,7 @@ def adicionar_produto():
     nome = input_nao_vazio("Nome do produto: ")
     peso_cesto = input_float("Peso por cesto/unidade (kg): ")
     
-    produtos = carregar_dados(PRODUTOS_FILE)
-    novo_produto = {
-        'id': gerar_id(produtos),
-        'nome': nome,
-        'peso_cesto': peso_cesto,
-        'data_cadastro': datetime.now().strftime("%d/%m/%Y %H:%M")
-    }
-    
-    produtos.append(novo_produto)
-    salvar_dados(produtos, PRODUTOS_FILE)
+    servico.criar_produto(nome, peso_cesto)
     print("Produto adicionado com sucesso!")
 
 def alterar_produto():
@@ -371,21 +347,17 @@ def alterar_produto():
     
     id_prod = input_id("Escolha o ID do produto para alterar: ")
     
-    for i, prod in enumerate(produtos):
-        if prod['id'] == id_prod:
-            nome = input_nao_vazio(f"Novo nome [{prod['nome']}]: ") or prod['nome']
-            peso_cesto = input_float(f"Novo peso por cesto/unidade (kg) [{prod['peso_cesto']}]: ") or prod['peso_cesto']
-            
-            produtos[i].update({
-                'nome': nome,
-                'peso_cesto': peso_cesto
-            })
-            
-            salvar_dados(produtos, PRODUTOS_FILE)
-            print("Produto atualizado com sucesso!")
-            return
-    
-    print("Produto não encontrado.")
+    try:
+        prod = servico.obter('produto', id_prod)
+    except ErroServico as e:
+        print(e)
+        return
+    
+    nome = input_nao_vazio(f"Novo nome [{prod['nome']}]: ") or prod['nome']
+    peso_cesto = input_float(f"Novo peso por cesto/unidade (kg) [{prod['peso_cesto']}]: ") or prod['peso_cesto']
+    
+    servico.alterar('produto', id_prod, nome=nome, peso_cesto=peso_cesto)
+    print("Produto atualizado com sucesso!")
 
 def remover_produto():
     produtos = listar_produtos()
@@ -393,23 +365,15 @@ def remover_produto():
         return
     
     id_prod = input_id("Escolha o ID do produto para remover: ")
-    calculos = carregar_dados(CALCULOS_FILE)
-    
-    # Verificar se existem cálculos associados
-    if any(calc['produto_id'] == id_prod for calc in calculos):
-        print("Não é possível remover. Existem cálculos associados a este produto.")
+    try:
+        servico.remover('produto', id_prod)
+    except ErroServico as e:
+        print(e)
         return
-    
-    nova_lista = [prod for prod in produtos if prod['id'] != id_prod]
-    
-    if len(nova_lista) < len(produtos):
-        salvar_dados(nova_lista, PRODUTOS_FILE)
-        print("Produto removido com sucesso!")
-    else:
-        print("Produto não encontrado.")
+    print("Produto removido com sucesso!")
 
 def listar_produtos():
-    produtos = carregar_dados(PRODUTOS_FILE)
+    produtos = servico.listar('produto')
     
     if not produtos:
         print("Nenhum produto encontrado.")
@@ -423,6 +387,134 @@ def listar_produtos():
     
     return produtos
 
+def menu_centros():
+    while True:
+        print("\n--- Centros de Distribuição ---")
+        print("1. Adicionar")
+        print("2. Alterar")
+        print("3. Remover")
+        print("4. Listar")
+        print("5. Atribuir Propriedades aos Centros")
+        print("0. Voltar")
+        opcao = input("Escolha uma opção: ")
+
+        if opcao == '1':
+            adicionar_centro()
+        elif opcao == '2':
+            alterar_centro()
+        elif opcao == '3':
+            remover_centro()
+        elif opcao == '4':
+            listar_centros()
+        elif opcao == '5':
+            atribuir_propriedades()
+        elif opcao == '0':
+            break
+
+def adicionar_centro():
+    nome = input_nao_vazio("Nome do centro: ")
+    localizacao = input_nao_vazio("Localização: ")
+    latitude = input_float("Latitude (ex.: -22.9): ")
+    longitude = input_float("Longitude (ex.: -47.06): ")
+    capacidade = input_float_opcional("Capacidade de recebimento (kg, vazio = sem limite): ")
+    
+    servico.criar_centro(nome, localizacao, latitude, longitude, capacidade)
+    print("Centro de distribuição adicionado com sucesso!")
+
+def alterar_centro():
+    centros = listar_centros()
+    if not centros:
+        return
+    
+    id_centro = input_id("Escolha o ID do centro para alterar: ")
+    
+    try:
+        centro = servico.obter('centro', id_centro)
+    except ErroServico as e:
+        print(e)
+        return
+    
+    nome = input_nao_vazio(f"Novo nome [{centro['nome']}]: ") or centro['nome']
+    localizacao = input_nao_vazio(f"Nova localização [{centro['localizacao']}]: ") or centro['localizacao']
+    latitude = input_float_opcional(f"Nova latitude [{centro['latitude']}] (vazio mantém): ")
+    longitude = input_float_opcional(f"Nova longitude [{centro['longitude']}] (vazio mantém): ")
+    capacidade = input_float_opcional(f"Nova capacidade (kg) [{centro.get('capacidade')}] (vazio mantém): ")
+    
+    servico.alterar(
+        'centro', id_centro,
+        nome=nome,
+        localizacao=localizacao,
+        latitude=centro['latitude'] if latitude is None else latitude,
+        longitude=centro['longitude'] if longitude is None else longitude,
+        capacidade=centro.get('capacidade') if capacidade is None else capacidade
+    )
+    print("Centro de distribuição atualizado com sucesso!")
+
+def remover_centro():
+    centros = listar_centros()
+    if not centros:
+        return
+    
+    id_centro = input_id("Escolha o ID do centro para remover: ")
+    try:
+        servico.remover('centro', id_centro)
+    except ErroServico as e:
+        print(e)
+        return
+    print("Centro de distribuição removido com sucesso!")
+
+def listar_centros():
+    centros = servico.listar('centro')
+    
+    if not centros:
+        print("Nenhum centro de distribuição encontrado.")
+        return []
+    
+    print("\n--- Lista de Centros de Distribuição ---")
+    for centro in centros:
+        print(f"ID {centro['id']}: {centro['nome']}")
+        print(f"  Localização: {centro['localizacao']}")
+        print(f"  Coordenadas: {centro['latitude']}, {centro['longitude']}")
+        capacidade = centro.get('capacidade')
+        print(f"  Capacidade: {'sem limite' if capacidade is None else f'{capacidade} kg'}")
+        print(f"  Data de cadastro: {centro['data_cadastro']}")
+    
+    return centros
+
+def atribuir_propriedades():
+    print("\n--- Atribuir Propriedades aos Centros ---")
+    if not listar_veiculos():
+        return
+    id_veic = input_id("ID do veículo usado nas coletas: ")
+    peso_total = input_float("Peso coletado em cada propriedade (kg): ")
+    try:
+        resultado = servico.atribuir_centros(id_veic, peso_total)
+    except ErroServico as e:
+        print(e)
+        return
+    mostrar_atribuicao(resultado)
+
+def mostrar_atribuicao(resultado, limite=TAMANHO_PAGINA):
+    """Resumo da atribuição: carga e propriedades por centro e as primeiras atribuições"""
+    nomes_centros = mapa_nomes(servico.listar('centro'), 'nome')
+    por_centro = {}
+    for item in resultado['atribuicoes']:
+        por_centro[item['centro_id']] = por_centro.get(item['centro_id'], 0) + 1
+
+    print(f"\n{len(resultado['atribuicoes'])} propriedade(s) atribuída(s), custo total R$ {resultado['custo_total']:.2f}")
+    for centro_id, carga in resultado['carga_centros'].items():
+        print(f"  {nomes_centros.get(centro_id, DESCONHECIDO)} (ID {centro_id}): "
+              f"{por_centro.get(centro_id, 0)} propriedade(s), {carga:.2f} kg")
+    for item in resultado['atribuicoes'][:limite]:
+        print(f"  Propriedade {item['propriedade_id']} -> centro {item['centro_id']}: "
+              f"{item['distancia']:.2f} km, R$ {item['custo_total']:.2f}")
+    if len(resultado['atribuicoes']) > limite:
+        print(f"  ... (mais {len(resultado['atribuicoes']) - limite})")
+    if resultado['sem_localizacao']:
+        print(f"Sem latitude/longitude (não atribuídas): {', '.join(map(str, resultado['sem_localizacao']))}")
+    if resultado['sem_capacidade']:
+        print(f"Sem centro com capacidade disponível: {len(resultado['sem_capacidade'])} propriedade(s)")
+
 def calcular_transporte():
     propriedades = listar_propriedades()
     if not propriedades:
@@ -431,9 +523,10 @@ def calcular_transporte():
     id_prop = input_id("ID da propriedade: ")
     
     # Buscar propriedade
-    prop = next((p for p in propriedades if p['id'] == id_prop), None)
-    if not prop:
-        print("Propriedade não encontrada.")
+    try:
+        servico.obter('propriedade', id_prop)
+    except ErroServico as e:
+        print(e)
         return
     
     veiculos = listar_veiculos()
@@ -443,9 +536,10 @@ def calcular_transporte():
     id_veic = input_id("ID do veículo: ")
     
     # Buscar veículo
-    veic = next((v for v in veiculos if v['id'] == id_veic), None)
-    if not veic:
-        print("Veículo não encontrado.")
+    try:
+        servico.obter('veiculo', id_veic)
+    except ErroServico as e:
+        print(e)
         return
     
     produtos = listar_produtos()
@@ -455,84 +549,149 @@ def calcular_transporte():
     id_prod = input_id("ID do produto: ")
     
     # Buscar produto
-    prod = next((p for p in produtos if p['id'] == id_prod), None)
-    if not prod:
-        print("Produto não encontrado.")
+    try:
+        servico.obter('produto', id_prod)
+    except ErroServico as e:
+        print(e)
         return
     
     peso_total = input_float("Peso total a ser transportado (kg): ")
-    viagens = -(-peso_total // veic['capacidade'])  # Arredondamento para cima
-    distancia_total = viagens * 2 * prop['distancia']  # ida e volta
-
-    # Tempo estimado considerando velocidade média de 55km/h, 8h/dia de estrada e 3h de paradas
-    velocidade_media = 55
-    horas_dia_viagem = 8
-    horas_paradas_dia = 3
-    km_por_dia = velocidade_media * horas_dia_viagem
-    dias_viagem = distancia_total / km_por_dia
-    tempo_total_horas = dias_viagem * (horas_dia_viagem + horas_paradas_dia)
-
-    # Custo estimado
-    custo_combustivel = veic['custo_km'] * distancia_total
-    custo_manutencao = custo_combustivel
-    custo_motorista = 2 * 250 * dias_viagem  # 2x salário por dia (R$250/dia)
-
-    custo_total = custo_combustivel + custo_manutencao + custo_motorista
-
-    print("\nNúmero de viagens: {}".format(int(viagens)))
-    print("Distância total: {:.2f} km".format(distancia_total))
-    print("Velocidade média: 55 km/h | 8h de estrada + 3h de paradas por dia")
-    print("Tempo estimado total de transporte: {:.2f} horas (~{:.1f} dias)".format(tempo_total_horas, dias_viagem))
+    parametros = PARAMETROS_PADRAO
+    try:
+        # O cálculo é salvo no histórico pelo próprio serviço
+        custos = servico.calcular(id_prop, id_veic, id_prod, peso_total, parametros)
+    except ErroServico as e:
+        print(e)
+        return
+
+    print("\nNúmero de viagens: {}".format(custos['viagens']))
+    print("Distância total: {:.2f} km".format(custos['distancia_total']))
+    print("Velocidade média: {:g} km/h | {:g}h de estrada + {:g}h de paradas por dia".format(
+        parametros.velocidade_media, parametros.horas_dia_viagem, parametros.horas_paradas_dia))
+    print("Tempo estimado total de transporte: {:.2f} horas (~{:.1f} dias)".format(custos['tempo_total'], custos['dias_viagem']))
     print("\nCálculo do custo:")
-    print("  - Combustível: R$ {:.2f}".format(custo_combustivel))
-    print("  - Manutenção (1x combustível): R$ {:.2f}".format(custo_manutencao))
-    print("  - Motorista (2x R$250 por dia): R$ {:.2f}".format(custo_motorista))
-    print("Custo total estimado: R$ {:.2f}".format(custo_total))
-
-    # Salvar o cálculo
-    calculos = carregar_dados(CALCULOS_FILE)
-    novo_calculo = {
-        'id': gerar_id(calculos),
-        'propriedade_id': id_prop,
-        'veiculo_id': id_veic,
-        'produto_id': id_prod,
-        'peso_total': peso_total,
-        'viagens': int(viagens),
-        'distancia_total': distancia_total,
-        'custo_total': custo_total,
-        'tempo_total': tempo_total_horas,
-        'data_calculo': datetime.now().strftime("%d/%m/%Y %H:%M")
-    }
-    
-    calculos.append(novo_calculo)
-    salvar_dados(calculos, CALCULOS_FILE)
+    print("  - Combustível: R$ {:.2f}".format(custos['custo_combustivel']))
+    print("  - Manutenção ({:g}x combustível): R$ {:.2f}".format(parametros.fator_manutencao, custos['custo_manutencao']))
+    print("  - Motorista ({}x R${:g} por dia): R$ {:.2f}".format(parametros.motoristas, parametros.diaria_motorista, custos['custo_motorista']))
+    print("Custo total estimado: R$ {:.2f}".format(custos['custo_total']))
     print("\nCálculo salvo com sucesso!")
 
-def listar_calculos():
-    calculos = carregar_dados(CALCULOS_FILE)
-    propriedades = carregar_dados(PROPRIEDADES_FILE)
-    veiculos = carregar_dados(VEICULOS_FILE)
-    produtos = carregar_dados(PRODUTOS_FILE)
+def otimizar_transporte():
+    """Busca, entre todos os veículos cadastrados, a combinação de viagens mais barata"""
+    if not listar_propriedades():
+        return
+    try:
+        prop = servico.obter('propriedade', input_id("ID da propriedade: "))
+    except ErroServico as e:
+        print(e)
+        return
+    
+    if not listar_produtos():
+        return
+    try:
+        prod = servico.obter('produto', input_id("ID do produto: "))
+    except ErroServico as e:
+        print(e)
+        return
+    
+    if not servico.listar('veiculo'):
+        print("Nenhum veículo encontrado.")
+        return
+    
+    peso_total = input_float("Peso total a ser transportado (kg): ")
+    try:
+        resultado = servico.otimizar(prop['id'], peso_total)
+    except ValueError as e:
+        print(f"Não foi possível otimizar: {e}")
+        return
     
-    if not calculos:
+    print(f"\n--- Frota otimizada: {peso_total} kg de {prod['nome']} saindo de {prop['nome']} ---")
+    for item in resultado['plano']:
+        print(f"  {item['tipo']} (ID {item['veiculo_id']}): {item['viagens']} viagem(ns), "
+              f"até {item['capacidade_total']:.0f} kg, R$ {item['custo_total']:.2f}")
+    print("Distância total: {:.2f} km".format(resultado['distancia_total']))
+    print("Tempo estimado total de transporte: {:.2f} horas".format(resultado['tempo_total']))
+    print("Custo total estimado: R$ {:.2f}".format(resultado['custo_total']))
+    if resultado['resolucao'] > 1:
+        print(f"(Combinação otimizada com o peso em unidades de {resultado['resolucao']:.0f} kg.)")
+    
+    unico = resultado['melhor_veiculo_unico']
+    print("Melhor veículo único (ID {}): {} viagem(ns), R$ {:.2f}".format(unico['veiculo_id'], unico['viagens'], unico['custo_total']))
+
+def listar_calculos(**filtros):
+    """Lista os cálculos página a página, sem carregar todo o histórico"""
+    paginas = paginar(servico.calculos_com_nomes(**filtros), TAMANHO_PAGINA)
+    pagina = next(paginas, None)
+    if pagina is None:
         print("Nenhum cálculo encontrado.")
         return
     
     print("\n--- Lista de Cálculos ---")
-    for calc in calculos:
-        # Buscar nomes relacionados
-        prop_nome = next((p['nome'] for p in propriedades if p['id'] == calc['propriedade_id']), "Desconhecido")
-        veic_tipo = next((v['tipo'] for v in veiculos if v['id'] == calc['veiculo_id']), "Desconhecido")
-        prod_nome = next((p['nome'] for p in produtos if p['id'] == calc['produto_id']), "Desconhecido")
+    while pagina:
+        for calc, prop_nome, veic_tipo, prod_nome in pagina:
+            print(f"ID {calc['id']}: {prod_nome} de {prop_nome} com {veic_tipo}")
+            print(f"  Peso: {calc['peso_total']} kg, Viagens: {calc['viagens']}, Distância total: {calc['distancia_total']:.2f} km")
+            print(f"  Custo: R$ {calc['custo_total']:.2f}, Tempo: {calc['tempo_total']:.2f} h")
+            if 'data_calculo' in calc:
+                print(f"  Data do cálculo: {calc['data_calculo']}")
         
-        print(f"ID {calc['id']}: {prod_nome} de {prop_nome} com {veic_tipo}")
-        print(f"  Peso: {calc['peso_total']} kg, Viagens: {calc['viagens']}, Distância total: {calc['distancia_total']:.2f} km")
-        print(f"  Custo: R$ {calc['custo_total']:.2f}, Tempo: {calc['tempo_total']:.2f} h")
-        if 'data_calculo' in calc:
-            print(f"  Data do cálculo: {calc['data_calculo']}")
+        pagina = next(paginas, None)
+        if pagina and input("Enter para a próxima página ou 'q' para parar: ").strip().lower() == 'q':
+            break
+
+def consultar_calculos():
+    filtros = {}
+    if input("Deseja filtrar os cálculos? (s/n): ").strip().lower() == 's':
+        print("Deixe em branco os filtros que não quiser usar.")
+        filtros = {
+            'propriedade_id': input_id_opcional("ID da propriedade: "),
+            'veiculo_id': input_id_opcional("ID do veículo: "),
+            'produto_id': input_id_opcional("ID do produto: "),
+            'data_inicio': input_data_opcional("Data inicial (dd/mm/aaaa): "),
+            'data_fim': input_data_opcional("Data final (dd/mm/aaaa): ")
+        }
+    listar_calculos(**filtros)
+
+def _valor_ou_traco(valor, formato):
+    return format(valor, formato) if valor is not None else '-'
+
+def mostrar_relatorios(reconstruir=False):
+    """Custos por veículo e totais mensais por propriedade e por produto, a partir dos totais pré-agregados"""
+    tabelas = servico.relatorios(reconstruir)
+    if not tabelas['veiculos']:
+        print("Nenhum cálculo encontrado.")
+        return
+    nomes = {
+        'propriedade_id': mapa_nomes(servico.listar('propriedade'), 'nome'),
+        'veiculo_id': mapa_nomes(servico.listar('veiculo'), 'tipo'),
+        'produto_id': mapa_nomes(servico.listar('produto'), 'nome'),
+    }
+
+    print("\n--- Custos por Veículo ---")
+    print(f"{'ID':>5}  {'Veículo':<25} {'Cálculos':>9} {'Viagens':>9} {'Km':>12} {'Custo total':>14} {'R$/km':>8} {'R$/kg':>8}")
+    for linha in tabelas['veiculos']:
+        nome = nomes['veiculo_id'].get(linha['veiculo_id'], DESCONHECIDO)
+        print(f"{linha['veiculo_id']:>5}  {nome[:25]:<25} {linha['calculos']:>9} {linha['viagens']:>9} "
+              f"{linha['distancia_total']:>12.2f} {linha['custo_total']:>14.2f} "
+              f"{_valor_ou_traco(linha['custo_km'], '.2f'):>8} {_valor_ou_traco(linha['custo_kg'], '.4f'):>8}")
+
+    for tabela, chave, titulo in (('propriedades_mes', 'propriedade_id', 'Propriedade'),
+                                  ('produtos_mes', 'produto_id', 'Produto')):
+        print(f"\n--- Totais Mensais por {titulo} ---")
+        print(f"{'ID':>5}  {titulo:<25} {'Mês':>8} {'Cálculos':>9} {'Peso (kg)':>12} {'Custo total':>14}")
+        for linha in tabelas[tabela]:
+            nome = nomes[chave].get(linha[chave], DESCONHECIDO)
+            mes = f"{linha['mes'][5:]}/{linha['mes'][:4]}" if linha['mes'] else 'sem data'
+            print(f"{linha[chave]:>5}  {nome[:25]:<25} {mes:>8} {linha['calculos']:>9} "
+                  f"{linha['peso_total']:>12.2f} {linha['custo_total']:>14.2f}")
 
 def exportar_dados():
-    """Exporta todos os dados para um único arquivo JSON na pasta Downloads"""
+    """Exporta todos os dados para um único arquivo na pasta Downloads, no formato escolhido
+
+    JSON consolidado e legível (como dados.json, que pode ser importado) ou cópia de segurança
+    compactada .jsonl.gz (ver copia_seguranca), menor e conferida por CRC, que pode ser
+    restaurada pelo comando restaurar.
+    """
     print("\n--- Exportar Dados ---")
     
     # Pedir confirmação
@@ -541,32 +700,18 @@ def exportar_dados():
         print("Exportação cancelada.")
         return
     
+    print("Formato: 1. JSON (legível)  2. Cópia compactada .jsonl.gz (menor, pode ser restaurada)")
+    compactado = input("Escolha o formato [1]: ").strip() == '2'
+    extensao = '.jsonl.gz' if compactado else '.json'
+    
     nome_arquivo = input("Nome do arquivo (sem extensão) [dados_transporte_rural_export]: ").strip()
     
     if nome_arquivo == "":
         nome_arquivo = "dados_transporte_rural_export"
     
     # Adicionar extensão se não tiver
-    if not nome_arquivo.endswith('.json'):
-        nome_arquivo += '.json'
-    
-    # Carregar todos os dados
-    try:
-        propriedades = carregar_dados(PROPRIEDADES_FILE)
-        veiculos = carregar_dados(VEICULOS_FILE)
-        produtos = carregar_dados(PRODUTOS_FILE)
-        calculos = carregar_dados(CALCULOS_FILE)
-    except Exception as e:
-        print(f"Erro ao carregar dados para exportação: {e}")
-        return
-    
-    # Criar estrutura consolidada
-    dados_consolidados = {
-        "propriedades": propriedades,
-        "veiculos": veiculos,
-        "produtos": produtos,
-        "calculos_realizados": calculos
-    }
+    if not nome_arquivo.endswith(extensao):
+        nome_arquivo += extensao
     
     try:
         # Definir caminho da pasta Downloads
@@ -575,9 +720,11 @@ def exportar_dados():
         # Garantir que a pasta Downloads existe
         os.makedirs(Path.home() / "Downloads", exist_ok=True)
         
-        # Salvar o arquivo
-        with open(caminho_downloads, 'w', encoding='utf-8') as f:
-            json.dump(dados_consolidados, f, ensure_ascii=False, indent=2)
+        # Gravar o arquivo registro a registro, sem carregar todo o histórico na memória
+        if compactado:
+            gravar_copia(caminho_downloads)
+        else:
+            exportar_consolidado(caminho_downloads)
         
         print(f"\nDados exportados com sucesso para: {caminho_downloads}")
         print("O arquivo está disponível na sua pasta Downloads.")
@@ -586,12 +733,452 @@ def exportar_dados():
         print(f"\nErro ao exportar dados: {e}")
         print("Verifique se você tem permissão para escrever na pasta Downloads.")
 
-# Execução principal
-if __name__ == "__main__":
+def executar_lote(entrada, saida):
+    """Calcula o custo de transporte de todas as linhas de um arquivo CSV/JSON, sem interação"""
+    propriedades = repositorio(PROPRIEDADES_FILE).listar()
+    veiculos = repositorio(VEICULOS_FILE).listar()
+    produtos = repositorio(PRODUTOS_FILE).listar()
+
+    try:
+        total = processar_arquivo_lote(entrada, saida, propriedades, veiculos, produtos)
+    except (OSError, ValueError) as e:
+        print(f"Erro no cálculo em lote: {e}")
+        return 1
+
+    print(f"{total} cálculo(s) gravado(s) em: {saida}")
+    return 0
+
+def executar_migracao_sqlite(forcar=False):
+    """Migra de uma só vez os arquivos JSON do diretório de dados para o banco SQLite"""
+    totais = migrar_de_json(DATA_DIR, forcar)
+    if not totais:
+        print(f"O banco {DATA_DIR / NOME_BANCO} já tem dados. Use --forcar para substituí-los.")
+        return 1
+
+    for tabela, total in totais.items():
+        print(f"  {tabela}: {total} registro(s)")
+    print(f"Migração concluída: {DATA_DIR / NOME_BANCO}")
+    print("Use --backend sqlite (ou TRANSPORTE_BACKEND=sqlite) para trabalhar com o banco.")
+    return 0
+
+def executar_rotas(arquivo_coletas, id_veic):
+    """Consolida as coletas de um arquivo CSV/JSON em rotas compartilhadas e compara com o cálculo ingênuo"""
+    veic = repositorio(VEICULOS_FILE).obter(id_veic)
+    if not veic:
+        print("Veículo não encontrado.")
+        return 1
+
+    try:
+        colunas = ler_lote(arquivo_coletas, ('propriedade_id', 'produto_id', 'peso_total'))
+        coletas = zip(colunas['propriedade_id'], colunas['produto_id'], colunas['peso_total'])
+        resultado = planejar_rotas(coletas, com_distancias(repositorio(PROPRIEDADES_FILE).listar()), veic)
+    except (OSError, ValueError) as e:
+        print(f"Erro na roteirização: {e}")
+        return 1
+
+    nomes = mapa_nomes(repositorio(PROPRIEDADES_FILE).listar(), 'nome')
+    print(f"\n--- Rotas com {veic['tipo']} (capacidade {veic['capacidade']} kg) ---")
+    for direta in resultado['viagens_diretas']:
+        print(f"  Direta: {nomes[direta['propriedade_id']]} - {direta['viagens']} viagem(ns) cheia(s), "
+              f"{direta['distancia_total']:.2f} km, R$ {direta['custo_total']:.2f}")
+    for numero, rota in enumerate(resultado['rotas'], start=1):
+        paradas = " -> ".join(nomes[pid] for pid in rota['paradas'])
+        print(f"  Rota {numero}: Centro -> {paradas} -> Centro")
+        print(f"    Carga: {rota['carga']:.2f} kg, {rota['distancia_total']:.2f} km, R$ {rota['custo_total']:.2f}")
+    print("Total consolidado: {:.2f} km, R$ {:.2f}".format(resultado['distancia_total'], resultado['custo_total']))
+    print("Total por propriedade (ida e volta): {:.2f} km, R$ {:.2f}".format(resultado['distancia_ingenua'], resultado['custo_ingenuo']))
+    print("Economia: R$ {:.2f}".format(resultado['economia']))
+    return 0
+
+def executar_cenarios(arquivo_grade, peso_total, processos=None, saida=None):
+    """Varre a grade de parâmetros de custo para todo o catálogo e resume os custos por propriedade"""
+    try:
+        grade = carregar_grade(arquivo_grade)
+        resumo = varrer_cenarios(grade, repositorio(PROPRIEDADES_FILE).listar(), repositorio(VEICULOS_FILE).listar(),
+                                 peso_total, processos)
+    except (OSError, ValueError) as e:
+        print(f"Erro na varredura de cenários: {e}")
+        return 1
+
+    print(f"\n--- {len(grade)} cenário(s), {peso_total} kg por propriedade (veículo mais barato) ---")
+    print(f"{'ID':>5}  {'Propriedade':<30} {'Mínimo':>12} {'P10':>12} {'P50':>12} {'P90':>12} {'Máximo':>12}")
+    for linha in resumo:
+        print(f"{linha['propriedade_id']:>5}  {linha['nome'][:30]:<30} {linha['minimo']:>12.2f} {linha['p10']:>12.2f} "
+              f"{linha['p50']:>12.2f} {linha['p90']:>12.2f} {linha['maximo']:>12.2f}")
+    if saida:
+        escrever_resumo(saida, resumo)
+        print(f"Resumo gravado em: {saida}")
+    return 0
+
+def executar_monte_carlo(arquivo_lote, cotacao, amostras=AMOSTRAS_PADRAO, semente=None, processos=None,
+                         arquivo_distribuicoes=None, saida=None):
+    """Percentis de custo e tempo de uma cotação (`cotacao`) ou de um lote, por Monte Carlo"""
+    try:
+        if arquivo_lote:
+            colunas = ler_lote(arquivo_lote)
+        else:
+            try:
+                colunas = {'propriedade_id': [int(cotacao[0])], 'veiculo_id': [int(cotacao[1])],
+                           'produto_id': [int(cotacao[2])], 'peso_total': [float(cotacao[3].replace(',', '.'))]}
+            except ValueError:
+                raise ValueError("Cotação inválida: informe os IDs (números inteiros) e o peso em kg.")
+        distribuicoes = carregar_distribuicoes(arquivo_distribuicoes) if arquivo_distribuicoes else montar_distribuicoes({})
+        distancias, capacidades, custos_km = resolver_lote(
+            colunas['propriedade_id'], colunas['veiculo_id'], colunas['produto_id'],
+            repositorio(PROPRIEDADES_FILE).listar(), repositorio(VEICULOS_FILE).listar(), repositorio(PRODUTOS_FILE).listar()
+        )
+        simulacao = simular(distancias, capacidades, custos_km, colunas['peso_total'], distribuicoes, amostras, semente,
+                            processos)
+    except (OSError, ValueError) as e:
+        print(f"Erro na simulação de Monte Carlo: {e}")
+        return 1
+
+    print(f"\n--- Monte Carlo: {amostras} amostra(s) por cotação, semente {simulacao['semente']} ---")
+    print(f"{'Propr.':>6} {'Veíc.':>5} {'Peso (kg)':>10}  {'Custo P10':>11} {'P50':>11} {'P90':>11}  "
+          f"{'Tempo P10':>9} {'P50':>8} {'P90':>8}")
+    for valores, resumo in zip(zip(*(colunas[campo] for campo in CAMPOS_ENTRADA)), simulacao['cotacoes']):
+        propriedade_id, veiculo_id, _, peso_total = valores
+        print(f"{propriedade_id:>6} {veiculo_id:>5} {peso_total:>10.1f}  {resumo['custo_p10']:>11.2f} "
+              f"{resumo['custo_p50']:>11.2f} {resumo['custo_p90']:>11.2f}  {resumo['tempo_p10']:>9.1f} "
+              f"{resumo['tempo_p50']:>8.1f} {resumo['tempo_p90']:>8.1f}")
+    if len(simulacao['cotacoes']) > 1:
+        custo, tempo = simulacao['custo_total'], simulacao['tempo_total']
+        print(f"Lote ({len(simulacao['cotacoes'])} cotações): custo P10 R$ {custo['p10']:.2f}, P50 R$ {custo['p50']:.2f}, "
+              f"P90 R$ {custo['p90']:.2f}; tempo somado P10 {tempo['p10']:.1f} h, P50 {tempo['p50']:.1f} h, "
+              f"P90 {tempo['p90']:.1f} h")
+    if saida:
+        escrever_simulacao(saida, colunas, simulacao)
+        print(f"Percentis por cotação gravados em: {saida}")
+    return 0
+
+def executar_servidor(host, porta, janela, lote_maximo):
+    """Atende cotações por HTTP até Ctrl+C, usando o diretório de dados local"""
+    def pronto(endereco):
+        print(f"Servidor de cotações em http://{endereco[0]}:{endereco[1]} (dados em {DATA_DIR})")
+        print("Pressione Ctrl+C para encerrar.")
+
+    try:
+        asyncio.run(servidor_http.servir(host, porta, janela, lote_maximo, pronto))
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
+    except OSError as e:
+        print(f"Não foi possível iniciar o servidor: {e}")
+        return 1
+    return 0
+
+def executar_importacao(arquivo, formato=None, secao=None, relatorio=None, tamanho_lote=TAMANHO_LOTE):
+    """Importa propriedades, veículos, produtos e/ou cálculos de um arquivo CSV, JSON Lines ou consolidado"""
+    try:
+        resultado = importar(arquivo, formato, secao, relatorio, tamanho_lote)
+    except (OSError, ValueError) as e:
+        print(f"Erro na importação: {e}")
+        return 1
+
+    for secao_importada, total in resultado['importados'].items():
+        if total:
+            print(f"  {secao_importada}: {total} registro(s) importado(s)")
+    if resultado['erros']:
+        print(f"{resultado['erros']} linha(s) com erro:")
+        for erro in resultado['exemplos_erros']:
+            print(f"  {erro['secao']}, linha {erro['linha']}: {erro['erro']}")
+        if resultado['erros'] > len(resultado['exemplos_erros']):
+            print("  ..." + (f" (lista completa em {relatorio})" if relatorio else " (use --relatorio para a lista completa)"))
+        return 1
+    print("Importação concluída sem erros.")
+    return 0
+
+def executar_exportacao(destino, formato):
+    """Exporta todos os dados em um dos formatos de importação"""
+    try:
+        totais = exportar(destino, formato)
+    except (OSError, ValueError) as e:
+        print(f"Erro na exportação: {e}")
+        return 1
+    for secao, total in totais.items():
+        print(f"  {secao}: {total} registro(s)")
+    print(f"Dados exportados para: {destino}")
+    return 0
+
+def executar_backup(destino):
+    """Grava a cópia de segurança compactada de todos os dados"""
+    try:
+        contagens = gravar_copia(destino)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao gravar a cópia: {e}")
+        return 1
+    for tabela, total in contagens.items():
+        print(f"  {tabela}: {total} registro(s)")
+    print(f"Cópia gravada em: {destino} ({os.path.getsize(destino) / 1024:.1f} KB)")
+    return 0
+
+def executar_restauracao(origem, verificar=False):
+    """Confere a cópia de segurança e, sem `verificar`, substitui todos os dados por ela"""
+    try:
+        contagens = verificar_copia(origem) if verificar else restaurar_copia(origem)
+    except (OSError, ValueError) as e:
+        print(f"Erro na cópia {origem}: {e}")
+        print("Nenhum dado foi alterado.")
+        return 1
+    for tabela, total in contagens.items():
+        print(f"  {tabela}: {total} registro(s)")
+    print("Cópia íntegra." if verificar else f"Dados restaurados de: {origem}")
+    return 0
+
+def executar_malha(arquivo_arestas, arquivo_centros=None, arquivo_nos=None):
+    """Calcula pela malha viária a distância de cada propriedade a cada centro e grava a matriz
+
+    Os centros são os cadastrados, a não ser que `arquivo_centros` seja informado.
+    """
+    try:
+        malha = MalhaViaria.carregar(arquivo_arestas, arquivo_nos)
+        centros = ler_centros(arquivo_centros) if arquivo_centros else servico.listar('centro')
+        propriedades = servico.listar('propriedade')
+        inicio = time.perf_counter()
+        matriz = calcular_matriz(malha, propriedades, centros)
+        matriz_distancias.gravar(matriz)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao calcular as distâncias: {e}")
+        return 1
+
+    print(f"Malha com {len(malha)} nó(s); {len(matriz)} distância(s) calculada(s) em "
+          f"{time.perf_counter() - inicio:.2f} s para {len(propriedades)} propriedade(s) e {len(centros)} centro(s).")
+    sem_caminho = [prop['id'] for prop in propriedades if matriz_distancias.mais_proximo(prop['id']) is None]
+    if sem_caminho:
+        print(f"Sem localização ou caminho na malha (usam a distância cadastrada): propriedade(s) {', '.join(map(str, sem_caminho))}")
+    print(f"Matriz gravada em: {matriz_distancias.arquivo}")
+    return 0
+
+def executar_atribuicao(id_veic, peso_total, candidatos, saida=None):
+    """Atribui todas as propriedades aos centros cadastrados e, opcionalmente, grava o resultado em CSV"""
+    try:
+        inicio = time.perf_counter()
+        resultado = servico.atribuir_centros(id_veic, peso_total, candidatos)
+        duracao = time.perf_counter() - inicio
+        if saida:
+            escrever_atribuicao(saida, resultado['atribuicoes'])
+    except (OSError, ValueError) as e:
+        print(f"Erro na atribuição: {e}")
+        return 1
+    mostrar_atribuicao(resultado)
+    print(f"Tempo: {duracao:.2f} s")
+    if saida:
+        print(f"Atribuições gravadas em: {saida}")
+    return 0
+
+def executar_escalonamento(arquivo_servicos, data_inicio=None, saida=None):
+    """Plano dia a dia das coletas com a frota, a partir de um arquivo de serviços com janelas de colheita"""
+    try:
+        servicos = ler_servicos(arquivo_servicos)
+        plano = servico.escalonar_coletas(servicos, ler_data(data_inicio) if data_inicio else None)
+        if saida:
+            escrever_plano(saida, plano)
+    except (OSError, ValueError) as e:
+        print(f"Erro no escalonamento: {e}")
+        return 1
+
+    print(f"\n--- Plano de coletas: {len(servicos)} serviço(s), {len(plano['viagens'])} viagem(ns) ---")
+    print(f"{'Dia':<12} {'Viagens':>8} {'Peso (kg)':>12} {'Custo':>14} {'Veículos':>9}")
+    for dia, totais in resumo_diario(plano):
+        print(f"{dia.strftime('%d/%m/%Y'):<12} {totais['viagens']:>8} {totais['peso']:>12.2f} "
+              f"{totais['custo_total']:>14.2f} {len(totais['veiculos']):>9}")
+
+    tipos = mapa_nomes(servico.listar('veiculo'), 'tipo')
+    print("\n--- Utilização da frota ---")
+    for uso in plano['utilizacao']:
+        print(f"{uso['veiculo_id']:>5}  {tipos.get(uso['veiculo_id'], DESCONHECIDO)[:25]:<25} "
+              f"{uso['viagens']:>5} viagem(ns) {uso['horas']:>9.1f} h {uso['utilizacao']:>7.1%}")
+
+    print(f"\nConclusão em {plano['makespan_dias']} dia(s) a partir de {plano['data_inicio'].strftime('%d/%m/%Y')}; "
+          f"custo total R$ {plano['custo_total']:.2f}")
+    if plano['atrasados']:
+        print(f"{len(plano['atrasados'])} serviço(s) terminam fora da janela:")
+        for atraso in plano['atrasados'][:TAMANHO_PAGINA]:
+            print(f"  Serviço {atraso['servico'] + 1} (propriedade {atraso['propriedade_id']}): "
+                  f"{atraso['atraso_dias']} dia(s) de atraso")
+    if saida:
+        print(f"Plano gravado em: {saida}")
+    return 0
+
+def executar_relatorio(reconstruir=False):
+    try:
+        mostrar_relatorios(reconstruir)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao gerar os relatórios: {e}")
+        return 1
+    return 0
+
+def executar_resumo_historico(arquivo_colunar=None, atualizar=False):
+    """Custo por propriedade e mês e custo por kg de cada veículo, a partir do histórico em colunas
+
+    Com `arquivo_colunar`, o histórico é lido desse arquivo (mapeado em memória) em vez dos
+    dados; se o arquivo ainda não existir, ou com `atualizar`, ele é gerado a partir dos dados.
+    """
+    try:
+        if arquivo_colunar and Path(arquivo_colunar).exists() and not atualizar:
+            historico = HistoricoColunar.carregar(arquivo_colunar)
+        else:
+            historico = HistoricoColunar.de_calculos(iterar_registros('calculos'))
+            if arquivo_colunar:
+                historico.salvar(arquivo_colunar)
+                print(f"Histórico em colunas gravado em: {arquivo_colunar}")
+    except (OSError, ValueError) as e:
+        print(f"Erro ao carregar o histórico: {e}")
+        return 1
+
+    try:
+        por_mes = historico.custo_por_propriedade_mes()
+        por_kg = historico.custo_medio_kg_por_veiculo()
+        registros = len(historico)
+    finally:
+        historico.fechar()
+    nomes_propriedades = mapa_nomes(servico.listar('propriedade'), 'nome')
+    tipos_veiculos = mapa_nomes(servico.listar('veiculo'), 'tipo')
+
+    print(f"\n--- Custo por propriedade e mês ({registros} cálculo(s)) ---")
+    print(f"{'ID':>5}  {'Propriedade':<30} {'Mês':>8} {'Custo total':>14}")
+    for (propriedade_id, ano, mes), total in sorted(por_mes.items()):
+        nome = nomes_propriedades.get(propriedade_id, DESCONHECIDO)
+        print(f"{propriedade_id:>5}  {nome[:30]:<30} {mes:02d}/{ano:>4} {total:>14.2f}")
+
+    print("\n--- Custo por kg transportado, por veículo ---")
+    for veiculo_id, custo_kg in sorted(por_kg.items()):
+        print(f"{veiculo_id:>5}  {tipos_veiculos.get(veiculo_id, DESCONHECIDO)[:30]:<30} R$ {custo_kg:.4f}/kg")
+    return 0
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Simulador de Logística de Transporte Rural")
+    parser.add_argument('--backend', choices=armazenamento.BACKENDS, default=armazenamento.BACKEND,
+                        help="Armazenamento dos dados (padrão: variável TRANSPORTE_BACKEND ou 'json')")
+    subparsers = parser.add_subparsers(dest='comando')
+
+    parser_lote = subparsers.add_parser('lote', help="Calcula o transporte em lote a partir de um arquivo CSV ou JSON")
+    parser_lote.add_argument('entrada', help="Arquivo com as colunas propriedade_id, veiculo_id, produto_id, peso_total")
+    parser_lote.add_argument('saida', help="Arquivo de resultado (.csv ou .json)")
+
+    parser_cenarios = subparsers.add_parser('cenarios', help="Análise de sensibilidade: varre uma grade de parâmetros de custo")
+    parser_cenarios.add_argument('grade', help='Arquivo JSON com listas de valores, ex.: {"fator_combustivel": [0.9, 1.0, 1.1]}')
+    parser_cenarios.add_argument('--peso', type=float, default=1000.0, help="Peso transportado por propriedade (kg)")
+    parser_cenarios.add_argument('--processos', type=int, help="Quantidade de processos (padrão: número de CPUs)")
+    parser_cenarios.add_argument('--saida', help="Arquivo CSV para gravar o resumo por propriedade")
+
+    parser_monte_carlo = subparsers.add_parser('monte-carlo', help="Incerteza de custo e tempo (P10/P50/P90) por simulação de Monte Carlo")
+    grupo_cotacoes = parser_monte_carlo.add_mutually_exclusive_group(required=True)
+    grupo_cotacoes.add_argument('--cotacao', nargs=4, metavar=('PROPRIEDADE', 'VEICULO', 'PRODUTO', 'PESO'),
+                                help="Uma cotação: IDs da propriedade, do veículo e do produto e o peso (kg)")
+    grupo_cotacoes.add_argument('--lote', help="Arquivo CSV/JSON com as colunas propriedade_id, veiculo_id, produto_id, peso_total")
+    parser_monte_carlo.add_argument('--amostras', type=int, default=AMOSTRAS_PADRAO,
+                                    help=f"Amostras por cotação (padrão: {AMOSTRAS_PADRAO})")
+    parser_monte_carlo.add_argument('--semente', type=int, help="Semente do sorteio; a mesma semente repete o resultado")
+    parser_monte_carlo.add_argument('--processos', type=int, help="Quantidade de processos (padrão: número de CPUs)")
+    parser_monte_carlo.add_argument('--distribuicoes', help="Arquivo JSON com a distribuição de cada parâmetro (ver monte_carlo.py)")
+    parser_monte_carlo.add_argument('--saida', help="Arquivo CSV para gravar os percentis de cada cotação")
+
+    parser_migrar = subparsers.add_parser('migrar-sqlite', help="Copia os arquivos JSON do diretório de dados para o banco SQLite")
+    parser_migrar.add_argument('--forcar', action='store_true', help="Substitui o conteúdo do banco mesmo que ele já tenha dados")
+
+    parser_rotas = subparsers.add_parser('rotas', help="Consolida coletas de várias propriedades em rotas compartilhadas")
+    parser_rotas.add_argument('coletas', help="Arquivo CSV/JSON com as colunas propriedade_id, produto_id, peso_total")
+    parser_rotas.add_argument('--veiculo', type=int, required=True, help="ID do veículo usado nas rotas")
+
+    parser_servidor = subparsers.add_parser('servidor', help="Servidor HTTP local de cotações (para integração com o ERP)")
+    parser_servidor.add_argument('--host', default=servidor_http.HOST_PADRAO, help="Endereço (padrão: só esta máquina)")
+    parser_servidor.add_argument('--porta', type=int, default=servidor_http.PORTA_PADRAO, help="Porta TCP")
+    parser_servidor.add_argument('--janela-ms', type=float, default=servidor_http.JANELA_LOTE * 1000,
+                                 help="Espera para agrupar cotações simultâneas em um lote (ms)")
+    parser_servidor.add_argument('--lote-maximo', type=int, default=servidor_http.LOTE_MAXIMO,
+                                 help="Máximo de cotações avaliadas juntas")
+
+    parser_importar = subparsers.add_parser('importar', help="Importa cadastros e cálculos em massa (CSV, JSON Lines ou consolidado)")
+    parser_importar.add_argument('arquivo', help="Arquivo .csv/.jsonl de uma seção ou .json no formato consolidado (como dados.json)")
+    parser_importar.add_argument('--formato', choices=FORMATOS, help="Formato do arquivo (padrão: pela extensão)")
+    parser_importar.add_argument('--secao', choices=list(SECOES), help="Seção de um arquivo CSV/JSON Lines (padrão: nome do arquivo)")
+    parser_importar.add_argument('--relatorio', help="Arquivo CSV com todas as linhas recusadas e o motivo")
+    parser_importar.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE, help="Linhas validadas e gravadas por vez")
+
+    parser_exportar = subparsers.add_parser('exportar', help="Exporta todos os dados (consolidado, JSON Lines ou CSV)")
+    parser_exportar.add_argument('destino', help="Arquivo .json (consolidado) ou diretório (jsonl/csv, um arquivo por seção)")
+    parser_exportar.add_argument('--formato', choices=FORMATOS, default='consolidado', help="Formato (padrão: consolidado)")
+
+    parser_backup = subparsers.add_parser('backup', help="Grava uma cópia de segurança compactada (.jsonl.gz) de todos os dados")
+    parser_backup.add_argument('destino', help="Arquivo da cópia, ex.: copia.jsonl.gz")
+
+    parser_restaurar = subparsers.add_parser('restaurar', help="Substitui todos os dados pelos de uma cópia de segurança")
+    parser_restaurar.add_argument('origem', help="Arquivo gravado pelo comando backup")
+    parser_restaurar.add_argument('--verificar', action='store_true', help="Apenas confere a integridade da cópia")
+
+    parser_malha = subparsers.add_parser('malha', help="Calcula as distâncias por estrada até os centros de distribuição")
+    parser_malha.add_argument('arestas', help="CSV da malha viária com as colunas origem, destino, distancia (km) e mao_unica (opcional)")
+    parser_malha.add_argument('--centros', help="CSV dos centros com as colunas id, nome e latitude/longitude ou no "
+                                                "(padrão: os centros cadastrados)")
+    parser_malha.add_argument('--nos', help="CSV com as coordenadas dos nós da malha (no, latitude, longitude)")
+
+    parser_atribuir = subparsers.add_parser('atribuir', help="Atribui cada propriedade ao centro de menor custo, sob a capacidade dos centros")
+    parser_atribuir.add_argument('--veiculo', type=int, required=True, help="ID do veículo usado nas coletas")
+    parser_atribuir.add_argument('--peso', type=float, default=1000.0, help="Peso coletado em cada propriedade (kg)")
+    parser_atribuir.add_argument('--candidatos', type=int, default=CANDIDATOS_PADRAO,
+                                 help="Centros mais próximos avaliados por propriedade antes de ampliar a busca")
+    parser_atribuir.add_argument('--saida', help="Arquivo CSV para gravar a atribuição de cada propriedade")
+
+    parser_escalonar = subparsers.add_parser('escalonar', help="Plano de vários dias das coletas com a frota, respeitando as janelas de colheita")
+    parser_escalonar.add_argument('servicos', help="CSV/JSON com as colunas propriedade_id, peso_total, inicio e fim (dd/mm/aaaa)")
+    parser_escalonar.add_argument('--inicio', help="Primeiro dia do plano, dd/mm/aaaa (padrão: o início mais cedo)")
+    parser_escalonar.add_argument('--saida', help="Arquivo CSV para gravar todas as viagens do plano")
+
+    parser_relatorio = subparsers.add_parser('relatorio', help="Relatórios gerenciais: custos por veículo e totais mensais")
+    parser_relatorio.add_argument('--reconstruir', action='store_true',
+                                  help="Recalcula os totais percorrendo todo o histórico")
+
+    parser_historico = subparsers.add_parser('historico', help="Resumo do histórico: custo por propriedade e mês e por kg de cada veículo")
+    parser_historico.add_argument('--colunar', help="Arquivo binário do histórico em colunas (gerado se não existir)")
+    parser_historico.add_argument('--atualizar', action='store_true', help="Regera o arquivo --colunar a partir dos dados")
+
+    return parser
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    armazenamento.BACKEND = args.backend
+
+    if args.comando == 'lote':
+        return executar_lote(args.entrada, args.saida)
+    if args.comando == 'rotas':
+        return executar_rotas(args.coletas, args.veiculo)
+    if args.comando == 'cenarios':
+        return executar_cenarios(args.grade, args.peso, args.processos, args.saida)
+    if args.comando == 'monte-carlo':
+        return executar_monte_carlo(args.lote, args.cotacao, args.amostras, args.semente, args.processos,
+                                    args.distribuicoes, args.saida)
+    if args.comando == 'migrar-sqlite':
+        return executar_migracao_sqlite(args.forcar)
+    if args.comando == 'importar':
+        return executar_importacao(args.arquivo, args.formato, args.secao, args.relatorio, args.tamanho_lote)
+    if args.comando == 'exportar':
+        return executar_exportacao(args.destino, args.formato)
+    if args.comando == 'backup':
+        return executar_backup(args.destino)
+    if args.comando == 'restaurar':
+        return executar_restauracao(args.origem, args.verificar)
+    if args.comando == 'malha':
+        return executar_malha(args.arestas, args.centros, args.nos)
+    if args.comando == 'atribuir':
+        return executar_atribuicao(args.veiculo, args.peso, args.candidatos, args.saida)
+    if args.comando == 'escalonar':
+        return executar_escalonamento(args.servicos, args.inicio, args.saida)
+    if args.comando == 'relatorio':
+        return executar_relatorio(args.reconstruir)
+    if args.comando == 'historico':
+        return executar_resumo_historico(args.colunar, args.atualizar)
+    if args.comando == 'servidor':
+        return executar_servidor(args.host, args.porta, args.janela_ms / 1000, args.lote_maximo)
+
     try:
         setup_data_directory()
         print("Simulador de Logística de Transporte Rural iniciado com sucesso!")
         menu()
     except Exception as e:
         print(f"Erro inesperado: {e}")
-        time.sleep(3)  # Pausa para visualizar o erro antes de fechar
\ No newline at end of file
+        time.sleep(3)  # Pausa para visualizar o erro antes de fechar
+    return 0
+
+# Execução principal
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""Roteirização de coletas compartilhadas entre propriedades vizinhas (Clarke-Wright + 2-opt)"""
+import math
+
+from modelo_custos import calcular_custos, custos_percurso
+
+# Estradas rurais são mais longas que a linha reta entre duas propriedades
+FATOR_RODOVIARIO = 1.3
+RAIO_TERRA_KM = 6371.0
+
+
+def distancia_haversine(lat1, lon1, lat2, lon2):
+    """Distância em linha reta (km) entre dois pontos dados em graus"""
+    fi1, fi2 = math.radians(lat1), math.radians(lat2)
+    delta_fi = fi2 - fi1
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_fi / 2) ** 2 + math.cos(fi1) * math.cos(fi2) * math.sin(delta_lambda / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def tem_coordenadas(propriedade):
+    return propriedade.get('latitude') is not None and propriedade.get('longitude') is not None
+
+
+class _Distancias:
+    """Distâncias entre as paradas: até o centro usa o campo 'distancia'; entre propriedades, as coordenadas"""
+
+    def __init__(self, propriedades, fator_rodoviario):
+        self.propriedades = propriedades
+        self.fator_rodoviario = fator_rodoviario
+        self._cache = {}
+
+    def centro(self, i):
+        return self.propriedades[i]['distancia']
+
+    def entre(self, i, j):
+        if i == j:
+            return 0.0
+        chave = (i, j) if i < j else (j, i)
+        if chave not in self._cache:
+            a, b = self.propriedades[i], self.propriedades[j]
+            self._cache[chave] = self.fator_rodoviario * distancia_haversine(
+                a['latitude'], a['longitude'], b['latitude'], b['longitude'])
+        return self._cache[chave]
+
+    def rota(self, paradas):
+        """Distância de uma rota que sai do centro, passa pelas paradas em ordem e volta"""
+        total = self.centro(paradas[0]) + self.centro(paradas[-1])
+        for a, b in zip(paradas, paradas[1:]):
+            total += self.entre(a, b)
+        return total
+
+
+def _clarke_wright(nos, cargas, capacidade, dist):
+    """Heurística de economias de Clarke-Wright (versão paralela) sob a capacidade do veículo"""
+    rotas = {no: [no] for no in nos}
+    carga_rota = {no: cargas[no] for no in nos}
+    rota_de = {no: no for no in nos}
+
+    com_coordenadas = [no for no in nos if tem_coordenadas(dist.propriedades[no])]
+    economias = []
+    for posicao, i in enumerate(com_coordenadas):
+        for j in com_coordenadas[posicao + 1:]:
+            economia = dist.centro(i) + dist.centro(j) - dist.entre(i, j)
+            if economia > 0:
+                economias.append((economia, i, j))
+    economias.sort(reverse=True)
+
+    for _, i, j in economias:
+        ri, rj = rota_de[i], rota_de[j]
+        if ri == rj or carga_rota[ri] + carga_rota[rj] > capacidade:
+            continue
+        a, b = rotas[ri], rotas[rj]
+        # Só é possível unir pelas pontas: ... i] + [j ...
+        if a[-1] != i:
+            if a[0] != i:
+                continue
+            a.reverse()
+        if b[0] != j:
+            if b[-1] != j:
+                continue
+            b.reverse()
+        a.extend(b)
+        carga_rota[ri] += carga_rota.pop(rj)
+        del rotas[rj]
+        for no in b:
+            rota_de[no] = ri
+    return [(paradas, carga_rota[chave]) for chave, paradas in rotas.items()]
+
+
+def _dois_opt(paradas, dist):
+    """Melhoria local 2-opt: inverte trechos da rota enquanto isso encurtar o percurso"""
+    if len(paradas) < 3:
+        return paradas
+    melhor = list(paradas)
+    melhor_distancia = dist.rota(melhor)
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for i in range(len(melhor) - 1):
+            for k in range(i + 1, len(melhor)):
+                candidata = melhor[:i] + melhor[i:k + 1][::-1] + melhor[k + 1:]
+                distancia = dist.rota(candidata)
+                if distancia < melhor_distancia - 1e-9:
+                    melhor, melhor_distancia = candidata, distancia
+                    melhorou = True
+    return melhor
+
+
+def planejar_rotas(coletas, propriedades, veiculo, fator_rodoviario=FATOR_RODOVIARIO):
+    """Monta rotas com várias paradas para as coletas (propriedade_id, produto_id, peso)
+
+    Cargas que enchem o veículo seguem em viagens diretas; as sobras são consolidadas em rotas
+    compartilhadas. Propriedades sem latitude/longitude não são agrupadas com outras. O resultado
+    traz km e custo das rotas comparados com o cálculo ingênuo de ida e volta por propriedade.
+    """
+    capacidade = veiculo['capacidade']
+    if capacidade <= 0:
+        raise ValueError("O veículo deve ter capacidade maior que zero.")
+
+    por_id = {prop['id']: prop for prop in propriedades}
+    cargas = {}
+    produtos = {}
+    for propriedade_id, produto_id, peso in coletas:
+        if propriedade_id not in por_id:
+            raise ValueError(f"Propriedade {propriedade_id} não encontrada.")
+        cargas[propriedade_id] = cargas.get(propriedade_id, 0.0) + peso
+        produtos.setdefault(propriedade_id, set()).add(produto_id)
+
+    dist = _Distancias(por_id, fator_rodoviario)
+
+    # Viagens diretas com o veículo cheio; só a sobra de cada propriedade entra na roteirização
+    viagens_diretas = []
+    sobras = {}
+    for propriedade_id, carga in cargas.items():
+        cheias = int(carga // capacidade)
+        if cheias:
+            distancia = cheias * 2 * dist.centro(propriedade_id)
+            viagens_diretas.append({
+                'propriedade_id': propriedade_id,
+                'viagens': cheias,
+                'distancia_total': distancia,
+                'custo_total': custos_percurso(distancia, veiculo['custo_km'])['custo_total']
+            })
+        sobra = carga - cheias * capacidade
+        if sobra > 0:
+            sobras[propriedade_id] = sobra
+
+    rotas = []
+    for paradas, carga in _clarke_wright(list(sobras), sobras, capacidade, dist):
+        paradas = _dois_opt(paradas, dist)
+        custos = custos_percurso(dist.rota(paradas), veiculo['custo_km'])
+        rotas.append({
+            'paradas': paradas,
+            'produtos': sorted({p for parada in paradas for p in produtos[parada]}),
+            'carga': carga,
+            'distancia_total': custos['distancia_total'],
+            'tempo_total': custos['tempo_total'],
+            'custo_total': custos['custo_total']
+        })
+    rotas.sort(key=lambda rota: rota['custo_total'], reverse=True)
+
+    ingenuo = [calcular_custos(dist.centro(pid), capacidade, veiculo['custo_km'], carga) for pid, carga in cargas.items()]
+    distancia_total = sum(r['distancia_total'] for r in rotas) + sum(v['distancia_total'] for v in viagens_diretas)
+    custo_total = sum(r['custo_total'] for r in rotas) + sum(v['custo_total'] for v in viagens_diretas)
+    custo_ingenuo = sum(c['custo_total'] for c in ingenuo)
+    return {
+        'veiculo_id': veiculo['id'],
+        'rotas': rotas,
+        'viagens_diretas': viagens_diretas,
+        'distancia_total': distancia_total,
+        'custo_total': custo_total,
+        'distancia_ingenua': sum(c['distancia_total'] for c in ingenuo),
+        'custo_ingenuo': custo_ingenuo,
+        'economia': custo_ingenuo - custo_total
+    }
@@ -0,0 +1,412 @@
+"""API do simulador sem entrada/saída no console, para uso programático
+
+As funções recebem valores Python e devolvem dicionários; dados inválidos e violações de regra
+(item não encontrado, remoção com cálculos associados) geram ErroServico. Os menus do programa
+principal são clientes desta API:
+
+    import servico
+    prop = servico.criar_propriedade("Sítio Boa Vista", "Estrada Velha, km 3", 12.5, 140)
+    cotacao = servico.calcular(prop['id'], veiculo_id=1, produto_id=1, peso_total=800)
+"""
+import math
+import re
+from datetime import datetime
+
+import armazenamento
+import armazenamento_sqlite
+from armazenamento import (CALCULOS_FILE, CENTROS_FILE, DATA_DIR, PRODUTOS_FILE, PROPRIEDADES_FILE, VEICULOS_FILE,
+                           bloquear)
+from armazenamento_sqlite import NOME_BANCO, listar_calculos_com_nomes
+from atribuicao_centros import CANDIDATOS_PADRAO, atribuir_centros as calcular_atribuicao
+from cache_cotacoes import cache_cotacoes
+from diario import RepositorioDiario, iterar_calculos
+from escalonador import escalonar
+from listagem import DESCONHECIDO, chave_periodo, filtrar_calculos, juntar_nomes, mapa_nomes, no_periodo
+from malha_viaria import matriz_distancias
+from metricas import medir, volume_unitario
+from modelo_custos import PARAMETROS_PADRAO
+from otimizador_frota import otimizar_frota
+from relatorios import resumos
+from repositorio import repositorio
+
+
+class ErroServico(ValueError):
+    """Operação recusada pela API; a mensagem pode ser mostrada diretamente ao usuário"""
+
+
+class NaoEncontrado(ErroServico):
+    pass
+
+
+class EmUso(ErroServico):
+    """A entidade tem cálculos associados e não pode ser removida"""
+
+
+def limpar_localizacao(localizacao):
+    return re.sub(r'\(.*?\)', '', localizacao).strip()[:128]
+
+
+def _texto(campo, valor):
+    valor = str(valor).strip() if valor is not None else ''
+    if not valor:
+        raise ErroServico(f"O campo '{campo}' não pode ser vazio.")
+    return valor
+
+
+def _localizacao(campo, valor):
+    return limpar_localizacao(_texto(campo, valor))
+
+
+def _numero(campo, valor):
+    try:
+        numero = float(str(valor).strip().replace(',', '.')) if isinstance(valor, str) else float(valor)
+    except (TypeError, ValueError):
+        numero = math.nan
+    if not math.isfinite(numero) or isinstance(valor, bool):
+        raise ErroServico(f"O campo '{campo}' deve ser um número (recebido: {valor!r}).")
+    return numero
+
+
+def _numero_opcional(campo, valor):
+    return None if valor is None or valor == '' else _numero(campo, valor)
+
+
+def _texto_opcional(campo, valor):
+    return None if valor is None or valor == '' else _texto(campo, valor)
+
+
+def _id(campo, valor):
+    try:
+        id_item = int(str(valor).strip()) if isinstance(valor, str) else int(valor)
+    except (TypeError, ValueError):
+        id_item = 0
+    if id_item <= 0 or isinstance(valor, bool) or (isinstance(valor, float) and not valor.is_integer()):
+        raise ErroServico(f"O campo '{campo}' deve ser um ID inteiro positivo (recebido: {valor!r}).")
+    return id_item
+
+
+def _inteiro(campo, valor):
+    numero = _numero(campo, valor)
+    if not numero.is_integer():
+        raise ErroServico(f"O campo '{campo}' deve ser um número inteiro (recebido: {valor!r}).")
+    return int(numero)
+
+
+OPCIONAIS = (_numero_opcional, _texto_opcional)
+
+# Por entidade: arquivo, campos aceitos (com a conversão de cada um) e mensagens
+ENTIDADES = {
+    'propriedade': {
+        'arquivo': PROPRIEDADES_FILE,
+        'campos': {'nome': _texto, 'localizacao': _localizacao, 'area_producao': _numero,
+                   'distancia': _numero, 'latitude': _numero_opcional, 'longitude': _numero_opcional},
+        'nao_encontrado': "Propriedade não encontrada.",
+        'em_uso': "Não é possível remover. Existem cálculos associados a esta propriedade.",
+    },
+    'veiculo': {
+        'arquivo': VEICULOS_FILE,
+        'campos': {'tipo': _texto, 'capacidade': _numero, 'custo_km': _numero},
+        'nao_encontrado': "Veículo não encontrado.",
+        'em_uso': "Não é possível remover. Existem cálculos associados a este veículo.",
+    },
+    'produto': {
+        'arquivo': PRODUTOS_FILE,
+        'campos': {'nome': _texto, 'peso_cesto': _numero},
+        'nao_encontrado': "Produto não encontrado.",
+        'em_uso': "Não é possível remover. Existem cálculos associados a este produto.",
+    },
+    'centro': {
+        'arquivo': CENTROS_FILE,
+        # capacidade: kg que o centro recebe em uma atribuição (vazio = sem limite)
+        'campos': {'nome': _texto, 'localizacao': _localizacao, 'latitude': _numero, 'longitude': _numero,
+                   'capacidade': _numero_opcional},
+        'nao_encontrado': "Centro de distribuição não encontrado.",
+        # Sem 'em_uso': os cálculos não guardam o centro, então a remoção não é bloqueada
+    },
+}
+
+
+CAMPOS_CALCULO = {
+    'propriedade_id': _id, 'veiculo_id': _id, 'produto_id': _id, 'peso_total': _numero, 'viagens': _inteiro,
+    'distancia_total': _numero, 'custo_total': _numero, 'tempo_total': _numero, 'data_calculo': _texto_opcional,
+}
+
+
+def _agora():
+    return datetime.now().strftime("%d/%m/%Y %H:%M")
+
+
+def _converter(conversores, rotulo, campos, parcial):
+    desconhecidos = set(campos) - set(conversores)
+    if desconhecidos:
+        raise ErroServico(f"Campo(s) desconhecido(s) para {rotulo}: {', '.join(sorted(desconhecidos))}")
+    if not parcial:
+        faltando = [c for c, conv in conversores.items() if conv not in OPCIONAIS and c not in campos]
+        if faltando:
+            raise ErroServico(f"Campo(s) obrigatório(s) para {rotulo}: {', '.join(faltando)}")
+    return {campo: conversores[campo](campo, valor) for campo, valor in campos.items()}
+
+
+def validar_campos(entidade, campos, parcial=False):
+    """Converte os campos de uma entidade; sem `parcial`, todos os campos obrigatórios devem vir"""
+    return _converter(ENTIDADES[entidade]['campos'], entidade, campos, parcial)
+
+
+def validar_calculo(campos):
+    """Converte os campos de um cálculo já realizado (ex.: importado de outro arquivo)"""
+    return _converter(CAMPOS_CALCULO, 'calculo', campos, parcial=False)
+
+
+def listar(entidade):
+    return repositorio(ENTIDADES[entidade]['arquivo']).listar()
+
+
+def obter(entidade, id_item):
+    """Item pelo id; gera NaoEncontrado se não existir
+
+    Não carrega a tabela inteira quando ela ainda não foi lida (ver Repositorio.ler).
+    """
+    item = repositorio(ENTIDADES[entidade]['arquivo']).ler(id_item)
+    if item is None:
+        raise NaoEncontrado(ENTIDADES[entidade]['nao_encontrado'])
+    return item
+
+
+def criar(entidade, **campos):
+    campos = validar_campos(entidade, campos)
+    itens = repositorio(ENTIDADES[entidade]['arquivo'])
+    item = itens.adicionar({**campos, 'data_cadastro': _agora()})
+    itens.salvar()
+    return item
+
+
+# Campos cuja alteração invalida as distâncias da entidade na matriz da malha viária
+CAMPOS_LOCALIZACAO = {'propriedade': ('distancia', 'latitude', 'longitude'), 'centro': ('latitude', 'longitude')}
+
+
+def alterar(entidade, id_item, **campos):
+    """Atualiza apenas os campos informados e devolve o item alterado
+
+    Se a distância ou as coordenadas de uma propriedade (ou centro) mudarem, as distâncias dela
+    na matriz da malha viária são descartadas: a distância editada passa a valer nas cotações.
+    """
+    campos = validar_campos(entidade, campos, parcial=True)
+    itens = repositorio(ENTIDADES[entidade]['arquivo'])
+    anterior = itens.obter(id_item)
+    anterior = dict(anterior) if anterior is not None else None
+    if not itens.atualizar(id_item, campos):
+        raise NaoEncontrado(ENTIDADES[entidade]['nao_encontrado'])
+    itens.salvar()
+    cache_cotacoes.invalidar(entidade, id_item)
+    if any(campo in campos and campos[campo] != anterior.get(campo) for campo in CAMPOS_LOCALIZACAO.get(entidade, ())):
+        _descartar_distancias(entidade, id_item)
+    return itens.obter(id_item)
+
+
+def _descartar_distancias(entidade, id_item):
+    if entidade == 'propriedade':
+        matriz_distancias.descartar(propriedade_id=id_item)
+    elif entidade == 'centro':
+        matriz_distancias.descartar(centro_id=id_item)
+
+
+def remover(entidade, id_item):
+    """Remove o item; gera EmUso se houver cálculos associados a ele
+
+    As distâncias da propriedade ou do centro removido saem da matriz da malha viária, para que
+    um item cadastrado depois não as herde.
+    """
+    if 'em_uso' in ENTIDADES[entidade] and repositorio(CALCULOS_FILE, RepositorioDiario).existe(f'{entidade}_id', id_item):
+        raise EmUso(ENTIDADES[entidade]['em_uso'])
+    itens = repositorio(ENTIDADES[entidade]['arquivo'])
+    if not itens.remover(id_item):
+        raise NaoEncontrado(ENTIDADES[entidade]['nao_encontrado'])
+    itens.salvar()
+    cache_cotacoes.invalidar(entidade, id_item)
+    _descartar_distancias(entidade, id_item)
+
+
+def criar_propriedade(nome, localizacao, area_producao, distancia, latitude=None, longitude=None):
+    return criar('propriedade', nome=nome, localizacao=localizacao, area_producao=area_producao,
+                 distancia=distancia, latitude=latitude, longitude=longitude)
+
+
+def criar_veiculo(tipo, capacidade, custo_km):
+    return criar('veiculo', tipo=tipo, capacidade=capacidade, custo_km=custo_km)
+
+
+def criar_produto(nome, peso_cesto):
+    return criar('produto', nome=nome, peso_cesto=peso_cesto)
+
+
+def distancia_propriedade(prop, centro_id=None):
+    """Distância (km) usada nas cotações da propriedade (ver malha_viaria.distancia_propriedade)
+
+    Com a matriz de distâncias da malha viária, é a distância por estrada até o centro
+    `centro_id` ou, sem ele, até o centro mais próximo; sem a matriz, é a distância cadastrada
+    na propriedade.
+    """
+    try:
+        return matriz_distancias.distancia_propriedade(prop, centro_id)
+    except ValueError as e:
+        raise ErroServico(str(e))
+
+
+def criar_centro(nome, localizacao, latitude, longitude, capacidade=None):
+    return criar('centro', nome=nome, localizacao=localizacao, latitude=latitude, longitude=longitude,
+                 capacidade=capacidade)
+
+
+def atribuir_centros(veiculo_id, peso_total, candidatos=CANDIDATOS_PADRAO):
+    """Atribui todas as propriedades aos centros cadastrados pelo menor custo com o veículo (ver atribuicao_centros)
+
+    A distância usada é a da matriz da malha viária, quando houver, ou a linha reta com o fator
+    rodoviário.
+    """
+    veic = obter('veiculo', veiculo_id)
+    if isinstance(peso_total, dict):
+        peso_total = {id_item: _numero('peso_total', peso) for id_item, peso in peso_total.items()}
+    else:
+        peso_total = _numero('peso_total', peso_total)
+    try:
+        return calcular_atribuicao(listar('propriedade'), listar('centro'), veic, peso_total,
+                                   matriz_distancias.distancia, candidatos)
+    except ValueError as e:
+        raise ErroServico(str(e))
+
+
+def escalonar_coletas(servicos, data_inicio=None):
+    """Plano de vários dias das coletas com toda a frota cadastrada (ver escalonador.escalonar)
+
+    As distâncias são as mesmas das cotações (distancia_propriedade).
+    """
+    propriedades = repositorio(ENTIDADES['propriedade']['arquivo']).indice()
+    distancias = {}
+    for servico in servicos:
+        prop = propriedades.get(servico['propriedade_id'])
+        if prop is None:
+            raise NaoEncontrado(f"{ENTIDADES['propriedade']['nao_encontrado'][:-1]} (ID {servico['propriedade_id']}).")
+        distancias[prop['id']] = distancia_propriedade(prop)
+    try:
+        return escalonar(servicos, listar('veiculo'), distancias, data_inicio)
+    except ValueError as e:
+        raise ErroServico(str(e))
+
+
+@medir(volume=volume_unitario)
+def calcular(propriedade_id, veiculo_id, produto_id, peso_total, parametros=PARAMETROS_PADRAO, salvar=True,
+             centro_id=None):
+    """Calcula o custo do transporte e (com `salvar`) grava o cálculo no histórico
+
+    A distância vem de distancia_propriedade. Retorna o detalhamento de calcular_custos junto
+    com os campos do cálculo gravado (id, entidades, peso e data).
+    """
+    prop = obter('propriedade', propriedade_id)
+    prop = {**prop, 'distancia': distancia_propriedade(prop, centro_id)}
+    veic = obter('veiculo', veiculo_id)
+    prod = obter('produto', produto_id)
+    peso_total = _numero('peso_total', peso_total)
+    if veic['capacidade'] <= 0:
+        raise ErroServico("O veículo deve ter capacidade maior que zero.")
+
+    custos = cache_cotacoes.calcular(prop, veic, prod, peso_total, parametros)
+    registro = {
+        'propriedade_id': propriedade_id,
+        'veiculo_id': veiculo_id,
+        'produto_id': produto_id,
+        'peso_total': peso_total,
+        'viagens': int(custos['viagens']),
+        'distancia_total': custos['distancia_total'],
+        'custo_total': custos['custo_total'],
+        'tempo_total': custos['tempo_total'],
+        'data_calculo': _agora()
+    }
+    if salvar:
+        registro = gravar_calculos([registro])[0]
+    return {**custos, **registro}
+
+
+@medir()
+def gravar_calculos(registros):
+    """Grava cálculos no histórico com uma única escrita e os soma aos totais dos relatórios
+
+    Histórico e totais são atualizados sob o mesmo bloqueio, então cada cálculo entra nos
+    totais uma única vez mesmo com vários processos gravando. Devolve os itens gravados (com id).
+    """
+    calculos = repositorio(CALCULOS_FILE, RepositorioDiario)
+    with bloquear(CALCULOS_FILE):
+        itens = calculos.adicionar_varios(registros)
+        calculos.salvar()
+        if resumos.existe():
+            resumos.registrar(itens)
+        else:
+            # Primeiro uso dos relatórios: os totais incluem o histórico já existente
+            resumos.reconstruir(iterar_historico())
+    return itens
+
+
+def iterar_historico():
+    """Percorre todo o histórico de cálculos, lido do disco sob demanda"""
+    if armazenamento.BACKEND == 'sqlite':
+        return armazenamento_sqlite.iterar_dados(CALCULOS_FILE)
+    return iterar_calculos(CALCULOS_FILE)
+
+
+def relatorios(reconstruir=False):
+    """Totais do histórico por veículo, por propriedade e mês e por produto e mês
+
+    Os totais são mantidos por gravar_calculos; `reconstruir` os recalcula a partir do
+    histórico (ex.: após copiar arquivos de dados de outra instalação).
+    """
+    if reconstruir or not resumos.existe():
+        with bloquear(CALCULOS_FILE):
+            resumos.reconstruir(iterar_historico())
+    return {
+        'veiculos': resumos.por_veiculo(),
+        'propriedades_mes': resumos.por_propriedade_mes(),
+        'produtos_mes': resumos.por_produto_mes(),
+    }
+
+
+def otimizar(propriedade_id, peso_total):
+    """Combinação de viagens mais barata entre todos os veículos cadastrados (ver otimizar_frota)"""
+    prop = obter('propriedade', propriedade_id)
+    prop = {**prop, 'distancia': distancia_propriedade(prop)}
+    veiculos = listar('veiculo')
+    if not veiculos:
+        raise ErroServico("Nenhum veículo encontrado.")
+    return otimizar_frota(prop, veiculos, _numero('peso_total', peso_total))
+
+
+@medir()
+def calculos_com_nomes(propriedade_id=None, veiculo_id=None, produto_id=None, data_inicio=None, data_fim=None):
+    """Percorre os cálculos filtrados junto com os nomes da propriedade, do veículo e do produto"""
+    if armazenamento.BACKEND == 'sqlite':
+        # No SQLite a junção e os filtros por entidade são feitos pelo banco, usando os índices das chaves
+        inicio, fim = chave_periodo(data_inicio, data_fim)
+        linhas = listar_calculos_com_nomes(DATA_DIR / NOME_BANCO, propriedade_id, veiculo_id, produto_id)
+        for calc, prop_nome, veic_tipo, prod_nome in linhas:
+            if no_periodo(calc, inicio, fim):
+                yield calc, prop_nome or DESCONHECIDO, veic_tipo or DESCONHECIDO, prod_nome or DESCONHECIDO
+        return
+
+    # Mapas id -> nome montados uma única vez; o histórico é lido do disco sob demanda
+    calculos = filtrar_calculos(iterar_calculos(CALCULOS_FILE), propriedade_id, veiculo_id, produto_id,
+                                data_inicio, data_fim)
+    yield from juntar_nomes(
+        calculos,
+        mapa_nomes(listar('propriedade'), 'nome'),
+        mapa_nomes(listar('veiculo'), 'tipo'),
+        mapa_nomes(listar('produto'), 'nome')
+    )
+
+
+def dados_consolidados():
+    """Todos os dados em um único dicionário, no formato do arquivo de exportação"""
+    return {
+        "propriedades": listar('propriedade'),
+        "veiculos": listar('veiculo'),
+        "produtos": listar('produto'),
+        "centros": listar('centro'),
+        "calculos_realizados": repositorio(CALCULOS_FILE, RepositorioDiario).listar()
+    }
@@ -0,0 +1,415 @@
+"""Servidor HTTP local (asyncio) para cotações de transporte, com agrupamento de requisições
+
+Rotas:
+    POST /cotacao            {"propriedade_id", "veiculo_id", "produto_id", "peso_total", "salvar"?, "centro_id"?}
+                             (ou uma lista desses objetos)
+    GET  /propriedades[/id], /veiculos[/id], /produtos[/id]
+    GET  /metricas           latência p50/p99 por rota e tamanho médio dos lotes
+    GET  /saude
+
+As tabelas de entidades ficam na memória (repositórios, relidos só quando o arquivo muda) e as
+cotações que chegam ao mesmo tempo são avaliadas juntas por calcular_custos_lote.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from datetime import datetime
+from http import HTTPStatus
+
+from calculo_lote import CAMPOS_RESULTADO, calcular_custos_lote
+from cenarios import percentil
+from modelo_custos import PARAMETROS_PADRAO
+from repositorio import repositorio
+from servico import ENTIDADES, ErroServico, NaoEncontrado, distancia_propriedade, gravar_calculos
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8080
+# Tempo que o primeiro pedido de um lote espera por outros antes da avaliação vetorizada
+JANELA_LOTE = 0.002
+LOTE_MAXIMO = 256
+AMOSTRAS_LATENCIA = 10_000
+TAMANHO_MAXIMO_CORPO = 1 << 20
+LIMITE_CABECALHOS = 100
+ERRO_INTERNO = "Erro interno do servidor."
+
+ROTAS_ENTIDADES = {'propriedades': 'propriedade', 'veiculos': 'veiculo', 'produtos': 'produto'}
+CAMPOS_COTACAO = ('propriedade_id', 'veiculo_id', 'produto_id', 'peso_total')
+
+
+class RequisicaoInvalida(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class Metricas:
+    """Contadores e latências recentes (janela de AMOSTRAS_LATENCIA) por rota"""
+
+    def __init__(self, amostras=AMOSTRAS_LATENCIA):
+        self.amostras = amostras
+        self.inicio = time.monotonic()
+        self._latencias = {}
+        self.respostas = {}
+        self.lotes = 0
+        self.cotacoes_em_lotes = 0
+
+    def registrar(self, rota, status, segundos):
+        self._latencias.setdefault(rota, deque(maxlen=self.amostras)).append(segundos)
+        self.respostas[status] = self.respostas.get(status, 0) + 1
+
+    def registrar_lote(self, tamanho):
+        self.lotes += 1
+        self.cotacoes_em_lotes += tamanho
+
+    def resumo(self):
+        rotas = {}
+        for rota, latencias in self._latencias.items():
+            ordenadas = sorted(latencias)
+            rotas[rota] = {
+                'amostras': len(ordenadas),
+                'p50_ms': percentil(ordenadas, 50) * 1000,
+                'p99_ms': percentil(ordenadas, 99) * 1000,
+                'maximo_ms': ordenadas[-1] * 1000
+            }
+        return {
+            'ativo_ha_s': time.monotonic() - self.inicio,
+            'respostas': {str(status): total for status, total in sorted(self.respostas.items())},
+            'lotes': self.lotes,
+            'tamanho_medio_lote': self.cotacoes_em_lotes / self.lotes if self.lotes else 0.0,
+            'rotas': rotas
+        }
+
+
+class AgrupadorCotacoes:
+    """Junta as cotações que chegam dentro de `janela` segundos e as avalia de uma vez"""
+
+    def __init__(self, metricas, janela=JANELA_LOTE, lote_maximo=LOTE_MAXIMO, parametros=PARAMETROS_PADRAO):
+        self.metricas = metricas
+        self.janela = janela
+        self.lote_maximo = lote_maximo
+        self.parametros = parametros
+        self._fila = asyncio.Queue()
+        self._tarefa = None
+
+    def iniciar(self):
+        self._tarefa = asyncio.create_task(self._processar_fila())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+
+    async def cotar(self, pedido):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((pedido, futuro))
+        return await futuro
+
+    async def _processar_fila(self):
+        while True:
+            lote = [await self._fila.get()]
+            if self.janela > 0:
+                await asyncio.sleep(self.janela)
+            while len(lote) < self.lote_maximo and not self._fila.empty():
+                lote.append(self._fila.get_nowait())
+            try:
+                await self._avaliar(lote)
+            except Exception as e:  # Falha inesperada não pode derrubar o agrupador
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+
+    async def _avaliar(self, lote):
+        """Resolve as entidades de cada pedido e calcula os custos do lote em uma chamada vetorizada"""
+        propriedades = repositorio(ENTIDADES['propriedade']['arquivo']).indice()
+        veiculos = repositorio(ENTIDADES['veiculo']['arquivo']).indice()
+        produtos = repositorio(ENTIDADES['produto']['arquivo']).indice()
+
+        # Cada pedido é tratado em separado: um pedido com erro recebe a sua exceção e não
+        # impede a resposta dos outros pedidos do lote
+        validos = []
+        for pedido, futuro in lote:
+            try:
+                validos.append((_resolver(pedido, propriedades, veiculos, produtos), futuro))
+            except Exception as e:
+                _falhar(futuro, e)
+        if not validos:
+            return
+        self.metricas.registrar_lote(len(validos))
+
+        entradas = [entrada for entrada, _ in validos]
+        try:
+            resultados = _calcular(entradas, self.parametros)
+        except Exception:
+            # Recalcula um a um para achar o pedido que falhou
+            resultados = []
+            for entrada in entradas:
+                try:
+                    resultados.append(_calcular([entrada], self.parametros)[0])
+                except Exception as e:
+                    resultados.append(e)
+
+        respostas = []
+        for (entrada, futuro), resultado in zip(validos, resultados):
+            try:
+                if isinstance(resultado, Exception):
+                    raise resultado
+                resposta = {campo: entrada[campo] for campo in CAMPOS_COTACAO}
+                resposta.update(resultado)
+                resposta['viagens'] = int(resposta['viagens'])
+            except Exception as e:
+                _falhar(futuro, e)
+                continue
+            respostas.append((entrada, futuro, resposta))
+
+        a_salvar = [resposta for entrada, _, resposta in respostas if entrada['salvar']]
+        if a_salvar:
+            # Gravação no diário (com fsync) fora do laço de eventos; só esta tarefa usa o repositório
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, _salvar_calculos, a_salvar)
+            except Exception as e:
+                for entrada, futuro, _ in respostas:
+                    if entrada['salvar']:
+                        _falhar(futuro, e)
+
+        for _, futuro, resposta in respostas:
+            if not futuro.done():  # O cliente pode ter desistido
+                futuro.set_result(resposta)
+
+
+def _falhar(futuro, excecao):
+    if not futuro.done():
+        futuro.set_exception(excecao)
+
+
+def _calcular(entradas, parametros):
+    """Custos das cotações em uma chamada vetorizada, como uma lista de dicionários"""
+    resultado = calcular_custos_lote(
+        [e['distancia'] for e in entradas], [e['capacidade'] for e in entradas],
+        [e['custo_km'] for e in entradas], [e['peso_total'] for e in entradas], parametros)
+    colunas = [_como_lista(resultado[campo]) for campo in CAMPOS_RESULTADO]
+    return [dict(zip(CAMPOS_RESULTADO, valores)) for valores in zip(*colunas)]
+
+
+def _resolver(pedido, propriedades, veiculos, produtos):
+    """Valida um pedido de cotação e junta os dados das entidades usados na fórmula"""
+    if not isinstance(pedido, dict):
+        raise ErroServico("Cada cotação deve ser um objeto JSON.")
+    faltando = [campo for campo in CAMPOS_COTACAO if campo not in pedido]
+    if faltando:
+        raise ErroServico(f"Campo(s) obrigatório(s): {', '.join(faltando)}")
+
+    ids = {}
+    for campo in CAMPOS_COTACAO[:3]:
+        valor = pedido[campo]
+        if not isinstance(valor, int) or isinstance(valor, bool) or valor <= 0:
+            raise ErroServico(f"O campo '{campo}' deve ser um ID inteiro positivo.")
+        ids[campo] = valor
+    peso_total = pedido['peso_total']
+    if (not isinstance(peso_total, (int, float)) or isinstance(peso_total, bool) or not math.isfinite(peso_total)
+            or peso_total <= 0):
+        raise ErroServico("O campo 'peso_total' deve ser um número maior que zero.")
+
+    prop = propriedades.get(ids['propriedade_id'])
+    if prop is None:
+        raise NaoEncontrado(ENTIDADES['propriedade']['nao_encontrado'])
+    veic = veiculos.get(ids['veiculo_id'])
+    if veic is None:
+        raise NaoEncontrado(ENTIDADES['veiculo']['nao_encontrado'])
+    if ids['produto_id'] not in produtos:
+        raise NaoEncontrado(ENTIDADES['produto']['nao_encontrado'])
+    if veic['capacidade'] <= 0:
+        raise ErroServico("O veículo deve ter capacidade maior que zero.")
+    centro_id = pedido.get('centro_id')
+    if centro_id is not None and (not isinstance(centro_id, int) or isinstance(centro_id, bool)):
+        raise ErroServico("O campo 'centro_id' deve ser um ID inteiro.")
+
+    return {
+        **ids,
+        'peso_total': float(peso_total),
+        'distancia': distancia_propriedade(prop, centro_id),
+        'capacidade': veic['capacidade'],
+        'custo_km': veic['custo_km'],
+        'salvar': bool(pedido.get('salvar', False))
+    }
+
+
+def _como_resposta(resultado):
+    """Resultado de uma cotação de uma lista: a cotação ou o erro dela"""
+    if isinstance(resultado, ErroServico):
+        return {'erro': str(resultado)}
+    if isinstance(resultado, Exception):
+        print(f"Erro ao cotar: {resultado!r}")
+        return {'erro': ERRO_INTERNO}
+    return resultado
+
+
+def _como_lista(coluna):
+    return coluna.tolist() if hasattr(coluna, 'tolist') else list(coluna)
+
+
+def _salvar_calculos(respostas):
+    """Grava as cotações no histórico; cada resposta recebe o id e a data do cálculo"""
+    data_calculo = datetime.now().strftime("%d/%m/%Y %H:%M")
+    for resposta in respostas:
+        resposta['data_calculo'] = data_calculo
+    for resposta, item in zip(respostas, gravar_calculos([dict(resposta) for resposta in respostas])):
+        resposta['id'] = item['id']
+
+
+async def _ler_requisicao(reader):
+    """Lê uma requisição HTTP/1.1; devolve None quando o cliente fecha a conexão"""
+    linha = await reader.readline()
+    if not linha:
+        return None
+    try:
+        metodo, alvo, _ = linha.decode('latin-1').split()
+    except ValueError:
+        raise RequisicaoInvalida(HTTPStatus.BAD_REQUEST, "Linha de requisição inválida.") from None
+
+    cabecalhos = {}
+    for _ in range(LIMITE_CABECALHOS):
+        linha = await reader.readline()
+        if linha in (b'\r\n', b'\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    else:
+        raise RequisicaoInvalida(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Cabeçalhos demais.")
+
+    try:
+        tamanho = int(cabecalhos.get('content-length', 0))
+    except ValueError:
+        raise RequisicaoInvalida(HTTPStatus.BAD_REQUEST, "Content-Length inválido.") from None
+    if tamanho < 0:
+        raise RequisicaoInvalida(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+    if tamanho > TAMANHO_MAXIMO_CORPO:
+        raise RequisicaoInvalida(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição grande demais.")
+    corpo = await reader.readexactly(tamanho) if tamanho else b''
+    return metodo.upper(), alvo.split('?', 1)[0], cabecalhos, corpo
+
+
+def _resposta_http(status, conteudo, manter_conexao=True):
+    corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+    cabecalho = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(corpo)}\r\n"
+        f"Connection: {'keep-alive' if manter_conexao else 'close'}\r\n\r\n"
+    )
+    return cabecalho.encode('latin-1') + corpo
+
+
+class ServidorCotacoes:
+    """Atende as rotas HTTP; as cotações passam pelo AgrupadorCotacoes"""
+
+    def __init__(self, janela=JANELA_LOTE, lote_maximo=LOTE_MAXIMO, parametros=PARAMETROS_PADRAO):
+        self.metricas = Metricas()
+        self.agrupador = AgrupadorCotacoes(self.metricas, janela, lote_maximo, parametros)
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    requisicao = await _ler_requisicao(reader)
+                except RequisicaoInvalida as e:
+                    writer.write(_resposta_http(e.status, {'erro': str(e)}, manter_conexao=False))
+                    await writer.drain()
+                    break
+                if requisicao is None:
+                    break
+                metodo, caminho, cabecalhos, corpo = requisicao
+
+                inicio = time.perf_counter()
+                try:
+                    status, conteudo, rota = await self.rotear(metodo, caminho, corpo)
+                except Exception as e:
+                    print(f"Erro ao atender {metodo} {caminho}: {e!r}")
+                    status, conteudo, rota = HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': ERRO_INTERNO}, 'outras'
+                self.metricas.registrar(rota, status.value, time.perf_counter() - inicio)
+
+                manter = cabecalhos.get('connection', '').lower() != 'close'
+                writer.write(_resposta_http(status, conteudo, manter))
+                await writer.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            # Falha fora de uma rota (ex.: linha grande demais): responde antes de fechar
+            print(f"Erro na conexão: {e!r}")
+            try:
+                writer.write(_resposta_http(HTTPStatus.INTERNAL_SERVER_ERROR, {'erro': ERRO_INTERNO},
+                                            manter_conexao=False))
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def rotear(self, metodo, caminho, corpo):
+        """Devolve (status, conteúdo JSON, rota usada nas métricas)"""
+        partes = [parte for parte in caminho.split('/') if parte]
+        if partes == ['cotacao']:
+            if metodo != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'erro': "Use POST em /cotacao."}, '/cotacao'
+            return (*await self._cotar(corpo), '/cotacao')
+        if metodo != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'erro': "Método não permitido."}, caminho
+        if partes == ['saude']:
+            return HTTPStatus.OK, {'status': 'ok'}, '/saude'
+        if partes == ['metricas']:
+            return HTTPStatus.OK, self.metricas.resumo(), '/metricas'
+        if partes and partes[0] in ROTAS_ENTIDADES and len(partes) <= 2:
+            rota = '/' + partes[0] + ('/{id}' if len(partes) == 2 else '')
+            return (*self._consultar(ROTAS_ENTIDADES[partes[0]], partes[1:]), rota)
+        return HTTPStatus.NOT_FOUND, {'erro': f"Rota não encontrada: {caminho}"}, 'outras'
+
+    def _consultar(self, entidade, argumentos):
+        itens = repositorio(ENTIDADES[entidade]['arquivo'])
+        if not argumentos:
+            return HTTPStatus.OK, itens.listar()
+        try:
+            item = itens.obter(int(argumentos[0]))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'erro': "O ID deve ser um número inteiro."}
+        if item is None:
+            return HTTPStatus.NOT_FOUND, {'erro': ENTIDADES[entidade]['nao_encontrado']}
+        return HTTPStatus.OK, item
+
+    async def _cotar(self, corpo):
+        try:
+            pedido = json.loads(corpo or b'null')
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return HTTPStatus.BAD_REQUEST, {'erro': "O corpo deve ser um JSON válido."}
+
+        if isinstance(pedido, list):
+            # Uma lista de cotações: cada item responde com o resultado ou com o erro dele
+            resultados = await asyncio.gather(*(self.agrupador.cotar(p) for p in pedido), return_exceptions=True)
+            return HTTPStatus.OK, [_como_resposta(r) for r in resultados]
+
+        try:
+            return HTTPStatus.OK, await self.agrupador.cotar(pedido)
+        except NaoEncontrado as e:
+            return HTTPStatus.NOT_FOUND, {'erro': str(e)}
+        except ErroServico as e:
+            return HTTPStatus.BAD_REQUEST, {'erro': str(e)}
+
+
+async def servir(host=HOST_PADRAO, porta=PORTA_PADRAO, janela=JANELA_LOTE, lote_maximo=LOTE_MAXIMO,
+                 pronto=None):
+    """Roda o servidor até ser cancelado; `pronto(endereco)` é chamado quando ele começa a aceitar conexões"""
+    servidor_cotacoes = ServidorCotacoes(janela, lote_maximo)
+    servidor_cotacoes.agrupador.iniciar()
+    servidor = await asyncio.start_server(servidor_cotacoes.atender, host, porta)
+    try:
+        async with servidor:
+            if pronto is not None:
+                pronto(servidor.sockets[0].getsockname())
+            await servidor.serve_forever()
+    finally:
+        await servidor_cotacoes.agrupador.parar()
@@ -0,0 +1,40 @@
+"""Configuração comum dos testes
+
+Os módulos do simulador fixam as pastas de dados na importação (armazenamento.DATA_DIR, a partir
+da pasta do usuário), então HOME aponta para uma pasta temporária antes de qualquer importação:
+os testes nunca tocam nos dados reais. Cada teste usa os arquivos de tmp_path.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ['HOME'] = tempfile.mkdtemp(prefix='transporte_rural_testes_')
+os.environ.setdefault('TRANSPORTE_BACKEND', 'json')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def pasta_dados():
+    """Pasta de dados padrão (na HOME temporária) vazia, sem nada guardado nos objetos de módulo
+
+    Para testes que passam pelo servico e pelos módulos que usam os arquivos de armazenamento.
+    """
+    import armazenamento
+    import indice_registros
+    import repositorio
+    from cache_cotacoes import cache_cotacoes
+    from malha_viaria import matriz_distancias
+    from relatorios import resumos
+
+    shutil.rmtree(armazenamento.DATA_DIR, ignore_errors=True)
+    armazenamento.DATA_DIR.mkdir(parents=True)
+    repositorio._repositorios.clear()
+    indice_registros._indices.clear()
+    cache_cotacoes.limpar()
+    matriz_distancias._distancias = None
+    resumos._tabelas = resumos._versao = None
+    return armazenamento.DATA_DIR
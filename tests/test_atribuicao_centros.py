@@ -0,0 +1,109 @@
+import math
+import random
+
+import pytest
+
+import servico
+from atribuicao_centros import ArvoreKD, atribuir_centros
+from modelo_custos import calcular_custos
+from malha_viaria import matriz_distancias
+from roteirizacao import FATOR_RODOVIARIO, distancia_haversine
+
+VEICULO = {'id': 1, 'capacidade': 1000.0, 'custo_km': 2.0}
+
+
+def _pontos(quantidade, semente, inicio=1):
+    rng = random.Random(semente)
+    return [{'id': i, 'latitude': rng.uniform(-23, -21), 'longitude': rng.uniform(-48, -46)}
+            for i in range(inicio, inicio + quantidade)]
+
+
+def test_arvore_kd_igual_a_busca_completa():
+    rng = random.Random(1)
+    pontos = [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(500)]
+    arvore = ArvoreKD(pontos, list(range(len(pontos))))
+    assert len(arvore) == 500
+    for _ in range(100):
+        alvo = (rng.uniform(-10, 110), rng.uniform(-10, 110))
+        esperado = sorted(math.hypot(x - alvo[0], y - alvo[1]) for x, y in pontos)[:7]
+        encontrados = arvore.mais_proximos(alvo, 7)
+        assert [distancia for _, distancia in encontrados] == pytest.approx(esperado)
+        for rotulo, distancia in encontrados:
+            assert math.hypot(pontos[rotulo][0] - alvo[0], pontos[rotulo][1] - alvo[1]) == pytest.approx(distancia)
+
+
+def test_sem_limite_de_capacidade_cada_propriedade_vai_ao_centro_mais_barato():
+    propriedades = _pontos(200, 2)
+    centros = _pontos(15, 3, inicio=100)
+    resultado = atribuir_centros(propriedades, centros, VEICULO, 2500, candidatos=len(centros))
+
+    por_propriedade = {a['propriedade_id']: a for a in resultado['atribuicoes']}
+    for prop in propriedades:
+        custos = {c['id']: calcular_custos(FATOR_RODOVIARIO * distancia_haversine(
+            prop['latitude'], prop['longitude'], c['latitude'], c['longitude']), 1000.0, 2.0, 2500)['custo_total']
+                  for c in centros}
+        assert por_propriedade[prop['id']]['custo_total'] == pytest.approx(min(custos.values()))
+    assert resultado['custo_total'] == pytest.approx(sum(a['custo_total'] for a in resultado['atribuicoes']))
+
+
+def test_capacidade_dos_centros_e_respeitada():
+    propriedades = _pontos(120, 4)
+    centros = [dict(c, capacidade=20_000.0) for c in _pontos(8, 5, inicio=100)]
+    pesos = {prop['id']: float(500 + 100 * (prop['id'] % 13)) for prop in propriedades}
+    resultado = atribuir_centros(propriedades, centros, VEICULO, pesos, candidatos=2)
+
+    for centro in centros:
+        assert resultado['carga_centros'][centro['id']] <= centro['capacidade']
+    atribuidas = {a['propriedade_id'] for a in resultado['atribuicoes']}
+    assert atribuidas.isdisjoint(resultado['sem_capacidade'])
+    assert len(atribuidas) + len(resultado['sem_capacidade']) == len(propriedades)
+    # Quem ficou sem centro não caberia em nenhum com o que sobrou
+    sobra = {c['id']: c['capacidade'] - resultado['carga_centros'][c['id']] for c in centros}
+    assert all(pesos[p] > max(sobra.values()) for p in resultado['sem_capacidade'])
+
+
+def test_busca_ampliada_quando_os_candidatos_estao_lotados():
+    centros = [{'id': 10, 'latitude': -22.0, 'longitude': -47.0, 'capacidade': 1000.0},
+               {'id': 20, 'latitude': -22.5, 'longitude': -47.5}]
+    propriedades = [{'id': 1, 'latitude': -22.01, 'longitude': -47.0},
+                    {'id': 2, 'latitude': -22.02, 'longitude': -47.0}]
+    resultado = atribuir_centros(propriedades, centros, VEICULO, 1000.0, candidatos=1)
+    assert sorted(a['centro_id'] for a in resultado['atribuicoes']) == [10, 20]
+    assert resultado['sem_capacidade'] == []
+
+
+def test_maior_arrependimento_escolhe_primeiro():
+    # As duas preferem o centro 10, que só comporta uma; a 2 perderia mais indo para o 20
+    centros = [{'id': 10, 'latitude': -22.0, 'longitude': -47.0, 'capacidade': 1000.0},
+               {'id': 20, 'latitude': -22.0, 'longitude': -47.2}]
+    propriedades = [{'id': 1, 'latitude': -22.0, 'longitude': -47.09},
+                    {'id': 2, 'latitude': -22.0, 'longitude': -46.95}]
+    resultado = atribuir_centros(propriedades, centros, VEICULO, 1000.0)
+    assert {a['propriedade_id']: a['centro_id'] for a in resultado['atribuicoes']} == {1: 20, 2: 10}
+
+
+def test_distancia_por_estrada_e_propriedades_sem_localizacao():
+    centros = [{'id': 10, 'latitude': -22.0, 'longitude': -47.0}, {'id': 20, 'latitude': -22.0, 'longitude': -47.5}]
+    propriedades = [{'id': 1, 'latitude': -22.0, 'longitude': -47.01}, {'id': 2, 'latitude': None, 'longitude': None}]
+    # Pela estrada o centro mais distante em linha reta é o mais perto
+    estrada = {(1, 10): 80.0, (1, 20): 60.0}
+    resultado = atribuir_centros(propriedades, centros, VEICULO, 500.0, lambda p, c: estrada.get((p, c)))
+    assert resultado['atribuicoes'][0]['centro_id'] == 20
+    assert resultado['atribuicoes'][0]['distancia'] == 60.0
+    assert resultado['sem_localizacao'] == [2]
+
+    with pytest.raises(ValueError, match="Nenhum centro"):
+        atribuir_centros(propriedades, [{'id': 1, 'latitude': None, 'longitude': None}], VEICULO, 500.0)
+    with pytest.raises(ValueError, match="capacidade"):
+        atribuir_centros(propriedades, centros, {**VEICULO, 'capacidade': 0}, 500.0)
+
+
+def test_remover_centro_descarta_as_distancias(pasta_dados):
+    prop = servico.criar_propriedade("A", "x", 1, 100)
+    centro = servico.criar('centro', nome="C", localizacao="z", latitude=-22, longitude=-47)
+    outro = servico.criar('centro', nome="D", localizacao="w", latitude=-22, longitude=-48)
+    matriz_distancias.gravar({(prop['id'], centro['id']): 30.0, (prop['id'], outro['id']): 40.0})
+
+    servico.remover('centro', centro['id'])
+    assert matriz_distancias.distancia(prop['id'], centro['id']) is None
+    assert matriz_distancias.mais_proximo(prop['id']) == (outro['id'], 40.0)
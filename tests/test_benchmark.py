@@ -0,0 +1,48 @@
+import json
+
+import armazenamento
+import benchmark
+from diario import iterar_calculos
+
+
+def test_dados_sinteticos_sao_legiveis_e_reproduziveis(tmp_path):
+    benchmark.gerar_dados(tmp_path / "a", 50)
+    benchmark.gerar_dados(tmp_path / "b", 50)
+
+    for nome in benchmark.ARQUIVOS:
+        itens = armazenamento.carregar_dados(tmp_path / "a" / f"{nome}.json")
+        assert [item['id'] for item in itens] == list(range(1, 51))
+        assert (tmp_path / "a" / f"{nome}.json").read_bytes() == (tmp_path / "b" / f"{nome}.json").read_bytes()
+    calculos = list(iterar_calculos(tmp_path / "a" / "calculos.json"))
+    assert all(1 <= c['propriedade_id'] <= 50 and c['viagens'] >= 1 for c in calculos)
+
+
+def test_relatorio_tem_todas_as_operacoes(tmp_path):
+    relatorio = benchmark.executar(tamanhos=(20,), backends=('json',), repeticoes=2, aquecimento=0,
+                                   progresso=lambda texto: None)
+    json.dumps(relatorio)  # relatório deve ser serializável
+
+    operacoes = {(r['backend'], r['operacao']) for r in relatorio['resultados']}
+    assert ('json', 'carregar_dados[calculos]') in operacoes
+    assert ('json', 'listar_calculos[propriedade]') in operacoes
+    assert (None, 'calcular_custos_lote') in operacoes
+    for resultado in relatorio['resultados']:
+        assert resultado['repeticoes'] == 2 and resultado['tamanho'] == 20
+        assert resultado['minimo_s'] <= resultado['mediana_s'] <= resultado['maximo_s']
+
+
+def test_comparar_acusa_so_as_operacoes_mais_lentas_que_a_tolerancia():
+    def relatorio(*medianas):
+        return {'resultados': [{'backend': 'json', 'operacao': f"op{i}", 'tamanho': 10, 'mediana_s': m}
+                               for i, m in enumerate(medianas)]}
+
+    regressoes = benchmark.comparar(relatorio(1.1, 1.5, 0.5), relatorio(1.0, 1.0, 1.0), tolerancia=0.2)
+    assert [r['operacao'] for r in regressoes] == ['op1']
+    assert regressoes[0]['variacao'] == 0.5
+
+
+def test_main_grava_o_relatorio(tmp_path):
+    saida = tmp_path / "relatorio.json"
+    assert benchmark.main(['--tamanhos', '10', '--backend', 'json', '--repeticoes', '1', '--aquecimento', '0',
+                           '--saida', str(saida)]) == 0
+    assert json.loads(saida.read_text(encoding='utf-8'))['resultados']
@@ -0,0 +1,46 @@
+from cache_cotacoes import CacheCotacoes
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+
+PROPRIEDADE = {'id': 1, 'distancia': 100}
+VEICULO = {'id': 1, 'capacidade': 1000, 'custo_km': 2}
+PRODUTO = {'id': 1}
+
+
+def test_mesma_cotacao_vem_do_cache():
+    cache = CacheCotacoes()
+    primeira = cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 2500)
+    assert cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 2500) == primeira
+    assert (cache.acertos, cache.falhas) == (1, 1)
+
+
+def test_valores_alterados_em_outro_processo_nao_usam_a_cotacao_antiga():
+    cache = CacheCotacoes()
+    cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 2500)
+    # Mesmos ids, valores novos, sem invalidar(): como após uma edição feita por outro processo
+    for prop, veic in (({**PROPRIEDADE, 'distancia': 120}, VEICULO),
+                       (PROPRIEDADE, {**VEICULO, 'custo_km': 3}),
+                       (PROPRIEDADE, {**VEICULO, 'capacidade': 500})):
+        esperado = calcular_custos(prop['distancia'], veic['capacidade'], veic['custo_km'], 2500)
+        assert cache.calcular(prop, veic, PRODUTO, 2500) == esperado
+    assert cache.acertos == 0
+
+    parametros = PARAMETROS_PADRAO.com(fator_combustivel=1.2)
+    assert cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 2500, parametros) != cache.calcular(PROPRIEDADE, VEICULO,
+                                                                                             PRODUTO, 2500)
+
+
+def test_invalidar_descarta_so_as_cotacoes_da_entidade():
+    cache = CacheCotacoes()
+    cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 2500)
+    cache.calcular(PROPRIEDADE, {**VEICULO, 'id': 2}, PRODUTO, 2500)
+    cache.invalidar('veiculo', 1)
+    assert cache.estatisticas()['entradas'] == 1
+
+
+def test_descarte_lru():
+    cache = CacheCotacoes(tamanho_maximo=2)
+    for peso in (1000, 2000, 3000):
+        cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, peso)
+    cache.calcular(PROPRIEDADE, VEICULO, PRODUTO, 1000)
+    assert cache.falhas == 4
+    assert cache.estatisticas()['entradas'] == 2
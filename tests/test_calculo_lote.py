@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+import calculo_lote
+from calculo_lote import CAMPOS_RESULTADO, calcular_custos_lote, calcular_lote, escrever_lote, ler_lote
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+
+requer_numpy = pytest.mark.skipif(calculo_lote.np is None, reason="NumPy não instalado")
+
+
+def _entradas(quantidade, semente=7):
+    rng = random.Random(semente)
+    linhas = [(rng.uniform(0.5, 900), rng.choice((800.0, 1500.0, 8000.0, 27000.0, rng.uniform(100, 30000))),
+               rng.uniform(0.5, 7), rng.choice((float(rng.randint(1, 90000)), rng.uniform(1, 90000))))
+              for _ in range(quantidade)]
+    # Pesos múltiplos exatos da capacidade: o arredondamento para cima não pode somar uma viagem
+    linhas += [(120.0, 1000.0, 2.0, 3000.0), (33.3, 0.1, 1.1, 0.3), (10.0, 27000.0, 4.5, 27000.0)]
+    return [list(coluna) for coluna in zip(*linhas)]
+
+
+@requer_numpy
+@pytest.mark.parametrize('parametros', [PARAMETROS_PADRAO,
+                                        PARAMETROS_PADRAO.com(velocidade_media=47.5, fator_combustivel=1.13,
+                                                              motoristas=1, fator_manutencao=0.4)])
+def test_lote_vetorizado_igual_ao_calculo_escalar(parametros):
+    distancias, capacidades, custos_km, pesos = _entradas(5000)
+    lote = calcular_custos_lote(distancias, capacidades, custos_km, pesos, parametros)
+
+    for i, (d, c, k, p) in enumerate(zip(distancias, capacidades, custos_km, pesos)):
+        escalar = calcular_custos(d, c, k, p, parametros)
+        # Igualdade exata, bit a bit: não apenas aproximada
+        assert [float(lote[campo][i]) for campo in CAMPOS_RESULTADO] == [escalar[campo] for campo in CAMPOS_RESULTADO]
+
+
+@requer_numpy
+def test_lote_sem_numpy_igual_ao_vetorizado(monkeypatch):
+    colunas = _entradas(500)
+    vetorizado = calcular_custos_lote(*colunas)
+    monkeypatch.setattr(calculo_lote, 'np', None)
+    linha_a_linha = calcular_custos_lote(*colunas)
+    for campo in CAMPOS_RESULTADO:
+        assert linha_a_linha[campo] == vetorizado[campo].tolist()
+
+
+def test_calcular_lote_resolve_ids_e_valida(pasta_dados):
+    propriedades = [{'id': 3, 'distancia': 50.0}, {'id': 1, 'distancia': 10.0}]
+    veiculos = [{'id': 2, 'capacidade': 1000.0, 'custo_km': 2.0}, {'id': 5, 'capacidade': 0.0, 'custo_km': 1.0}]
+    produtos = [{'id': 1}]
+
+    resultado = calcular_lote([1, 3, 1], [2, 2, 2], [1, 1, 1], [2500.0, 1000.0, 10.0], propriedades, veiculos,
+                              produtos)
+    assert [float(v) for v in resultado['viagens']] == [3, 1, 1]
+    assert [float(v) for v in resultado['distancia_total']] == [60.0, 100.0, 20.0]
+
+    with pytest.raises(ValueError, match=r"Propriedade inexistente em 1 linha\(s\): linha 2 \(ID 9\)"):
+        calcular_lote([1, 9], [2, 2], [1, 1], [1.0, 1.0], propriedades, veiculos, produtos)
+    with pytest.raises(ValueError, match="capacidade maior que zero"):
+        calcular_lote([1], [5], [1], [1.0], propriedades, veiculos, produtos)
+    with pytest.raises(ValueError, match="mesmo tamanho"):
+        calcular_lote([1, 1], [2], [1], [1.0], propriedades, veiculos, produtos)
+
+
+def test_arquivo_de_lote_csv_e_json(pasta_dados, tmp_path):
+    entrada = tmp_path / "lote.csv"
+    entrada.write_text("propriedade_id,veiculo_id,produto_id,peso_total\n1,1,1,\"2500,5\"\n", encoding='utf-8')
+    colunas = ler_lote(entrada)
+    assert colunas == {'propriedade_id': [1], 'veiculo_id': [1], 'produto_id': [1], 'peso_total': [2500.5]}
+
+    resultado = calcular_lote(colunas['propriedade_id'], colunas['veiculo_id'], colunas['produto_id'],
+                              colunas['peso_total'], [{'id': 1, 'distancia': 10.0}],
+                              [{'id': 1, 'capacidade': 1000.0, 'custo_km': 2.0}], [{'id': 1}])
+    saida = tmp_path / "resultado.json"
+    escrever_lote(saida, colunas, resultado)
+    assert ler_lote(saida, ('propriedade_id', 'viagens')) == {'propriedade_id': [1], 'viagens': [3.0]}
+
+    (tmp_path / "ruim.csv").write_text("propriedade_id,veiculo_id,produto_id,peso_total\n1,x,1,10\n",
+                                       encoding='utf-8')
+    with pytest.raises(ValueError, match="Linha 1 inválida"):
+        ler_lote(tmp_path / "ruim.csv")
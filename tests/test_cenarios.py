@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+import cenarios
+from cenarios import PERCENTIS, carregar_grade, montar_grade, percentil, varrer_cenarios
+from modelo_custos import PARAMETROS_PADRAO, calcular_custos
+
+
+def _catalogo(semente=1):
+    rng = random.Random(semente)
+    propriedades = [{'id': i, 'nome': f"P{i}", 'distancia': rng.uniform(5, 500)} for i in range(1, 31)]
+    veiculos = [{'id': 1, 'capacidade': 1000.0, 'custo_km': 1.5}, {'id': 2, 'capacidade': 8000.0, 'custo_km': 3.0},
+                {'id': 3, 'capacidade': 0.0, 'custo_km': 1.0}]
+    return propriedades, veiculos
+
+
+def _referencia(grade, propriedades, veiculos, peso_total):
+    """Resumo calculado cenário a cenário com a fórmula escalar"""
+    resumo = []
+    for prop in propriedades:
+        custos = sorted(min(calcular_custos(prop['distancia'], v['capacidade'], v['custo_km'], peso_total, p)['custo_total']
+                            for v in veiculos if v['capacidade'] > 0) for p in grade)
+        linha = {'propriedade_id': prop['id'], 'nome': prop['nome'], 'cenarios': len(custos), 'minimo': custos[0],
+                 'media': sum(custos) / len(custos), 'maximo': custos[-1]}
+        linha.update({f'p{q}': percentil(custos, q) for q in PERCENTIS})
+        resumo.append(linha)
+    return resumo
+
+
+def _conferir(resumo, esperado):
+    assert [list(linha) for linha in resumo] == [list(linha) for linha in esperado]
+    for linha, referencia in zip(resumo, esperado):
+        assert linha == {campo: pytest.approx(valor) if isinstance(valor, float) else valor
+                         for campo, valor in referencia.items()}
+
+
+@pytest.mark.parametrize('processos, tamanho_bloco', [(1, None), (1, 7), (2, 5)])
+def test_resumo_igual_ao_calculo_cenario_a_cenario(pasta_dados, processos, tamanho_bloco):
+    propriedades, veiculos = _catalogo()
+    grade = montar_grade({'velocidade_media': [45, 55, 65], 'fator_combustivel': [0.9, 1.0, 1.1, 1.25],
+                          'motoristas': [1, 2]})
+    resumo = varrer_cenarios(grade, propriedades, veiculos, 5000, processos, tamanho_bloco)
+    _conferir(resumo, _referencia(grade, propriedades, veiculos, 5000))
+
+
+def test_resumo_sem_numpy(pasta_dados, monkeypatch):
+    monkeypatch.setattr(cenarios, 'np', None)
+    monkeypatch.setattr('calculo_lote.np', None)
+    propriedades, veiculos = _catalogo(2)
+    grade = montar_grade({'diaria_motorista': [200, 250, 300], 'horas_dia_viagem': [6, 8]})
+    resumo = varrer_cenarios(grade, propriedades, veiculos, 2500, processos=1, tamanho_bloco=4)
+    _conferir(resumo, _referencia(grade, propriedades, veiculos, 2500))
+
+
+def test_grade_e_produto_cartesiano():
+    grade = montar_grade({'velocidade_media': [50, 60], 'motoristas': 1})
+    assert grade == [PARAMETROS_PADRAO.com(velocidade_media=50, motoristas=1),
+                     PARAMETROS_PADRAO.com(velocidade_media=60, motoristas=1)]
+
+
+@pytest.mark.parametrize('especificacao, mensagem', [
+    ({'velocidade_media': [0]}, "maior que zero"),
+    ({'horas_dia_viagem': [-8]}, "maior que zero"),
+    ({'fator_manutencao': [1, -0.5]}, "negativo"),
+    ({'motoristas': ["2"]}, "número válido"),
+    ({'motoristas': [True]}, "número válido"),
+    ({'diaria_motorista': [float('inf')]}, "número válido"),
+    ({'fator_combustivel': []}, "ao menos um valor"),
+    ({'combustivel': [1]}, "desconhecido"),
+])
+def test_grade_invalida_gera_value_error(especificacao, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        montar_grade(especificacao)
+
+
+def test_carregar_grade(tmp_path):
+    arquivo = tmp_path / "grade.json"
+    arquivo.write_text('{"velocidade_media": [50, 60, 70]}', encoding='utf-8')
+    assert len(carregar_grade(arquivo)) == 3
+    arquivo.write_text('[1, 2]', encoding='utf-8')
+    with pytest.raises(ValueError):
+        carregar_grade(arquivo)
@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+
+import copia_seguranca
+from armazenamento import carregar_dados, salvar_dados
+from copia_seguranca import gravar_copia, restaurar_copia, verificar_copia
+from diario import RepositorioDiario, iterar_calculos
+
+
+@pytest.fixture
+def tabelas(tmp_path, monkeypatch):
+    """Arquivos de dados em tmp_path no lugar dos da pasta do usuário"""
+    dados = tmp_path / "dados"
+    dados.mkdir()
+    arquivos = {tabela: dados / arquivo.name for tabela, arquivo in copia_seguranca.TABELAS.items()}
+    monkeypatch.setattr(copia_seguranca, 'TABELAS', arquivos)
+    monkeypatch.setattr(copia_seguranca, 'CALCULOS_FILE', arquivos['calculos'])
+    monkeypatch.setattr(copia_seguranca, 'RESUMOS_FILE', dados / "resumos.json")
+
+    salvar_dados([{'id': 1, 'nome': "Sítio", 'distancia': 12.5}], arquivos['propriedades'])
+    salvar_dados([{'id': 1, 'tipo': "Caminhão", 'capacidade': 1000, 'custo_km': 2}], arquivos['veiculos'])
+    salvar_dados([{'propriedade_id': 1, 'centro_id': 1, 'distancia': 10.0}], arquivos['distancias'])
+    calculos = RepositorioDiario(arquivos['calculos'])
+    calculos.adicionar_varios([{'propriedade_id': 1, 'veiculo_id': 1, 'peso_total': peso} for peso in (100, 200)])
+    calculos.compactar()
+    calculos.adicionar({'propriedade_id': 1, 'veiculo_id': 1, 'peso_total': 300})
+    return arquivos
+
+
+def _reescrever(caminho, trocar):
+    with gzip.open(caminho, 'rb') as f:
+        conteudo = f.read()
+    with gzip.open(caminho, 'wb') as f:
+        f.write(trocar(conteudo))
+
+
+def test_copia_e_restauracao_recuperam_os_dados(tabelas, tmp_path):
+    destino = tmp_path / "copia.jsonl.gz"
+    contagens = gravar_copia(destino)
+    assert contagens == {'propriedades': 1, 'veiculos': 1, 'produtos': 0, 'centros': 0, 'calculos': 3,
+                         'distancias': 1}
+    assert verificar_copia(destino) == contagens
+
+    salvar_dados([], tabelas['propriedades'])
+    RepositorioDiario(tabelas['calculos']).adicionar({'propriedade_id': 9, 'veiculo_id': 9, 'peso_total': 1})
+
+    assert restaurar_copia(destino) == contagens
+    assert carregar_dados(tabelas['propriedades']) == [{'id': 1, 'nome': "Sítio", 'distancia': 12.5}]
+    assert [c['peso_total'] for c in iterar_calculos(tabelas['calculos'])] == [100, 200, 300]
+
+
+def test_copia_alterada_e_recusada_sem_mexer_nos_dados(tabelas, tmp_path):
+    destino = tmp_path / "copia.jsonl.gz"
+    gravar_copia(destino)
+    _reescrever(destino, lambda conteudo: conteudo.replace(b'"peso_total": 200', b'"peso_total": 900'))
+    antes = tabelas['propriedades'].read_bytes()
+    salvar_dados([], tabelas['veiculos'])
+
+    with pytest.raises(ValueError, match="CRC32"):
+        verificar_copia(destino)
+    with pytest.raises(ValueError):
+        restaurar_copia(destino)
+    assert tabelas['propriedades'].read_bytes() == antes
+    assert carregar_dados(tabelas['veiculos']) == []
+
+
+def test_copia_truncada_e_recusada(tabelas, tmp_path):
+    destino = tmp_path / "copia.jsonl.gz"
+    gravar_copia(destino)
+    _reescrever(destino, lambda conteudo: conteudo[:conteudo.rindex(b'{"$fim"')])
+    with pytest.raises(ValueError, match="incompleto"):
+        verificar_copia(destino)
+
+    bruto = destino.read_bytes()
+    destino.write_bytes(bruto[:len(bruto) // 2])
+    with pytest.raises(ValueError):
+        restaurar_copia(destino)
+    assert [c['peso_total'] for c in iterar_calculos(tabelas['calculos'])] == [100, 200, 300]
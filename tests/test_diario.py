@@ -0,0 +1,87 @@
+import json
+
+from diario import RepositorioDiario, iterar_calculos
+from repositorio import Repositorio, arquivo_contador
+
+
+def _calculo(peso):
+    return {'propriedade_id': 1, 'veiculo_id': 1, 'produto_id': 1, 'peso_total': peso}
+
+
+def test_inclusoes_vao_para_o_diario_e_a_compactacao_preserva_tudo(tmp_path):
+    arquivo = tmp_path / "calculos.json"
+    diario = RepositorioDiario(arquivo, limite_compactacao=1000)
+    itens = diario.adicionar_varios([_calculo(p) for p in range(1, 6)])
+
+    assert [item['id'] for item in itens] == [1, 2, 3, 4, 5]
+    assert not arquivo.exists()
+    assert len(arquivo.with_suffix('.jsonl').read_bytes().splitlines()) == 5
+
+    diario.compactar()
+    assert arquivo.with_suffix('.jsonl').read_bytes() == b''
+    assert [item['peso_total'] for item in RepositorioDiario(arquivo).listar()] == [1, 2, 3, 4, 5]
+
+
+def test_compactacao_automatica_ao_passar_do_limite(tmp_path):
+    arquivo = tmp_path / "calculos.json"
+    diario = RepositorioDiario(arquivo, limite_compactacao=3)
+    for peso in range(1, 5):
+        diario.adicionar(_calculo(peso))
+
+    assert len(json.loads(arquivo.read_text(encoding='utf-8'))) >= 3
+    assert [item['id'] for item in iterar_calculos(arquivo)] == [1, 2, 3, 4]
+
+
+def test_cauda_incompleta_do_diario_e_ignorada_e_removida(tmp_path):
+    arquivo = tmp_path / "calculos.json"
+    RepositorioDiario(arquivo).adicionar_varios([_calculo(1), _calculo(2)])
+    with open(arquivo.with_suffix('.jsonl'), 'ab') as f:
+        f.write(b'{"id": 3, "peso_to')  # gravação interrompida
+
+    assert [item['id'] for item in RepositorioDiario(arquivo).listar()] == [1, 2]
+    assert [item['id'] for item in iterar_calculos(arquivo)] == [1, 2]
+
+    novo = RepositorioDiario(arquivo).adicionar(_calculo(3))
+    assert novo['id'] == 3
+    linhas = arquivo.with_suffix('.jsonl').read_bytes().splitlines()
+    assert [json.loads(linha)['id'] for linha in linhas] == [1, 2, 3]
+
+
+def test_compactacao_interrompida_nao_duplica_itens(tmp_path):
+    arquivo = tmp_path / "calculos.json"
+    diario = RepositorioDiario(arquivo)
+    diario.adicionar_varios([_calculo(1), _calculo(2)])
+    copia_diario = arquivo.with_suffix('.jsonl').read_bytes()
+    diario.compactar()
+    # Queda depois de gravar o snapshot e antes de esvaziar o diário
+    arquivo.with_suffix('.jsonl').write_bytes(copia_diario)
+
+    recuperado = RepositorioDiario(arquivo)
+    assert [item['id'] for item in recuperado.listar()] == [1, 2]
+    assert [item['id'] for item in iterar_calculos(arquivo)] == [1, 2]
+    assert recuperado.adicionar(_calculo(3))['id'] == 3
+
+
+def test_estado_e_refeito_sem_o_arquivo_lateral(tmp_path):
+    arquivo = tmp_path / "calculos.json"
+    diario = RepositorioDiario(arquivo)
+    diario.adicionar_varios([_calculo(1), _calculo(2)])
+    diario.compactar()
+    diario.adicionar(_calculo(3))
+    arquivo_contador(arquivo).unlink()
+
+    assert RepositorioDiario(arquivo).adicionar(_calculo(4))['id'] == 4
+    assert [item['id'] for item in iterar_calculos(arquivo)] == [1, 2, 3, 4]
+
+
+def test_ids_removidos_nao_sao_reaproveitados(tmp_path):
+    arquivo = tmp_path / "propriedades.json"
+    itens = Repositorio(arquivo)
+    itens.adicionar({'nome': "A"})
+    ultimo = itens.adicionar({'nome': "B"})
+    itens.salvar()
+    itens.remover(ultimo['id'])
+    itens.salvar()
+
+    outro_processo = Repositorio(arquivo)
+    assert outro_processo.adicionar({'nome': "C"})['id'] == ultimo['id'] + 1
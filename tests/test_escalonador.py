@@ -0,0 +1,104 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from escalonador import escalonar, escrever_plano, ler_servicos, resumo_diario
+from modelo_custos import PARAMETROS_PADRAO, custos_percurso
+
+HORAS_DIA = PARAMETROS_PADRAO.horas_dia_viagem + PARAMETROS_PADRAO.horas_paradas_dia
+INICIO = date(2026, 3, 2)
+
+
+def _servico(propriedade_id, peso, dia_inicio=0, dia_fim=0):
+    return {'propriedade_id': propriedade_id, 'peso_total': peso, 'inicio': INICIO + timedelta(days=dia_inicio),
+            'fim': INICIO + timedelta(days=dia_fim)}
+
+
+@pytest.mark.parametrize('semente', range(6))
+def test_plano_respeita_veiculos_liberacoes_e_pesos(semente):
+    rng = random.Random(semente)
+    veiculos = [{'id': i, 'capacidade': rng.choice((3000.0, 8000.0, 14000.0)), 'custo_km': rng.uniform(1, 5)}
+                for i in range(1, 5)]
+    distancias = {p: rng.uniform(10, 300) for p in range(1, 11)}
+    servicos = [_servico(rng.randint(1, 10), rng.uniform(1000, 40000), inicio, inicio + rng.randint(0, 4))
+                for inicio in (rng.randint(0, 6) for _ in range(25))]
+    plano = escalonar(servicos, veiculos, distancias)
+
+    capacidade = {v['id']: v['capacidade'] for v in veiculos}
+    custo_km = {v['id']: v['custo_km'] for v in veiculos}
+    por_veiculo = {}
+    levado = [0.0] * len(servicos)
+    for viagem in plano['viagens']:
+        servico = servicos[viagem['servico']]
+        assert viagem['inicio_h'] >= (servico['inicio'] - INICIO).days * HORAS_DIA
+        assert 0 < viagem['peso'] <= capacidade[viagem['veiculo_id']]
+        percurso = custos_percurso(2 * distancias[servico['propriedade_id']], custo_km[viagem['veiculo_id']])
+        assert viagem['fim_h'] - viagem['inicio_h'] == pytest.approx(percurso['tempo_total'])
+        assert viagem['dia'] == INICIO + timedelta(days=int(viagem['inicio_h'] // HORAS_DIA))
+        levado[viagem['servico']] += viagem['peso']
+        por_veiculo.setdefault(viagem['veiculo_id'], []).append((viagem['inicio_h'], viagem['fim_h']))
+
+    assert levado == pytest.approx([s['peso_total'] for s in servicos])
+    for intervalos in por_veiculo.values():
+        intervalos.sort()
+        assert all(fim <= proximo_inicio + 1e-9 for (_, fim), (proximo_inicio, _) in zip(intervalos, intervalos[1:]))
+    assert plano['makespan_horas'] == max(v['fim_h'] for v in plano['viagens'])
+    assert plano['custo_total'] == pytest.approx(sum(v['custo_total'] for v in plano['viagens']))
+    for uso in plano['utilizacao']:
+        horas = sum(fim - inicio for inicio, fim in por_veiculo.get(uso['veiculo_id'], []))
+        assert uso['horas'] == pytest.approx(horas)
+
+
+def test_prazo_mais_proximo_primeiro_e_veiculo_espera_a_liberacao():
+    veiculos = [{'id': 1, 'capacidade': 10000.0, 'custo_km': 2.0}]
+    servicos = [_servico(1, 5000, 0, 5), _servico(2, 5000, 0, 1), _servico(3, 5000, 3, 3)]
+    plano = escalonar(servicos, veiculos, {1: 50.0, 2: 50.0, 3: 50.0})
+
+    assert [v['servico'] for v in plano['viagens']] == [1, 0, 2]
+    assert plano['viagens'][2]['inicio_h'] == 3 * HORAS_DIA
+    assert plano['atrasados'] == []
+
+
+def test_entre_veiculos_livres_fica_o_de_menor_custo_por_kg():
+    veiculos = [{'id': 1, 'capacidade': 1000.0, 'custo_km': 1.0}, {'id': 2, 'capacidade': 10000.0, 'custo_km': 3.0}]
+    plano = escalonar([_servico(1, 9000)], veiculos, {1: 100.0})
+    assert plano['viagens'][0]['veiculo_id'] == 2
+
+
+def test_servico_fora_da_janela_aparece_em_atrasados():
+    veiculos = [{'id': 1, 'capacidade': 1000.0, 'custo_km': 2.0}]
+    # 3 viagens de 400 km (ida e volta) com 11 h por dia de trabalho não cabem em um dia
+    plano = escalonar([_servico(7, 3000, 0, 0)], veiculos, {7: 200.0})
+    assert len(plano['viagens']) == 3
+    assert plano['atrasados'] == [{'servico': 0, 'propriedade_id': 7,
+                                   'atraso_dias': plano['makespan_dias'] - 1}]
+
+
+def test_erros_de_entrada():
+    veiculos = [{'id': 1, 'capacidade': 1000.0, 'custo_km': 2.0}]
+    with pytest.raises(ValueError, match="Propriedade 9"):
+        escalonar([_servico(9, 100)], veiculos, {1: 10.0})
+    with pytest.raises(ValueError, match="capacidade"):
+        escalonar([_servico(1, 100)], [{'id': 1, 'capacidade': 0, 'custo_km': 1}], {1: 10.0})
+    with pytest.raises(ValueError, match="Nenhum serviço"):
+        escalonar([], veiculos, {1: 10.0})
+
+
+def test_arquivos_de_servicos_e_de_plano(tmp_path):
+    entrada = tmp_path / "servicos.csv"
+    entrada.write_text("propriedade_id,peso_total,inicio,fim\n1,\"1500,5\",02/03/2026,03/03/2026\n",
+                       encoding='utf-8')
+    servicos = ler_servicos(entrada)
+    assert servicos == [{'propriedade_id': 1, 'peso_total': 1500.5, 'inicio': INICIO, 'fim': date(2026, 3, 3)}]
+
+    plano = escalonar(servicos, [{'id': 1, 'capacidade': 1000.0, 'custo_km': 2.0}], {1: 10.0})
+    dias = resumo_diario(plano)
+    assert dias[0][0] == INICIO and dias[0][1]['viagens'] == 2 and dias[0][1]['peso'] == 1500.5
+    saida = tmp_path / "plano.csv"
+    escrever_plano(saida, plano)
+    assert saida.read_text(encoding='utf-8').splitlines()[1].startswith("02/03/2026,1,0,1,1000.0")
+
+    entrada.write_text("propriedade_id,peso_total,inicio,fim\n1,10,05/03/2026,03/03/2026\n", encoding='utf-8')
+    with pytest.raises(ValueError, match="inicio <= fim"):
+        ler_servicos(entrada)
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import servico
+from armazenamento import CALCULOS_FILE
+from diario import RepositorioDiario, iterar_calculos
+from importacao import exportar, importar
+from repositorio import repositorio
+
+
+def _cadastrar():
+    prop = servico.criar_propriedade("Sítio Boa Vista", "Estrada Velha, km 3", 12.5, 140)
+    veic = servico.criar_veiculo("Caminhão", 8000, 3.2)
+    prod = servico.criar_produto("Milho", 60)
+    calculos = servico.gravar_calculos([
+        {'propriedade_id': prop['id'], 'veiculo_id': veic['id'], 'produto_id': prod['id'], 'peso_total': peso,
+         'viagens': 1, 'distancia_total': 280.0, 'custo_total': 1000.0 + peso, 'tempo_total': 6.0,
+         'data_calculo': "01/03/2026 10:00"}
+        for peso in (500.0, 900.0)])
+    return prop, veic, prod, calculos
+
+
+@pytest.mark.parametrize('formato', ['consolidado', 'jsonl', 'csv'])
+def test_exportacao_e_importacao_recuperam_os_dados(pasta_dados, tmp_path, formato):
+    _cadastrar()
+    destino = tmp_path / ("dados.json" if formato == 'consolidado' else "exportacao")
+    totais = exportar(destino, formato)
+    assert totais == {'propriedades': 1, 'veiculos': 1, 'produtos': 1, 'centros': 0, 'calculos': 2}
+
+    if formato == 'consolidado':
+        resultado = importar(destino)
+    else:
+        for secao in ('propriedades', 'veiculos', 'produtos', 'calculos'):
+            resultado = importar(destino / f"{secao}.{formato}", formato)
+    assert resultado['erros'] == 0
+
+    propriedades = servico.listar('propriedade')
+    assert [p['nome'] for p in propriedades] == ["Sítio Boa Vista"] * 2
+    calculos = list(iterar_calculos(CALCULOS_FILE))
+    assert [c['id'] for c in calculos] == [1, 2, 3, 4]
+    if formato == 'consolidado':
+        # Os cálculos importados apontam para as entidades criadas na mesma importação
+        assert {c['propriedade_id'] for c in calculos[2:]} == {propriedades[1]['id']}
+    assert [c['custo_total'] for c in calculos[2:]] == [1500.0, 1900.0]
+
+
+def test_linhas_invalidas_vao_para_o_relatorio_sem_interromper(pasta_dados, tmp_path):
+    prop, veic, prod, _ = _cadastrar()
+    linhas = [
+        {'propriedade_id': prop['id'], 'veiculo_id': veic['id'], 'produto_id': prod['id'], 'peso_total': 100,
+         'viagens': 1, 'distancia_total': 280, 'custo_total': 10, 'tempo_total': 1},
+        {'propriedade_id': 99, 'veiculo_id': veic['id'], 'produto_id': prod['id'], 'peso_total': 100,
+         'viagens': 1, 'distancia_total': 280, 'custo_total': 10, 'tempo_total': 1},
+        {'propriedade_id': prop['id'], 'veiculo_id': veic['id'], 'produto_id': prod['id'], 'peso_total': "x",
+         'viagens': 1, 'distancia_total': 280, 'custo_total': 10, 'tempo_total': 1},
+    ]
+    arquivo = tmp_path / "calculos.jsonl"
+    arquivo.write_text('\n'.join(json.dumps(linha) for linha in linhas) + '\n{quebrado\n', encoding='utf-8')
+    relatorio = tmp_path / "erros.csv"
+
+    resultado = importar(arquivo, relatorio=relatorio)
+    assert resultado['importados']['calculos'] == 1
+    assert resultado['erros'] == 3
+    assert [erro['linha'] for erro in resultado['exemplos_erros']] == [2, 3, 4]
+    assert len(relatorio.read_text(encoding='utf-8').splitlines()) == 4
+
+
+def test_importacao_de_calculos_nao_carrega_o_historico(pasta_dados, tmp_path):
+    prop, veic, prod, _ = _cadastrar()
+    arquivo = tmp_path / "calculos.jsonl"
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        for peso in range(1, 251):
+            f.write(json.dumps({'propriedade_id': prop['id'], 'veiculo_id': veic['id'], 'produto_id': prod['id'],
+                                'peso_total': peso, 'viagens': 1, 'distancia_total': 280, 'custo_total': peso,
+                                'tempo_total': 1}) + '\n')
+
+    resultado = importar(arquivo, tamanho_lote=40)
+    assert resultado['importados']['calculos'] == 250
+    # Os lotes são anexados ao diário sem ler o histórico para a memória
+    assert repositorio(CALCULOS_FILE, RepositorioDiario)._itens is None
+    ids = [c['id'] for c in iterar_calculos(CALCULOS_FILE)]
+    assert ids == list(range(1, 253))
+    # Os totais dos relatórios acompanham a importação
+    assert servico.relatorios() == servico.relatorios(reconstruir=True)
@@ -0,0 +1,127 @@
+import math
+import random
+
+import pytest
+
+import servico
+from malha_viaria import MalhaViaria, MatrizDistancias, calcular_matriz, distancia_propriedade, matriz_distancias
+from roteirizacao import distancia_haversine
+
+
+def _malha_aleatoria(semente, nos=25, arestas=70):
+    rng = random.Random(semente)
+    malha = MalhaViaria()
+    lista = []
+    for _ in range(arestas):
+        origem, destino = rng.sample(range(nos), 2)
+        km, mao_unica = round(rng.uniform(0.5, 30), 2), rng.random() < 0.3
+        malha.adicionar_aresta(origem, destino, km, mao_unica)
+        lista.append((origem, destino, km, mao_unica))
+    return malha, lista, nos
+
+
+def _floyd_warshall(lista, nos):
+    dist = [[0.0 if i == j else math.inf for j in range(nos)] for i in range(nos)]
+    for origem, destino, km, mao_unica in lista:
+        dist[origem][destino] = min(dist[origem][destino], km)
+        if not mao_unica:
+            dist[destino][origem] = min(dist[destino][origem], km)
+    for k in range(nos):
+        for i in range(nos):
+            for j in range(nos):
+                if dist[i][k] + dist[k][j] < dist[i][j]:
+                    dist[i][j] = dist[i][k] + dist[k][j]
+    return dist
+
+
+@pytest.mark.parametrize('semente', range(5))
+def test_dijkstra_igual_a_floyd_warshall_com_maos_unicas(semente):
+    malha, lista, nos = _malha_aleatoria(semente)
+    referencia = _floyd_warshall(lista, nos)
+    for destino in range(nos):
+        distancias = malha.distancias_ate(destino)
+        for origem in range(nos):
+            if math.isinf(referencia[origem][destino]):
+                assert origem not in distancias
+            else:
+                assert distancias[origem] == pytest.approx(referencia[origem][destino])
+
+
+def test_no_mais_proximo_igual_a_busca_completa():
+    rng = random.Random(11)
+    malha = MalhaViaria()
+    for no in range(300):
+        malha.adicionar_no(no, rng.uniform(-25, -20), rng.uniform(-50, -45))
+    for _ in range(50):
+        lat, lon = rng.uniform(-26, -19), rng.uniform(-51, -44)
+        no, km = malha.no_mais_proximo(lat, lon)
+        esperado = min(distancia_haversine(lat, lon, *malha.coordenadas[n]) for n in malha.coordenadas)
+        assert km == pytest.approx(esperado)
+        assert distancia_haversine(lat, lon, *malha.coordenadas[no]) == pytest.approx(esperado)
+
+
+def test_matriz_soma_os_acessos_e_omite_pares_sem_caminho():
+    malha = MalhaViaria()
+    malha.adicionar_aresta('a', 'b', 10)
+    malha.adicionar_aresta('b', 'c', 5, mao_unica=True)
+    malha.adicionar_aresta('x', 'y', 1)
+    propriedades = [{'id': 1, 'no': 'a'}, {'id': 2, 'no': 'c'}, {'id': 3}]  # 3: sem localização
+    centros = [{'id': 10, 'no': 'c'}, {'id': 20, 'no': 'a'}, {'id': 30, 'no': 'y'}]
+
+    assert calcular_matriz(malha, propriedades, centros) == {
+        (1, 10): 15.0, (2, 10): 0.0, (1, 20): 0.0,  # c -> a não existe: b -> c é mão única
+    }
+
+    malha.adicionar_no('a', -22.0, -47.0)
+    prop = {'id': 4, 'latitude': -22.01, 'longitude': -47.0}
+    acesso = distancia_haversine(-22.01, -47.0, -22.0, -47.0) * 1.3
+    assert calcular_matriz(malha, [prop], centros[:1], fator_rodoviario=1.3) == {(4, 10): pytest.approx(acesso + 15)}
+
+
+def test_carregar_csv(tmp_path):
+    arestas = tmp_path / "arestas.csv"
+    arestas.write_text("origem,destino,distancia,mao_unica\nA,B,4.5,1\nB,C,2,\n", encoding='utf-8')
+    nos = tmp_path / "nos.csv"
+    nos.write_text("no,latitude,longitude\nA,-22,-47\n", encoding='utf-8')
+    malha = MalhaViaria.carregar(arestas, nos)
+    assert len(malha) == 3
+    assert malha.distancias_ate('C') == {'C': 0.0, 'B': 2.0, 'A': 6.5}
+    assert malha.distancias_ate('A') == {'A': 0.0}
+    assert malha.coordenadas == {'A': (-22.0, -47.0)}
+
+    arestas.write_text("origem,destino,distancia\nA,B,-1\n", encoding='utf-8')
+    with pytest.raises(ValueError, match="Aresta inválida"):
+        MalhaViaria.carregar(arestas)
+
+
+def test_matriz_gravada_consultada_e_descartada(tmp_path):
+    matriz = MatrizDistancias(tmp_path / "distancias.json")
+    matriz.gravar({(1, 10): 30.0, (1, 20): 12.5, (2, 10): 8.0})
+    prop = {'id': 1, 'distancia': 99.0}
+
+    assert matriz.distancia_propriedade(prop) == 12.5
+    assert matriz.distancia_propriedade(prop, 10) == 30.0
+    with pytest.raises(ValueError):
+        matriz.distancia_propriedade(prop, 30)
+
+    assert matriz.descartar(centro_id=20) == 1
+    assert matriz.mais_proximo(1) == (10, 30.0)
+    assert matriz.descartar(propriedade_id=1) == 1
+    assert matriz.distancia_propriedade(prop) == 99.0  # fora da matriz: distância cadastrada
+    # Outro objeto (como outro processo) vê a mesma matriz
+    assert MatrizDistancias(tmp_path / "distancias.json").distancia(2, 10) == 8.0
+
+
+def test_alterar_ou_remover_descarta_as_distancias(pasta_dados):
+    prop = servico.criar_propriedade("A", "x", 1, 100)
+    outra = servico.criar_propriedade("B", "y", 1, 50)
+    centro = servico.criar('centro', nome="C", localizacao="z", latitude=-22, longitude=-47)
+    matriz_distancias.gravar({(prop['id'], centro['id']): 30.0, (outra['id'], centro['id']): 20.0})
+
+    servico.alterar('propriedade', prop['id'], nome="A2")
+    assert distancia_propriedade(servico.obter('propriedade', prop['id'])) == 30.0
+    servico.alterar('propriedade', prop['id'], distancia=120)
+    assert distancia_propriedade(servico.obter('propriedade', prop['id'])) == 120.0
+
+    servico.remover('propriedade', outra['id'])
+    assert matriz_distancias.distancia(outra['id'], centro['id']) is None
@@ -0,0 +1,84 @@
+import itertools
+import math
+import random
+
+import pytest
+
+import otimizador_frota
+from otimizador_frota import custo_por_viagem, otimizar_frota
+
+PROPRIEDADE = {'id': 1, 'distancia': 85.0}
+
+
+def _veiculos(capacidades, rng):
+    return [{'id': i, 'tipo': f"V{i}", 'capacidade': float(c), 'custo_km': round(rng.uniform(0.5, 4.0), 2)}
+            for i, c in enumerate(capacidades, start=1)]
+
+
+def _forca_bruta(veiculos, peso_total):
+    """Menor custo entre todas as combinações de viagens que levam o peso todo"""
+    custos = [custo_por_viagem(PROPRIEDADE['distancia'], v) for v in veiculos]
+    *primeiros, ultimo = veiculos
+    melhor = math.inf
+    faixas = [range(math.ceil(peso_total / v['capacidade']) + 1) for v in primeiros]
+    for viagens in itertools.product(*faixas):
+        levado = sum(n * v['capacidade'] for n, v in zip(viagens, primeiros))
+        n_ultimo = max(0, math.ceil((peso_total - levado) / ultimo['capacidade']))
+        melhor = min(melhor, sum(n * c for n, c in zip(viagens, custos)) + n_ultimo * custos[-1])
+    return melhor
+
+
+def _conferir(resultado, veiculos, peso_total):
+    capacidade = {v['id']: v['capacidade'] for v in veiculos}
+    assert sum(item['viagens'] * capacidade[item['veiculo_id']] for item in resultado['plano']) >= peso_total
+    assert resultado['custo_total'] <= resultado['melhor_veiculo_unico']['custo_total'] + 1e-9
+
+
+@pytest.mark.parametrize('semente', range(8))
+def test_plano_otimo_igual_a_forca_bruta(semente):
+    rng = random.Random(semente)
+    veiculos = _veiculos(rng.sample(range(3, 40), 3), rng)
+    for peso_total in [rng.randint(1, 150) for _ in range(10)]:
+        resultado = otimizar_frota(PROPRIEDADE, veiculos, peso_total)
+        _conferir(resultado, veiculos, peso_total)
+        assert resultado['custo_total'] == pytest.approx(_forca_bruta(veiculos, peso_total))
+        assert resultado['resolucao'] == 1.0
+
+
+@pytest.mark.parametrize('semente', range(8))
+def test_excedente_no_melhor_veiculo_continua_otimo(semente, monkeypatch):
+    # u_melhor x u_maior <= 7 x 7 = 49 cabe no limite: o excedente não muda o ótimo
+    monkeypatch.setattr(otimizador_frota, 'LIMITE_ESTADOS', 49)
+    rng = random.Random(semente)
+    veiculos = _veiculos((3, 5, 7), rng)
+    for peso_total in [rng.randint(50, 400) for _ in range(10)]:
+        resultado = otimizar_frota(PROPRIEDADE, veiculos, peso_total)
+        _conferir(resultado, veiculos, peso_total)
+        assert resultado['custo_total'] == pytest.approx(_forca_bruta(veiculos, peso_total))
+        assert resultado['resolucao'] == 1.0
+
+
+def test_resolucao_ampliada_quando_o_limite_exato_nao_cabe(monkeypatch):
+    monkeypatch.setattr(otimizador_frota, 'LIMITE_ESTADOS', 100)
+    rng = random.Random(3)
+    veiculos = _veiculos((30, 14, 8), rng)
+    resultado = otimizar_frota(PROPRIEDADE, veiculos, 2500)
+    assert resultado['resolucao'] > 1.0
+    _conferir(resultado, veiculos, 2500)
+
+
+def test_caminhoes_grandes_em_resolucao_de_1_kg():
+    rng = random.Random(5)
+    veiculos = _veiculos((30000, 14000, 8000), rng)
+    resultado = otimizar_frota(PROPRIEDADE, veiculos, 250_000)
+    _conferir(resultado, veiculos, 250_000)
+    # Capacidades múltiplas da resolução usada: o plano é o ótimo exato
+    assert all(v['capacidade'] % resultado['resolucao'] == 0 for v in veiculos)
+    assert resultado['custo_total'] == pytest.approx(_forca_bruta(veiculos, 250_000))
+
+
+def test_peso_invalido_e_veiculos_sem_capacidade():
+    with pytest.raises(ValueError):
+        otimizar_frota(PROPRIEDADE, [{'id': 1, 'tipo': "V", 'capacidade': 10, 'custo_km': 1}], 0)
+    with pytest.raises(ValueError, match="Nenhum veículo"):
+        otimizar_frota(PROPRIEDADE, [{'id': 1, 'tipo': "V", 'capacidade': 0, 'custo_km': 1}], 10)
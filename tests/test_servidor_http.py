@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+
+import servico
+import servidor_http
+from servico import ErroServico, NaoEncontrado
+from servidor_http import AgrupadorCotacoes, Metricas, ServidorCotacoes
+
+VALIDO = {'propriedade_id': 1, 'veiculo_id': 1, 'produto_id': 1, 'peso_total': 2500}
+
+
+@pytest.fixture
+def cadastros(pasta_dados):
+    """Propriedade a 100 km, veículo de 1000 kg a R$ 2/km e produto, todos com id 1"""
+    servico.criar_propriedade("Sítio", "Estrada", 10, 100)
+    servico.criar_veiculo("Caminhão", 1000, 2)
+    servico.criar_produto("Milho", 20)
+
+
+def _cotar_lote(pedidos, janela=0.01):
+    async def executar():
+        agrupador = AgrupadorCotacoes(Metricas(), janela=janela)
+        agrupador.iniciar()
+        try:
+            return await asyncio.gather(*(agrupador.cotar(p) for p in pedidos), return_exceptions=True)
+        finally:
+            await agrupador.parar()
+    return asyncio.run(executar())
+
+
+def test_pedido_invalido_nao_derruba_o_lote(cadastros):
+    resultados = _cotar_lote([
+        VALIDO,
+        {**VALIDO, 'peso_total': float('inf')},
+        {**VALIDO, 'veiculo_id': 99},
+        'não é um objeto',
+        {**VALIDO, 'peso_total': 500},
+    ])
+
+    assert resultados[0]['viagens'] == 3 and resultados[0]['distancia_total'] == 600
+    assert isinstance(resultados[1], ErroServico)
+    assert isinstance(resultados[2], NaoEncontrado)
+    assert isinstance(resultados[3], ErroServico)
+    assert resultados[4]['viagens'] == 1
+
+
+def test_falha_no_calculo_atinge_so_o_pedido_que_falhou(cadastros, monkeypatch):
+    calcular = servidor_http._calcular
+
+    def calcular_com_falha(entradas, parametros):
+        if any(e['peso_total'] == 1300 for e in entradas):
+            raise RuntimeError("falha no cálculo")
+        return calcular(entradas, parametros)
+
+    monkeypatch.setattr(servidor_http, '_calcular', calcular_com_falha)
+    resultados = _cotar_lote([VALIDO, {**VALIDO, 'peso_total': 1300}, {**VALIDO, 'peso_total': 500}])
+
+    assert resultados[0]['viagens'] == 3
+    assert isinstance(resultados[1], RuntimeError)
+    assert resultados[2]['viagens'] == 1
+
+
+def _requisicao(servidor, bruto):
+    async def executar():
+        servico_tcp = await asyncio.start_server(servidor.atender, '127.0.0.1', 0)
+        servidor.agrupador.iniciar()
+        try:
+            reader, writer = await asyncio.open_connection(*servico_tcp.sockets[0].getsockname()[:2])
+            writer.write(bruto)
+            await writer.drain()
+            resposta = await reader.read()
+            writer.close()
+            return resposta
+        finally:
+            await servidor.agrupador.parar()
+            servico_tcp.close()
+            await servico_tcp.wait_closed()
+    cabecalho, _, corpo = asyncio.run(executar()).partition(b'\r\n\r\n')
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+
+def _post(corpo):
+    corpo = json.dumps(corpo).encode('utf-8')
+    return (b'POST /cotacao HTTP/1.1\r\nHost: teste\r\nConnection: close\r\n'
+            b'Content-Length: ' + str(len(corpo)).encode() + b'\r\n\r\n' + corpo)
+
+
+def test_lista_de_cotacoes_responde_cada_item(cadastros):
+    status, conteudo = _requisicao(ServidorCotacoes(), _post([VALIDO, {**VALIDO, 'produto_id': 7}]))
+    assert status == 200
+    assert conteudo[0]['viagens'] == 3
+    assert conteudo[1] == {'erro': "Produto não encontrado."}
+
+
+def test_peso_nao_finito_e_recusado(cadastros):
+    corpo = b'{"propriedade_id": 1, "veiculo_id": 1, "produto_id": 1, "peso_total": Infinity}'
+    bruto = (b'POST /cotacao HTTP/1.1\r\nConnection: close\r\nContent-Length: '
+             + str(len(corpo)).encode() + b'\r\n\r\n' + corpo)
+    status, conteudo = _requisicao(ServidorCotacoes(), bruto)
+    assert status == 400 and 'peso_total' in conteudo['erro']
+
+
+def test_content_length_invalido_e_recusado(cadastros):
+    status, _ = _requisicao(ServidorCotacoes(), b'POST /cotacao HTTP/1.1\r\nContent-Length: -5\r\n\r\n')
+    assert status == 400
+    grande = str(servidor_http.TAMANHO_MAXIMO_CORPO + 1).encode()
+    status, _ = _requisicao(ServidorCotacoes(), b'POST /cotacao HTTP/1.1\r\nContent-Length: ' + grande + b'\r\n\r\n')
+    assert status == 413
+
+
+def test_erro_inesperado_responde_500(cadastros, monkeypatch):
+    async def rotear_com_falha(self, metodo, caminho, corpo):
+        raise RuntimeError("falha inesperada")
+
+    monkeypatch.setattr(ServidorCotacoes, 'rotear', rotear_com_falha)
+    status, conteudo = _requisicao(ServidorCotacoes(), b'GET /saude HTTP/1.1\r\nConnection: close\r\n\r\n')
+    assert status == 500
+    assert conteudo == {'erro': servidor_http.ERRO_INTERNO}